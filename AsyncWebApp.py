@@ -0,0 +1,322 @@
+import os
+import time
+import asyncio
+import logging
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from QRCodeReader import QRCodeReader
+from Validator import Validator
+from GraphClient import AsyncGraphClient
+from markupsafe import Markup
+from ReplyFormatter import format_whatsapp_reply, format_whatsapp_replies
+from RenderCache import RenderCache
+from ScanLog import ScanLog
+from WebhookQueue import MessageDeduplicator
+from WhatsAppConfig import VERIFY_TOKEN, ACCESS_TOKEN, PHONE_NUMBER_ID, GRAPH_API_URL
+from Metrics import metrics
+
+# asyncio (ASGI) version of WebApp.py, with the same "/" and "/webhook" routes.
+# Network I/O is awaited concurrently; QR decoding & validation run on a thread pool.
+# Run with: uvicorn AsyncWebApp:app --host 0.0.0.0 --port 8080
+
+# LOG_LEVEL=WARNING silences the per-scan messages on the hot path (DEBUG shows every step)
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Max webhook messages processed at the same time
+WEBHOOK_CONCURRENCY = int(os.environ.get("WEBHOOK_CONCURRENCY", 32))
+
+templates = Jinja2Templates(directory="templates")
+
+# Services used by the routes: created on startup by init_services() (see lifespan), so
+# importing this module (e.g. in a worker process or a test) loads no database & starts no threads
+graph = reader = validator = render_cache = scan_log = executor = dedup = webhook_slots = None
+
+
+def init_services(validator_instance=None, scan_log_path=None, watch=True):
+    """
+    Creates the services the routes use: Graph API client, QR reader, Validator,
+    render cache, scan log, decode thread pool & webhook deduplication.
+    Called on app startup unless the importer already called it.
+
+    Args:
+        validator_instance (Validator): Validator to serve (a default Validator() if None).
+        scan_log_path (str): Scan log file (SCAN_LOG_PATH, default scan_log.sqlite, if None).
+        watch (bool): Reload the database in the background when its file changes.
+    """
+    global graph, reader, validator, render_cache, scan_log, executor, dedup, webhook_slots
+
+    graph = AsyncGraphClient(GRAPH_API_URL, ACCESS_TOKEN)
+
+    reader = QRCodeReader()
+    validator = validator_instance or Validator()
+    if watch:
+        # Pick up database changes (renewals, new vehicles) without restarting the app
+        validator.start_watching()
+
+    # Rendered WhatsApp replies & HTML result fragments per customer (dropped on reload / new day)
+    render_cache = RenderCache(int(os.environ.get("RENDER_CACHE_SIZE", 10000)))
+
+    # Audit log of every scan, written in batches by a background thread (.sqlite or .jsonl)
+    scan_log = ScanLog(
+        scan_log_path or os.environ.get("SCAN_LOG_PATH", "scan_log.sqlite"),
+        rate_window=float(os.environ.get("SCAN_RATE_WINDOW", 60)),
+        rate_limit=int(os.environ.get("SCAN_RATE_LIMIT", 5)),
+    )
+
+    # CPU-bound work (decode & validate) runs here so it never blocks the event loop
+    executor = ThreadPoolExecutor(max_workers=int(os.environ.get("DECODE_WORKERS", os.cpu_count() or 4)))
+    dedup = MessageDeduplicator()
+    webhook_slots = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+
+
+async def close_services():
+    """
+    Releases what init_services() created: pooled connections, worker pools, the reload
+    thread & the scan log (its queued entries are written first).
+    """
+    global graph
+
+    await graph.close()
+    # The next startup (e.g. the app served again in the same process) creates fresh services
+    graph = None
+    executor.shutdown(wait=False)
+    validator.stop_watching()
+    reader.close()
+    scan_log.close()
+
+
+async def run_blocking(func, *args):
+    """
+    Runs a blocking function on the executor and awaits its result.
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def scan(data, source, client=None):
+    """
+    Decodes QR code bytes and validates the payload, off the event loop.
+    The scan is recorded in the scan log (a non-blocking queue put).
+
+    Returns:
+        dict or None: Validator result, or None if no QR code was found.
+    """
+    qr_data = await run_blocking(reader.smart_decode, data)
+    result = await run_blocking(validator.validate, qr_data) if qr_data else None
+    scan_log.record(qr_data, result, source, client)
+    return result
+
+
+async def scan_all(data, source, client=None):
+    """
+    Multi-code version of scan(): decodes every QR code and validates them in one batch.
+
+    Returns:
+        tuple: (customer_ids, Validator results); both empty if no QR code was found.
+    """
+    codes = await run_blocking(reader.decode_all, data)
+    customer_ids = [code["data"] for code in codes]
+    if not customer_ids:
+        scan_log.record(None, None, source, client)
+        return [], []
+    results = await run_blocking(validator.validate_many, customer_ids)
+    scan_log.record_many(customer_ids, results, source, client)
+    return customer_ids, results
+
+
+def render_result(result):
+    """
+    Renders the HTML result fragment of one scan (templates/result.html).
+    """
+    with metrics.timer("qr_stage_seconds", "html_render"):
+        return Markup(templates.get_template("result.html").render(result=result))
+
+
+async def upload_file(request):
+    if request.method == "POST":
+        result = None
+        form = await request.form()
+        file = form.get("file")
+        if file and file.filename:
+            # Decode QR straight from the uploaded bytes (nothing is written to disk)
+            with metrics.timer("qr_stage_seconds", "upload_receive"):
+                data = await file.read()
+            # Read the snapshot version before validating (see RenderCache.render)
+            version = validator.snapshot_version
+            result = await scan(data, "web", request.client.host if request.client else None)
+            if result is None:
+                result = "Invalid or unreadable QR code"
+            result_html = render_cache.render("html", result, version, render_result)
+            return templates.TemplateResponse(request, "index.html", {"result": result, "result_html": result_html})
+        return templates.TemplateResponse(request, "index.html", {"result": result})
+
+    # For GET requests, don't pass any result
+    return templates.TemplateResponse(request, "index.html")
+
+
+async def webhook(request):
+    if request.method == "GET":
+        mode = request.query_params.get("hub.mode")
+        token = request.query_params.get("hub.verify_token")
+        challenge = request.query_params.get("hub.challenge")
+
+        if mode == "subscribe" and token == VERIFY_TOKEN:
+            logger.info("✅ Webhook verified!")
+            return PlainTextResponse(challenge, 200)
+        else:
+            return PlainTextResponse("❌ Verification failed", 403)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        # Not JSON (or not UTF-8): a client error, not a server one
+        logger.warning("❌ Malformed webhook payload")
+        return PlainTextResponse("❌ Malformed JSON", 400)
+    if not isinstance(data, dict):
+        return PlainTextResponse("❌ Expected a JSON object", 400)
+    logger.debug("📩 Incoming webhook: %s", data)
+
+    # Acknowledge right away; messages are processed after the response is sent
+    messages = []
+    try:
+        for entry in data.get("entry", []):
+            for changes in entry.get("changes", []):
+                for message in changes.get("value", {}).get("messages", []):
+                    if message.get("id") is not None and dedup.seen(message["id"]):
+                        logger.info("↩️ Skipped duplicate message %s", message['id'])
+                        continue
+                    messages.append(message)
+    except Exception as e:
+        logger.error("❌ Error: %s", e)
+
+    return PlainTextResponse("OK", 200, background=BackgroundTask(process_messages, messages))
+
+
+async def process_messages(messages):
+    """
+    Processes the messages of one webhook delivery concurrently.
+    """
+    await asyncio.gather(*(process_message(message) for message in messages))
+
+
+async def process_message(message):
+    """
+    Handles one WhatsApp message: fetch the image, decode & validate the QR code,
+    then reply to the sender. At most WEBHOOK_CONCURRENCY run at the same time.
+    A message that fails is forgotten by the deduplicator, so Meta's redelivery is processed.
+    """
+    async with webhook_slots:
+        try:
+            failed = await handle_message(message) is False
+        except Exception as e:
+            failed = True
+            logger.exception("❌ Error: %s", e)
+        if failed and message.get("id") is not None:
+            dedup.forget(message["id"])
+
+
+async def handle_message(message):
+    from_number = message["from"]
+    msg_type = message["type"]
+
+    if msg_type in ("image", "document"):
+        media_id = message[msg_type]["id"]
+        logger.info("📷 %s media_id: %s", msg_type.title(), media_id)
+
+        # Step 1: Get media URL
+        media_url = await graph.get_media_url(media_id)
+        if not media_url:
+            await graph.send_message(PHONE_NUMBER_ID, from_number, "❌ Failed to get image URL.")
+            return False
+
+        # Step 2: Download the image into memory
+        image_bytes = await graph.download_media(media_url)
+        if not image_bytes:
+            await graph.send_message(PHONE_NUMBER_ID, from_number, "❌ Failed to download image.")
+            return False
+
+        # Step 3: Decode every QR code (several cards may be in one photo / PDF) & validate them in one batch
+        version = validator.snapshot_version
+        customer_ids, results = await scan_all(image_bytes, "whatsapp", from_number)
+        if not results:
+            await graph.send_message(PHONE_NUMBER_ID, from_number, "❌ Invalid or unreadable QR code.")
+            return
+
+        # Step 4: Format result(s) & reply
+        with metrics.timer("qr_stage_seconds", "reply_format"):
+            replies = format_whatsapp_replies(
+                results, customer_ids, render_cache.renderer("whatsapp", version, format_whatsapp_reply)
+            )
+        for reply in replies:
+            await graph.send_message(PHONE_NUMBER_ID, from_number, reply)
+
+    else:
+        logger.info("📄 Received message type: %s", msg_type)
+        await graph.send_message(PHONE_NUMBER_ID, from_number, "📷 Please send a QR code image or PDF.")
+
+
+async def prometheus_metrics(request):
+    """
+    Per-stage latency histograms & gauges in Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+class RequestTimer(BaseHTTPMiddleware):
+    """
+    Records every request in the qr_http_request_seconds histogram.
+    """
+
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        # Label by route (not raw path) to keep the number of series bounded
+        route = request.url.path if request.url.path in ROUTE_PATHS else "unmatched"
+        metrics.observe("qr_http_request_seconds", time.perf_counter() - start,
+                        route, request.method, str(response.status_code))
+        return response
+
+
+metrics.gauge("qr_validator_snapshot_version", "Database snapshot currently served (bumped on reload).",
+              lambda: validator.get_stats()["snapshot_version"])
+metrics.gauge("qr_scan_log_queue_depth", "Scan log entries waiting to be written.",
+              lambda: scan_log.get_stats()["queue_depth"])
+metrics.gauge("qr_render_cache_size", "Rendered replies & HTML fragments held in the render cache.",
+              lambda: render_cache.get_stats()["size"])
+metrics.gauge("qr_decode_cache_size", "Payloads held in the decode cache.",
+              lambda: reader.cache.get_stats()["size"] if reader.cache else 0)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Startup: create the services, unless the importer injected its own (see init_services)
+    if graph is None:
+        init_services()
+    yield
+    # Shutdown: release pooled connections & worker pools
+    await close_services()
+
+
+routes = [
+    Route("/", upload_file, methods=["GET", "POST"]),
+    Route("/webhook", webhook, methods=["GET", "POST"]),
+    Route("/metrics", prometheus_metrics, methods=["GET"]),
+]
+ROUTE_PATHS = {route.path for route in routes}
+
+app = Starlette(routes=routes, middleware=[Middleware(RequestTimer)], lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,363 @@
+# Import required libraries
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import cv2
+import qrcode
+import numpy as np
+import pandas as pd
+from PIL import Image
+import create_database
+from QRCodeReader import QRCodeReader
+from Validator import Validator
+from RenderCache import RenderCache
+from StorageBackend import PandasBackend, SQLiteBackend, import_excel, compact_frame
+
+# Benchmark harness for QR decoding, Validator lookups and full HTTP requests.
+# Synthesizes a dataset with create_database.py's generator, renders degraded QR images,
+# and reports p50/p95/p99 latency, throughput & peak memory as JSON.
+#
+# Usage:
+#   python Benchmark.py --customers 10000 --output bench.json
+#   python Benchmark.py --customers 10000 --compare bench.json   # show changes vs a previous run
+
+
+def summarize(samples):
+    """
+    Latency summary (in milliseconds) of a list of durations in seconds.
+    """
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+        "throughput_per_s": float(len(samples) / values.sum() * 1000) if values.sum() else 0.0,
+    }
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process so far (MB).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_dataset(num_customers, seed):
+    """
+    Generates a customer & vehicle table shaped like the one read from the Excel file.
+    """
+    records = create_database.generate_records(num_customers, seed=seed, workers=None)
+    df = create_database.records_to_frame(records)
+    # No QR images were generated; Excel reads the empty image column as NaN
+    df["QR_code"] = np.nan
+    return df
+
+
+def sample_ids(customer_ids, count, miss_ratio, seed):
+    """
+    Random scan payloads: mostly existing customer_ids, some unknown ones.
+    """
+    rng = random.Random(seed)
+    known = set(customer_ids)
+    ids = []
+    for _ in range(count):
+        if rng.random() < miss_ratio:
+            candidate = str(rng.randint(1, 99999))
+            while candidate in known:
+                candidate = str(rng.randint(1, 99999))
+            ids.append(candidate)
+        else:
+            ids.append(rng.choice(customer_ids))
+    return ids
+
+
+def bench_lookups(validator, ids, batch_size):
+    """
+    Times Validator.validate per scan and Validator.validate_many per batch.
+    """
+    latencies = []
+    for customer_id in ids:
+        start = time.perf_counter()
+        validator.validate(customer_id)
+        latencies.append(time.perf_counter() - start)
+
+    batch_latencies = []
+    for i in range(0, len(ids), batch_size):
+        start = time.perf_counter()
+        validator.validate_many(ids[i:i + batch_size])
+        batch_latencies.append(time.perf_counter() - start)
+
+    return {
+        "validate": summarize(latencies),
+        "validate_many": {**summarize(batch_latencies), "batch_size": batch_size},
+        "stats": validator.get_stats(),
+    }
+
+
+def render_qr(payload):
+    """
+    Renders a QR code as a BGR image.
+    """
+    pil_img = qrcode.make(payload).convert("RGB")
+    return cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+
+
+def degrade(img, kind, rng):
+    """
+    Applies a realistic degradation to a clean QR image.
+
+    Returns:
+        tuple: (file bytes, extension)
+    """
+    if kind == "clean":
+        out = img
+    elif kind == "rotate":
+        # Tilted card with a white margin so corners stay visible
+        padded = cv2.copyMakeBorder(img, 80, 80, 80, 80, cv2.BORDER_CONSTANT, value=(255, 255, 255))
+        h, w = padded.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), rng.uniform(-25, 25), 1.0)
+        out = cv2.warpAffine(padded, matrix, (w, h), borderValue=(255, 255, 255))
+    elif kind == "blur":
+        out = cv2.GaussianBlur(img, (5, 5), 1.5)
+    elif kind == "small":
+        out = cv2.resize(img, None, fx=0.4, fy=0.4, interpolation=cv2.INTER_AREA)
+    elif kind == "photo":
+        # 12 MP phone photo with the card somewhere in a noisy scene
+        scene = np.random.default_rng(rng.randint(0, 2 ** 31)).integers(90, 200, (3000, 4000, 3), dtype=np.uint8)
+        scale = rng.uniform(2.0, 4.0)
+        card = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        y = rng.randint(0, scene.shape[0] - card.shape[0])
+        x = rng.randint(0, scene.shape[1] - card.shape[1])
+        scene[y:y + card.shape[0], x:x + card.shape[1]] = card
+        out = scene
+    elif kind == "jpeg":
+        ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 15])
+        return encoded.tobytes(), ".jpg"
+    elif kind == "pdf":
+        # 3-page statement with the QR code on the last page
+        blank = Image.new("RGB", (1240, 1754), "white")
+        last = blank.copy()
+        last.paste(Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)), (400, 600))
+        buffer = io.BytesIO()
+        blank.save(buffer, "PDF", save_all=True, append_images=[blank, last], resolution=150)
+        return buffer.getvalue(), ".pdf"
+    else:
+        raise ValueError(f"Unknown degradation: {kind}")
+
+    ok, encoded = cv2.imencode(".png", out)
+    return encoded.tobytes(), ".png"
+
+
+def build_images(customer_ids, kinds, samples, seed):
+    """
+    Renders `samples` degraded images per degradation kind.
+
+    Returns:
+        dict: kind → list of (payload, file bytes)
+    """
+    rng = random.Random(seed)
+    images = {}
+    for kind in kinds:
+        images[kind] = []
+        for _ in range(samples):
+            payload = rng.choice(customer_ids)
+            data, _ = degrade(render_qr(payload), kind, rng)
+            images[kind].append((payload, data))
+    return images
+
+
+def bench_decode(images):
+    """
+    Times QRCodeReader.smart_decode (cache disabled) per degradation kind.
+    """
+    reader = QRCodeReader(cache_size=0)
+    results = {}
+    for kind, items in images.items():
+        latencies = []
+        decoded = 0
+        try:
+            for payload, data in items:
+                start = time.perf_counter()
+                result = reader.smart_decode(data)
+                latencies.append(time.perf_counter() - start)
+                decoded += int(result == payload)
+        except Exception as e:
+            # e.g. PDFs without poppler installed
+            results[kind] = {"skipped": str(e)}
+            continue
+        results[kind] = {**summarize(latencies), "success_rate": decoded / len(items) if items else 0.0}
+    results["strategies"] = reader.get_strategy_stats()
+    return results
+
+
+def bench_requests(validator, images, ids, count, work_dir):
+    """
+    Times full Flask requests (upload page, JSON API) through the test client,
+    on an app wired to the benchmark's Validator and a scan log in `work_dir`.
+    """
+    # Don't let the import start the production services (database, watcher, scan log)
+    os.environ["WEBAPP_AUTOSTART"] = "0"
+    import WebApp
+    WebApp.init_services(validator_instance=validator,
+                         scan_log_path=os.path.join(work_dir, "scan_log.sqlite"), watch=False)
+    # Measure real decoding & rendering, not decode / render cache hits on repeated uploads
+    WebApp.reader = QRCodeReader(cache_size=0)
+    WebApp.render_cache = RenderCache(max_size=0)
+    client = WebApp.app.test_client()
+
+    uploads = [data for items in images.values() for _, data in items if not data.startswith(b"%PDF")]
+    results = {}
+    timings = {"upload_page": [], "api_scan_image": [], "api_scan_id": []}
+    for i in range(count):
+        data = uploads[i % len(uploads)]
+
+        start = time.perf_counter()
+        client.post("/", data={"file": (io.BytesIO(data), "scan.png")})
+        timings["upload_page"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.post("/api/scan", data={"file": (io.BytesIO(data), "scan.png")})
+        timings["api_scan_image"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.post("/api/scan", json={"customer_id": ids[i % len(ids)]})
+        timings["api_scan_id"].append(time.perf_counter() - start)
+
+    WebApp.scan_log.close()
+    for name, samples in timings.items():
+        results[name] = summarize(samples)
+    return results
+
+
+def compare(current, baseline_path):
+    """
+    Prints p50/p95 changes between this run and a previous JSON result.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def flatten(tree, prefix=""):
+        for key, value in tree.items():
+            if isinstance(value, dict) and "p95_ms" in value:
+                yield prefix + key, value
+            elif isinstance(value, dict):
+                yield from flatten(value, f"{prefix}{key}.")
+
+    old = dict(flatten(baseline["results"]))
+    print(f"\n{'metric':55} {'p50 ms':>18} {'p95 ms':>18}")
+    for name, new in flatten(current["results"]):
+        if name not in old:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms"):
+            change = (new[key] - old[name][key]) / old[name][key] * 100 if old[name][key] else 0.0
+            cells.append(f"{new[key]:8.3f} ({change:+6.1f}%)")
+        print(f"{name:55} {cells[0]:>18} {cells[1]:>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decode, validate & request latency.")
+    parser.add_argument("--customers", type=int, default=500, help="Customers in the synthetic dataset")
+    parser.add_argument("--lookups", type=int, default=10000, help="Scans to time per backend")
+    parser.add_argument("--miss-ratio", type=float, default=0.1, help="Share of scans with unknown ids")
+    parser.add_argument("--batch-size", type=int, default=100, help="Batch size for validate_many")
+    parser.add_argument("--backends", default="pandas,sqlite", help="Comma-separated storage backends")
+    parser.add_argument("--degradations", default="clean,rotate,blur,small,jpeg,photo,pdf",
+                        help="Comma-separated image degradations")
+    parser.add_argument("--decode-samples", type=int, default=20, help="Images per degradation")
+    parser.add_argument("--requests", type=int, default=200, help="HTTP requests per route (0 to skip)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json", help="Where to save the JSON results")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "pandas": pd.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "results": {},
+        "peak_rss_mb": {},
+    }
+    results = report["results"]
+
+    print(f"Generating {args.customers} customers...")
+    start = time.perf_counter()
+    df = build_dataset(args.customers, args.seed)
+    report["dataset"] = {"rows": len(df), "customers": args.customers, "seconds": time.perf_counter() - start}
+    report["peak_rss_mb"]["dataset"] = peak_rss_mb()
+
+    customer_ids = df["customer_id"].astype(str).unique().tolist()
+    ids = sample_ids(customer_ids, args.lookups, args.miss_ratio, args.seed)
+
+    work_dir = tempfile.mkdtemp(prefix="qr-bench-")
+    validators = {}
+    try:
+        for backend_name in args.backends.split(","):
+            print(f"Benchmarking lookups ({backend_name})...")
+            start = time.perf_counter()
+            if backend_name == "pandas":
+                # Same compact table the Validator builds
+                backend = PandasBackend(compact_frame(df))
+            elif backend_name == "sqlite":
+                db_path = os.path.join(work_dir, "bench.sqlite")
+                import_excel(None, db_path, df=df)
+                backend = SQLiteBackend(db_path)
+            else:
+                raise ValueError(f"Unknown storage backend: {backend_name}")
+            load_seconds = time.perf_counter() - start
+
+            validators[backend_name] = Validator(backend=backend)
+            results[f"lookup_{backend_name}"] = {
+                "load_seconds": load_seconds,
+                **bench_lookups(validators[backend_name], ids, args.batch_size),
+                "memory": validators[backend_name].memory_report(),
+            }
+            report["peak_rss_mb"][f"lookup_{backend_name}"] = peak_rss_mb()
+
+        print("Rendering QR images...")
+        images = build_images(customer_ids, args.degradations.split(","), args.decode_samples, args.seed)
+
+        print("Benchmarking decoding...")
+        results["decode"] = bench_decode(images)
+        report["peak_rss_mb"]["decode"] = peak_rss_mb()
+
+        if args.requests:
+            print("Benchmarking HTTP requests...")
+            validator = next(iter(validators.values()))
+            results["requests"] = bench_requests(validator, images, ids, args.requests, work_dir)
+            report["peak_rss_mb"]["requests"] = peak_rss_mb()
+    finally:
+        for validator in validators.values():
+            validator.backend.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"DONE, results are stored in ({args.output})")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
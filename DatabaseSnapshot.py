@@ -0,0 +1,354 @@
+# Import required libraries
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+from StorageBackend import expiry_ordinals
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, old snapshot versions are never removed
+    fcntl = None
+
+@contextlib.contextmanager
+def file_lock(path, shared=False, blocking=True, create=True):
+    """
+    Holds a flock() on `path`, so cooperating processes take turns (a no-op without fcntl).
+
+    Args:
+        path (str): Lock file.
+        shared (bool): Shared (reader) lock instead of an exclusive one.
+        blocking (bool): Wait for the lock (else BlockingIOError if it is held).
+        create (bool): Create the lock file if it is missing (else FileNotFoundError).
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0))
+    try:
+        fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        yield
+    finally:
+        os.close(fd)  # also releases the lock
+
+
+class DatabaseSnapshot:
+    """
+    DatabaseSnapshot class
+    - Compiles the Excel database into a compact columnar snapshot (one .npy file per column).
+    - Numbers use their smallest lossless type; text columns are stored as categorical codes
+      plus the array of their distinct values.
+    - Column files are memory-mapped on load and wrapped without copying (numbers as they are,
+      text as pd.Categorical over the mapped codes), so processes share those pages; only the
+      distinct text values are loaded into each process.
+    - Also stores the customer_id index (row offsets grouped by customer) and each customer's
+      expiration ordinal, so every worker maps them instead of rebuilding them at startup.
+    - Rebuilds the snapshot automatically when the source Excel file changes.
+    - Compiles are serialized with a file lock; an old version is only removed once no
+      process is still loading it (readers hold a shared lock on it while mapping its files).
+    """
+
+    MANIFEST = "manifest.json"
+    COMPILE_LOCK = "compile.lock"
+    READER_LOCK = "reader.lock"
+    FORMAT_VERSION = 3
+
+    def __init__(self, source_path, snapshot_dir=None):
+        """
+        Args:
+            source_path (str): Path to the Excel database (from create_database.py).
+            snapshot_dir (str): Where to store the snapshot. Defaults to "<source>.snapshot".
+        """
+        self.source_path = source_path
+        self.snapshot_dir = snapshot_dir or os.path.splitext(source_path)[0] + ".snapshot"
+        self.manifest_path = os.path.join(self.snapshot_dir, self.MANIFEST)
+        self.lock_path = os.path.join(self.snapshot_dir, self.COMPILE_LOCK)
+
+    def _read_manifest(self):
+        """
+        Returns the current manifest dict, or None if no snapshot exists yet.
+        """
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format_version") != self.FORMAT_VERSION:
+            return None
+        if not os.path.isdir(os.path.join(self.snapshot_dir, manifest["version"])):
+            return None
+        return manifest
+
+    def _source_hash(self):
+        """
+        Returns the SHA-256 of the source file contents.
+        """
+        digest = hashlib.sha256()
+        with open(self.source_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def is_stale(self):
+        """
+        Checks whether the snapshot needs rebuilding.
+        Compares mtime & size first (cheap); only hashes the source when they differ,
+        so touching the file without changing it does not trigger a rebuild.
+
+        Returns:
+            bool: True if the snapshot is missing or out of date.
+        """
+        return self._check(self._read_manifest())[0]
+
+    def _check(self, manifest):
+        """
+        is_stale() against an already-read manifest, also returning the source hash
+        when it had to be computed, so the caller does not hash the file again.
+
+        Returns:
+            tuple: (bool: stale, str or None: SHA-256 of the source if it was computed)
+        """
+        if manifest is None:
+            return True, None
+
+        stat = os.stat(self.source_path)
+        if stat.st_mtime_ns == manifest["source_mtime_ns"] and stat.st_size == manifest["source_size"]:
+            return False, None
+
+        source_sha256 = self._source_hash()
+        if source_sha256 != manifest["source_sha256"]:
+            return True, source_sha256
+
+        # Same contents, new mtime → refresh the manifest so we don't hash again next time
+        with file_lock(self.lock_path):
+            # ...unless a compile replaced it in the meantime
+            current = self._read_manifest()
+            if current is not None and current["version"] == manifest["version"]:
+                current["source_mtime_ns"] = stat.st_mtime_ns
+                current["source_size"] = stat.st_size
+                self._write_manifest(current)
+        return False, source_sha256
+
+    def _write_manifest(self, manifest):
+        """
+        Atomically replaces the manifest (write to a temp file, then rename).
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def compile(self, df=None):
+        """
+        Builds the snapshot from the Excel source.
+        Each column is stored as a NumPy array that can be memory-mapped: numbers as they are
+        (downcast when no value changes), text as integer codes (-1 for missing) into a
+        fixed-width unicode array of distinct values. Files go into a new versioned folder
+        and the manifest is swapped in last, so readers never see a half-written snapshot.
+
+        Args:
+            df (pd.DataFrame): Already-loaded source data (read from Excel if None).
+
+        Returns:
+            dict: The new manifest.
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        with file_lock(self.lock_path):
+            return self._compile(df)
+
+    def _compile(self, df, source_sha256=None):
+        """
+        compile() body; the caller holds the compile lock (and may pass the source hash).
+        """
+        start = time.perf_counter()
+        stat = os.stat(self.source_path)
+        if source_sha256 is None:
+            source_sha256 = self._source_hash()
+
+        if df is None:
+            df = pd.read_excel(self.source_path)
+
+        version = f"{source_sha256[:12]}-{time.time_ns()}"
+        version_dir = os.path.join(self.snapshot_dir, version)
+        os.makedirs(version_dir)
+        open(os.path.join(version_dir, self.READER_LOCK), "w").close()
+
+        columns = []
+        for position, column in enumerate(df.columns):
+            series = df[column]
+            file_name = f"col{position}.npy"
+            categories_file = None
+
+            if pd.api.types.is_bool_dtype(series):
+                kind = "numeric"
+                values = series.to_numpy()
+            elif pd.api.types.is_integer_dtype(series):
+                kind = "numeric"
+                values = pd.to_numeric(series, downcast="integer").to_numpy()
+            elif pd.api.types.is_float_dtype(series):
+                kind = "numeric"
+                values = series.to_numpy()
+                compact = values.astype(np.float32)
+                if ((compact.astype(np.float64) == values) | np.isnan(values)).all():
+                    values = compact
+            else:
+                kind = "text"
+                codes, categories = pd.factorize(series.astype(str).where(series.notna()))
+                # Let pandas pick the codes dtype, so load() can wrap them without a cast
+                values = pd.Categorical.from_codes(codes, categories=categories).codes
+                categories_file = f"col{position}.categories.npy"
+                np.save(os.path.join(version_dir, categories_file), np.asarray(categories, dtype=np.str_))
+
+            np.save(os.path.join(version_dir, file_name), values)
+            columns.append({"name": column, "kind": kind, "file": file_name, "categories": categories_file})
+
+        manifest = {
+            "format_version": self.FORMAT_VERSION,
+            "version": version,
+            "rows": len(df),
+            "columns": columns,
+            "index": self._save_index(df, version_dir),
+            "source_mtime_ns": stat.st_mtime_ns,
+            "source_size": stat.st_size,
+            "source_sha256": source_sha256,
+            "compile_seconds": time.perf_counter() - start,
+        }
+        self._write_manifest(manifest)
+        self._remove_old_versions(version)
+        return manifest
+
+    def _save_index(self, df, version_dir):
+        """
+        Saves the customer_id index: the distinct keys (as strings), the row offsets grouped
+        by customer, where each customer's group starts, and its expiration ordinal (from its
+        first row, parsed from the text that load() returns).
+
+        Returns:
+            dict or None: The index file names, or None if the table has no customer_id.
+        """
+        if "customer_id" not in df.columns:
+            return None
+
+        codes, keys = pd.factorize(df["customer_id"].astype(str))
+        offsets = np.argsort(codes, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(keys)))])
+        if "expiration_date" in df.columns:
+            dates = df["expiration_date"].iloc[offsets[bounds[:-1]]]
+            if not pd.api.types.is_numeric_dtype(dates):
+                dates = dates.astype(str).where(dates.notna())
+            expiry = expiry_ordinals(dates)
+        else:
+            expiry = np.full(len(keys), -1, dtype=np.int64)
+
+        files = {"keys": "index.keys.npy", "offsets": "index.offsets.npy",
+                 "bounds": "index.bounds.npy", "expiry": "index.expiry.npy"}
+        arrays = {"keys": np.asarray(keys, dtype=np.str_), "offsets": offsets, "bounds": bounds, "expiry": expiry}
+        for name, file_name in files.items():
+            np.save(os.path.join(version_dir, file_name), arrays[name])
+        return files
+
+    def _remove_old_versions(self, current):
+        """
+        Removes the version folders other than `current` that no process is loading.
+        Processes that already mapped a version keep their pages after it is removed;
+        a version still being loaded is left for the next compile.
+        """
+        if fcntl is None:
+            return
+        for name in os.listdir(self.snapshot_dir):
+            version_dir = os.path.join(self.snapshot_dir, name)
+            if name == current or not os.path.isdir(version_dir):
+                continue
+            try:
+                with file_lock(os.path.join(version_dir, self.READER_LOCK), blocking=False, create=False):
+                    shutil.rmtree(version_dir, ignore_errors=True)
+            except FileNotFoundError:
+                # Older snapshot format without a reader lock: nobody can be loading it
+                shutil.rmtree(version_dir, ignore_errors=True)
+            except BlockingIOError:
+                continue
+
+    def load(self, mmap=True, with_index=False):
+        """
+        Loads the snapshot as a DataFrame, compiling it first if it is missing or stale.
+        The source is hashed at most once per call.
+
+        Args:
+            mmap (bool): Memory-map the column files instead of reading them into RAM.
+            with_index (bool): Also return the stored customer_id index & expiration ordinals.
+
+        Returns:
+            pd.DataFrame: The customer & vehicle table; with `with_index`, a tuple
+                          (DataFrame, dict of PandasBackend keyword arguments "index" & "expiry",
+                          empty if the table has no customer_id).
+        """
+        while True:
+            manifest = self._read_manifest()
+            stale, source_sha256 = self._check(manifest)
+            if stale:
+                os.makedirs(self.snapshot_dir, exist_ok=True)
+                with file_lock(self.lock_path):
+                    if source_sha256 is None:
+                        source_sha256 = self._source_hash()
+                    # Another process may have compiled it while we waited
+                    manifest = self._read_manifest()
+                    if manifest is None or manifest["source_sha256"] != source_sha256:
+                        manifest = self._compile(None, source_sha256)
+
+            version_dir = os.path.join(self.snapshot_dir, manifest["version"])
+            reader_lock = os.path.join(version_dir, self.READER_LOCK)
+            try:
+                with file_lock(reader_lock, shared=True, create=False):
+                    # A compile removed this version while we waited for the lock → use the new one
+                    if fcntl is None or os.path.exists(reader_lock):
+                        df = self._load_version(manifest, version_dir, mmap)
+                        if not with_index:
+                            return df
+                        return df, self._load_index(manifest, version_dir, mmap)
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self, manifest, version_dir, mmap):
+        """
+        Maps the stored customer_id index: each customer's offsets are a view into one
+        shared offsets array.
+        """
+        files = manifest["index"]
+        if files is None:
+            return {}
+        arrays = {name: np.load(os.path.join(version_dir, file_name), mmap_mode="r" if mmap else None)
+                  for name, file_name in files.items()}
+        keys = arrays["keys"].tolist()
+        groups = np.split(np.asarray(arrays["offsets"]), arrays["bounds"][1:-1])
+        return {"index": dict(zip(keys, groups)), "expiry": dict(zip(keys, arrays["expiry"].tolist()))}
+
+    def _load_version(self, manifest, version_dir, mmap):
+        """
+        Maps the column files of one snapshot version into a DataFrame.
+        """
+        mmap_mode = "r" if mmap else None
+
+        data = {}
+        for column in manifest["columns"]:
+            values = np.load(os.path.join(version_dir, column["file"]), mmap_mode=mmap_mode)
+            if column["kind"] == "text":
+                categories = np.load(os.path.join(version_dir, column["categories"]))
+                values = pd.Categorical.from_codes(values, categories=pd.Index(categories.astype(object)))
+            data[column["name"]] = values
+
+        return pd.DataFrame(data, copy=False)
+
+
+if __name__ == "__main__":
+    # Compile step: python DatabaseSnapshot.py [customers_with_vehicles.xlsx]
+    source = sys.argv[1] if len(sys.argv) > 1 else "customers_with_vehicles.xlsx"
+    snapshot = DatabaseSnapshot(source)
+    manifest = snapshot.compile()
+    print(f"DONE, compiled {manifest['rows']} rows into ({snapshot.snapshot_dir}) "
+          f"in {manifest['compile_seconds']:.2f}s")
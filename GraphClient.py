@@ -0,0 +1,322 @@
+# Import required libraries
+import time
+import random
+import logging
+import asyncio
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class GraphClient:
+    """
+    GraphClient class
+    - Shared HTTP client for the WhatsApp Graph API calls.
+    - Keeps connections alive in a pool, so calls don't pay a new TCP+TLS handshake each time.
+    - Applies timeouts and retries with exponential backoff on 429 / 5xx; a Retry-After
+      longer than `max_backoff` is not waited for (the rate-limited response is returned).
+    - Streams media downloads straight into memory.
+    - Tracks per-endpoint call counts & latency.
+    """
+
+    # Statuses worth retrying (rate limited / transient server errors)
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url, access_token, timeout=(3.05, 10.0), max_retries=3,
+                 backoff=0.5, pool_size=20, max_download_bytes=16 * 1024 * 1024, max_backoff=30.0):
+        """
+        Args:
+            base_url (str): Graph API base URL (e.g. https://graph.facebook.com/v18.0).
+            access_token (str): WhatsApp Business access token.
+            timeout (float or tuple): Requests timeout, (connect, read) seconds.
+            max_retries (int): Retries after the first attempt.
+            backoff (float): Base delay in seconds; doubled after every retry (plus jitter).
+            pool_size (int): Max pooled connections per host.
+            max_download_bytes (int): Media larger than this is rejected.
+            max_backoff (float): Longest wait before a retry, in seconds.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_download_bytes = max_download_bytes
+
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+        self.session = self._create_session(access_token, pool_size)
+
+    def _create_session(self, access_token, pool_size):
+        """
+        Creates the pooled requests session used for every call.
+        """
+        session = requests.Session()
+        session.headers["Authorization"] = f"Bearer {access_token}"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _record(self, endpoint, elapsed, ok, retried):
+        """
+        Updates the per-endpoint counters.
+        """
+        metrics.observe("qr_graph_request_seconds", elapsed, endpoint, "ok" if ok else "error")
+        with self._stats_lock:
+            stats = self.stats.setdefault(endpoint, {
+                "calls": 0, "errors": 0, "retries": 0, "seconds_total": 0.0, "seconds_max": 0.0,
+            })
+            stats["calls"] += 1
+            stats["errors"] += int(not ok)
+            stats["retries"] += int(retried)
+            stats["seconds_total"] += elapsed
+            stats["seconds_max"] = max(stats["seconds_max"], elapsed)
+
+    def get_stats(self):
+        """
+        Returns per-endpoint calls, errors, retries & latency (avg / max).
+        """
+        with self._stats_lock:
+            stats = {endpoint: dict(values) for endpoint, values in self.stats.items()}
+        for values in stats.values():
+            values["seconds_avg"] = values["seconds_total"] / values["calls"] if values["calls"] else 0.0
+        return stats
+
+    def _retry_delay(self, attempt, response):
+        """
+        Backoff before the next attempt, at most `max_backoff` seconds; honors Retry-After
+        on 429 responses.
+
+        Returns:
+            float or None: Seconds to wait, or None to give up (the server asked for
+                           a longer wait than max_backoff, which would hold a worker).
+        """
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+                return delay if delay <= self.max_backoff else None
+        return min(self.backoff * (2 ** attempt) * (1 + random.random() * 0.1), self.max_backoff)
+
+    def _should_retry(self, method, status_code, connect_failed, attempt):
+        """
+        Decides whether to retry. POSTs are only retried when the server surely
+        didn't process them (429 or connection failure), so messages are never sent twice.
+
+        Args:
+            method (str): HTTP method.
+            status_code (int): Response status, or None if no response was received.
+            connect_failed (bool): True if the connection could not be established.
+            attempt (int): Attempts already made minus one.
+        """
+        if attempt >= self.max_retries:
+            return False
+        if status_code is None:
+            return connect_failed or method == "GET"
+        return status_code == 429 or (method == "GET" and status_code in self.RETRY_STATUSES)
+
+    @staticmethod
+    def _message_payload(to, message):
+        """
+        Builds the JSON body of a WhatsApp text message.
+        """
+        return {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {"body": message}
+        }
+
+    def _request(self, endpoint, method, url, **kwargs):
+        """
+        Sends a request with timeout & bounded retries (see _should_retry()).
+
+        Returns:
+            requests.Response: Last response received.
+        """
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            response = None
+            error = None
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            will_retry = self._should_retry(
+                method,
+                response.status_code if response is not None else None,
+                # ConnectTimeout is also a ConnectionError: nothing reached the server
+                isinstance(error, requests.ConnectionError),
+                attempt,
+            )
+            delay = self._retry_delay(attempt, response) if will_retry else None
+            will_retry = delay is not None
+            ok = response is not None and response.ok
+            self._record(endpoint, time.perf_counter() - start, ok, will_retry)
+
+            if not will_retry:
+                if response is None:
+                    raise error
+                return response
+
+            if response is not None:
+                # Release the connection back to the pool before sleeping
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get_media_url(self, media_id):
+        """
+        Returns the download URL of a WhatsApp media item (None on failure).
+        """
+        r = self._request("media_url", "GET", f"{self.base_url}/{media_id}", params={"fields": "url"})
+        if r.ok:
+            return r.json().get("url")
+        logger.error("❌ Failed to get media URL: %s", r.text)
+        return None
+
+    def download_media(self, url, chunk_size=64 * 1024):
+        """
+        Streams a media file into memory.
+
+        Returns:
+            bytearray or None: File contents, or None on failure / oversized media.
+        """
+        r = self._request("media_download", "GET", url, stream=True)
+        with r:
+            if not r.ok:
+                logger.error("❌ Failed to download media: %s", r.status_code)
+                return None
+
+            length = r.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > self.max_download_bytes:
+                logger.error("❌ Media too large: %s bytes", length)
+                return None
+
+            content = bytearray()
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                content += chunk
+                if len(content) > self.max_download_bytes:
+                    logger.error("❌ Media too large")
+                    return None
+        return content
+
+    def send_message(self, phone_number_id, to, message):
+        """
+        Sends a WhatsApp text message.
+
+        Returns:
+            bool: True if the Graph API accepted the message.
+        """
+        data = self._message_payload(to, message)
+        r = self._request("send_message", "POST", f"{self.base_url}/{phone_number_id}/messages", json=data)
+        if r.ok:
+            logger.info("✅ Reply sent!")
+        else:
+            logger.error("❌ Failed to send message: %s", r.text)
+        return r.ok
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncGraphClient(GraphClient):
+    """
+    AsyncGraphClient class
+    - asyncio version of GraphClient (same retries, limits & stats) built on httpx,
+      so many Graph API calls can be awaited concurrently.
+    """
+
+    def _create_session(self, access_token, pool_size):
+        """
+        Creates the pooled httpx client used for every call.
+        """
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        return httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {access_token}"},
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def _request(self, endpoint, method, url, stream=False, **kwargs):
+        """
+        Sends a request with timeout & bounded retries (see GraphClient._should_retry()).
+        With stream=True the response body is left unread (caller must close it).
+        """
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            response = None
+            error = None
+            try:
+                request = self.session.build_request(method, url, **kwargs)
+                response = await self.session.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.TimeoutException, httpx.NetworkError) as e:
+                error = e
+
+            will_retry = self._should_retry(
+                method,
+                response.status_code if response is not None else None,
+                isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)),
+                attempt,
+            )
+            delay = self._retry_delay(attempt, response) if will_retry else None
+            will_retry = delay is not None
+            ok = response is not None and response.is_success
+            self._record(endpoint, time.perf_counter() - start, ok, will_retry)
+
+            if not will_retry:
+                if response is None:
+                    raise error
+                return response
+
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get_media_url(self, media_id):
+        r = await self._request("media_url", "GET", f"{self.base_url}/{media_id}", params={"fields": "url"})
+        if r.is_success:
+            return r.json().get("url")
+        logger.error("❌ Failed to get media URL: %s", r.text)
+        return None
+
+    async def download_media(self, url, chunk_size=64 * 1024):
+        r = await self._request("media_download", "GET", url, stream=True)
+        try:
+            if not r.is_success:
+                logger.error("❌ Failed to download media: %s", r.status_code)
+                return None
+
+            length = r.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > self.max_download_bytes:
+                logger.error("❌ Media too large: %s bytes", length)
+                return None
+
+            content = bytearray()
+            async for chunk in r.aiter_bytes(chunk_size=chunk_size):
+                content += chunk
+                if len(content) > self.max_download_bytes:
+                    logger.error("❌ Media too large")
+                    return None
+            return content
+        finally:
+            await r.aclose()
+
+    async def send_message(self, phone_number_id, to, message):
+        data = self._message_payload(to, message)
+        r = await self._request("send_message", "POST", f"{self.base_url}/{phone_number_id}/messages", json=data)
+        if r.is_success:
+            logger.info("✅ Reply sent!")
+        else:
+            logger.error("❌ Failed to send message: %s", r.text)
+        return r.is_success
+
+    async def close(self):
+        await self.session.aclose()
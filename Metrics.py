@@ -0,0 +1,156 @@
+# Import required libraries
+import os
+import time
+import bisect
+import threading
+import contextlib
+
+class Histogram:
+    """
+    Histogram class
+    - Counts observations (seconds) into fixed cumulative buckets, per label set.
+    - Thread-safe; observe() is a lock, a bisect and three additions.
+    """
+
+    def __init__(self, name, help_text, label_names=(), buckets=None):
+        """
+        Args:
+            name (str): Metric name (Prometheus naming, e.g. qr_stage_seconds).
+            help_text (str): One-line description shown in /metrics.
+            label_names (tuple): Names of the labels passed to observe().
+            buckets (tuple): Upper bounds of the buckets, ascending (+Inf is implicit).
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets or MetricsRegistry.DEFAULT_BUCKETS)
+        self._series = {}  # label values → [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """
+        Records one observation for the given label values (in label_names order).
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """
+        Returns the histogram in Prometheus text exposition format.
+        """
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = ",".join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """
+    MetricsRegistry class
+    - Holds the latency histograms of the scan pipeline and renders them for /metrics.
+    - Gauges are read from callbacks at scrape time (queue depth, cache hits...).
+    - Observations are process-local: decode_many() worker processes are not included.
+    """
+
+    # Seconds; from sub-millisecond index lookups up to multi-second PDF renders
+    DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                       0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, enabled=True):
+        """
+        Args:
+            enabled (bool): If False, observe() and timer() do nothing.
+        """
+        self.enabled = enabled
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, label_names=(), buckets=None):
+        """
+        Registers a histogram (or returns the one already registered under `name`).
+        """
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help_text, label_names, buckets)
+            return self._histograms[name]
+
+    def gauge(self, name, help_text, callback):
+        """
+        Registers a gauge whose value is read from `callback()` at scrape time.
+        """
+        with self._lock:
+            self._gauges[name] = (help_text, callback)
+
+    def observe(self, name, seconds, *label_values):
+        """
+        Records a duration in a registered histogram.
+        """
+        if self.enabled:
+            self._histograms[name].observe(seconds, *label_values)
+
+    @contextlib.contextmanager
+    def timer(self, name, *label_values):
+        """
+        Times the enclosed block into a registered histogram.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, *label_values)
+
+    def render(self):
+        """
+        Returns every metric in Prometheus text exposition format.
+        """
+        with self._lock:
+            histograms = list(self._histograms.values())
+            gauges = list(self._gauges.items())
+
+        blocks = [histogram.render() for histogram in histograms]
+        for name, (help_text, callback) in gauges:
+            try:
+                value = float(callback())
+            except Exception:
+                # A failing collector must not break the whole scrape
+                continue
+            blocks.append(f"# HELP {name} {help_text}\n# TYPE {name} gauge\n{name} {value}")
+        return "\n".join(blocks) + "\n"
+
+
+def _escape(value):
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# Shared registry used across the pipeline (set METRICS_ENABLED=0 to turn recording off)
+metrics = MetricsRegistry(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
+
+metrics.histogram("qr_stage_seconds", "Duration of each scan pipeline stage.", ("stage",))
+metrics.histogram("qr_decode_strategy_seconds", "Duration of each QR decode strategy attempt.",
+                  ("strategy", "result"))
+metrics.histogram("qr_graph_request_seconds", "Duration of WhatsApp Graph API calls (per attempt).",
+                  ("endpoint", "outcome"))
+metrics.histogram("qr_http_request_seconds", "Duration of HTTP requests served by the web app.",
+                  ("route", "method", "status"))
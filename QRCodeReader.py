@@ -1,8 +1,110 @@
 # Import required libraries
 import cv2
-from pdf2image import convert_from_path
+import copy
+from pdf2image import convert_from_path, pdfinfo_from_path
 import numpy as np
 import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DecodeCache:
+    """
+    DecodeCache class
+    - Bounded LRU cache of decoded QR payloads keyed by the SHA-256 of the file contents.
+    - Entries expire after `ttl` seconds.
+    - Thread-safe (Flask serves requests from several threads).
+    """
+
+    def __init__(self, max_size=1024, ttl=600.0):
+        """
+        Args:
+            max_size (int): Maximum number of cached payloads (least recently used are evicted).
+            ttl (float): Seconds an entry stays valid.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key → (stored_at, payload)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def key_for(content):
+        """
+        Returns the cache key for raw file bytes.
+        """
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, key):
+        """
+        Returns (found, payload). `payload` may be None for files known to hold no QR code.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return False, None
+            stored_at, payload = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return True, payload
+
+    def put(self, key, payload):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        return stats
+
+
+# Reader owned by each decode_many() worker process (see _init_worker)
+_worker_reader = None
+
+
+def _init_worker(config):
+    """
+    Process-pool initializer: gives each worker its own QRCodeReader
+    (and so its own cv2.QRCodeDetector).
+    """
+    global _worker_reader
+    # One OpenCV thread per worker, the pool already provides the parallelism
+    cv2.setNumThreads(1)
+    _worker_reader = QRCodeReader(**config)
+
+
+def _decode_worker(item):
+    """
+    Decodes one decode_many() item inside a worker process.
+    `item` is a file path or the raw bytes of an image / PDF.
+    """
+    return _worker_reader.smart_decode(item)
+
 
 class QRCodeReader:
     """
@@ -10,37 +112,403 @@ class QRCodeReader:
     - Reads & decodes QR codes from image or PDF.
     - Uses OpenCV for detection & decoding.
     - Supports fallback strategies if detection fails initially.
+    - Locates codes on a downscaled copy of large images, then decodes only that region.
+    - Decodes batches of files in parallel on a process pool (decode_many).
+    - Optionally caches decoded payloads by file content, so resubmitted images skip OpenCV.
+    - Renders PDFs one page at a time (low DPI first) and stops at the first QR code.
+    - Multi-code mode (decode_all) returns every QR code of a photo or of all PDF pages.
+    - Video frames (decode_frame) are searched around the last known code position first.
     """
 
-    def __init__(self):
+    # Decode strategies, tried in order until one succeeds
+    STRATEGIES = ["original", "grayscale", "otsu", "adaptive", "sharpen"]
+
+    # Kernel used by the "sharpen" strategy
+    SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+
+    def __init__(self, cache_size=1024, cache_ttl=600.0, pdf_dpi=100, pdf_retry_dpi=200,
+                 max_detect_side=1024, roi_margin=0.25, strategies=None):
+        """
+        Args:
+            cache_size (int): Max cached payloads; 0 disables the decode cache.
+            cache_ttl (float): Seconds a cached payload stays valid.
+            pdf_dpi (int): DPI for the first render of each PDF page.
+            pdf_retry_dpi (int): DPI to re-render a page at when nothing was found (None to disable).
+            max_detect_side (int): Images larger than this (longest side, px) are first searched downscaled.
+            roi_margin (float): Margin around the located code, as a fraction of its size.
+            strategies (list): Order of decode strategies (defaults to STRATEGIES).
+        """
         # Initialize OpenCV QR code detector
         self.detector = cv2.QRCodeDetector()
+        # Multi-code mode uses the ArUco-based detector when available (OpenCV >= 4.8):
+        # it finds more of the codes in a crowded frame than the classic one
+        self.multi_detector = cv2.QRCodeDetectorAruco() if hasattr(cv2, "QRCodeDetectorAruco") else self.detector
+        self.cache = DecodeCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self.pdf_dpi = pdf_dpi
+        self.pdf_retry_dpi = pdf_retry_dpi
+        self.max_detect_side = max_detect_side
+        self.roi_margin = roi_margin
+        self.strategies = list(strategies or self.STRATEGIES)
+
+        # Per-strategy success/latency counters
+        self._stats_lock = threading.Lock()
+        self.strategy_stats = {}
+
+        # Per-thread report of the last PDF decode (timings & memory)
+        self._local = threading.local()
+
+        # Settings handed to decode_many() workers (they don't need their own cache)
+        self._worker_config = {
+            "cache_size": 0,
+            "pdf_dpi": pdf_dpi,
+            "pdf_retry_dpi": pdf_retry_dpi,
+            "max_detect_side": max_detect_side,
+            "roi_margin": roi_margin,
+            "strategies": self.strategies,
+        }
+        self._pool = None
+        self._pool_lock = threading.Lock()
 
-    def smart_decode(self, file_path, return_image=False):
+    def smart_decode(self, source, return_image=False):
         """
         Detects file type (image or PDF) and decodes QR code accordingly.
         
         Args:
-            file_path (str): Path to the file to process.
+            source (str, bytes or file-like): Path to the file to process, or its contents
+                                              (e.g. an uploaded file) so nothing is written to disk.
             return_image (bool): If True, returns cropped QR code region as well.
 
         Returns:
             str or tuple: Decoded QR code string (or None), optionally with image.
         """
+        with metrics.timer("qr_stage_seconds", "decode"):
+            if isinstance(source, (str, os.PathLike)):
+                # The cache only holds payloads, so requests for the cropped image bypass it
+                if self.cache is None or return_image:
+                    return self._decode_file(source, return_image)
+                # Read once: the same bytes are hashed and decoded
+                with open(source, 'rb') as f:
+                    buffer = f.read()
+                path = source
+            else:
+                buffer = self._to_buffer(source)
+                if self.cache is None or return_image:
+                    return self._decode_buffer(buffer, return_image)
+                path = None
+
+            key = DecodeCache.key_for(buffer)
+            found, payload = self.cache.get(key)
+            if found:
+                return payload
+
+            payload = self._decode_buffer(buffer, return_image, path)
+            self.cache.put(key, payload)
+            return payload
+
+    def _to_buffer(self, source):
+        """
+        Returns the contents of bytes or a file-like object as a buffer,
+        without copying when the object exposes its memory (bytes, BytesIO).
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return memoryview(source)
+        if hasattr(source, 'getbuffer'):
+            return source.getbuffer()
+        return memoryview(source.read())
+
+    def _decode_buffer(self, buffer, return_image, path=None):
+        """
+        Decodes an in-memory file (image or PDF, detected from its header).
+        Images are decoded with cv2.imdecode over a zero-copy NumPy view of the buffer.
+        PDFs are rendered from `path` when the buffer was read from a file, and
+        from a temporary copy otherwise.
+        """
+        if len(buffer) == 0:
+            return (None, None) if return_image else None
+
+        if bytes(buffer[:5]) == b'%PDF-':
+            if path is not None:
+                return self._decode_pdf(path, return_image)
+            return self._decode_pdf_bytes(buffer, self._decode_pdf, return_image)
+
+        img = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._decode_image(img, return_image)
+
+    def _decode_pdf_bytes(self, buffer, decode, *args):
+        """
+        Decodes an in-memory PDF with `decode(path, *args)`. Poppler only reads from files,
+        so the document is written once to a private temporary file (unique name,
+        removed afterwards) and then rendered page by page.
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(buffer)
+            return decode(tmp_path, *args)
+        finally:
+            os.remove(tmp_path)
+
+    def decode_many(self, items, timeout=None, ordered=True, max_workers=None):
+        """
+        Decodes many files in parallel on a process pool (one QR detector per worker),
+        so CPU-bound decoding uses every core.
+
+        Args:
+            items (list): File paths and/or raw image / PDF bytes.
+            timeout (float): Max seconds for the whole batch, counted from this call; items
+                             still pending after that are reported as None. Their futures
+                             are cancelled, but a decode that already started keeps its
+                             worker busy until it finishes (cancel() can't stop it).
+            ordered (bool): If True, returns a list in input order.
+                            If False, returns a generator of (index, result) as items complete.
+            max_workers (int): Pool size on first use (defaults to the CPU count).
+
+        Returns:
+            list or generator: Decoded strings (None when unreadable, failed or timed out).
+        """
+        # memoryviews can't be pickled to the workers (from here on, raw items are bytes or bytearray)
+        items = [bytes(item) if isinstance(item, memoryview) else item for item in items]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pool = self._get_pool(max_workers)
+        futures = {}
+        cached = {}
+
+        for index, item in enumerate(items):
+            # Serve raw-bytes items from the decode cache without touching the pool
+            if self.cache is not None and isinstance(item, (bytes, bytearray)):
+                found, payload = self.cache.get(DecodeCache.key_for(item))
+                if found:
+                    cached[index] = payload
+                    continue
+            futures[pool.submit(_decode_worker, item)] = index
+
+        stream = self._collect(futures, items, cached, deadline)
+        if not ordered:
+            return stream
+
+        results = [None] * len(items)
+        for index, payload in stream:
+            results[index] = payload
+        return results
+
+    def _collect(self, futures, items, cached, deadline):
+        """
+        Yields (index, result) for cached items, then for pool futures as they complete
+        (until `deadline`, a time.monotonic() value, if not None).
+        """
+        for index, payload in cached.items():
+            yield index, payload
+
+        pending = set(futures)
+        while pending:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                # Nothing finished in time → give up on the rest
+                for future in pending:
+                    future.cancel()
+                    yield futures[future], None
+                return
+
+            for future in done:
+                index = futures[future]
+                try:
+                    payload = future.result()
+                except Exception as e:
+                    logger.error("❌ Decode failed: %s", e)
+                    if isinstance(e, BrokenProcessPool):
+                        # A worker died; start a fresh pool on the next call
+                        self.close()
+                    payload = None
+                else:
+                    if self.cache is not None and isinstance(items[index], (bytes, bytearray)):
+                        self.cache.put(DecodeCache.key_for(items[index]), payload)
+                yield index, payload
+
+    def _get_pool(self, max_workers=None):
+        """
+        Returns the decode_many() process pool, creating it on first use.
+        Workers are spawned (not forked) so they don't inherit OpenCV's thread state.
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._worker_config,),
+                )
+            return self._pool
+
+    def close(self):
+        """
+        Shuts down the decode_many() process pool.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def decode_all(self, source):
+        """
+        Multi-code mode: finds every QR code in a photo, or in all pages of a PDF
+        (e.g. several membership cards scanned together).
+
+        Args:
+            source (str, bytes or file-like): Path to the file to process, or its contents.
+
+        Returns:
+            list: One dict per code, in page & reading order:
+                  {"data": str, "page": int, "bbox": [x, y, width, height], "dpi": int or None}
+                  The bbox is in pixels of the image, or of the page rendered at "dpi" for PDFs.
+        """
+        with metrics.timer("qr_stage_seconds", "decode_all"):
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, 'rb') as f:
+                    buffer = f.read()
+            else:
+                buffer = self._to_buffer(source)
+
+            if self.cache is None:
+                return self._decode_all_buffer(buffer)
+
+            # Own key space: the single-code cache entry only holds the first payload
+            key = DecodeCache.key_for(buffer) + ":all"
+            found, codes = self.cache.get(key)
+            if not found:
+                codes = self._decode_all_buffer(buffer)
+                self.cache.put(key, codes)
+            # Callers get their own copy of the cached list
+            return copy.deepcopy(codes)
+
+    def _decode_all_buffer(self, buffer):
+        """
+        decode_all() for an in-memory image or PDF.
+        """
+        if len(buffer) == 0:
+            return []
+
+        if bytes(buffer[:5]) == b'%PDF-':
+            return self._decode_pdf_bytes(buffer, self._decode_all_pdf)
+
+        img = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._find_all(img, page=1, dpi=None)
+
+    def _decode_all_pdf(self, file_path):
+        """
+        decode_all() for a PDF: every page is rendered on its own (re-rendered at
+        pdf_retry_dpi only if nothing was found) and searched for all its codes.
+        """
+        codes = []
+        page_count = pdfinfo_from_path(file_path)["Pages"]
+        for page_number in range(1, page_count + 1):
+            for dpi in self._pdf_dpis():
+                with metrics.timer("qr_stage_seconds", "pdf_render"):
+                    pil_page = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+                    img = self._pil_to_cv2(pil_page)
+                    del pil_page
+
+                page_codes = self._find_all(img, page=page_number, dpi=dpi)
+                del img
+                if page_codes:
+                    codes.extend(page_codes)
+                    break
+        return codes
+
+    def _find_all(self, img, page, dpi):
+        """
+        Finds every QR code in one image (photo or rendered PDF page):
+        1. large images: locate all codes downscaled, decode each region at full resolution;
+        2. whole frame: multi-code detection over the strategies, until one reads
+           every code it detects;
+        3. nothing found: the single-code pass, which also catches lone small/blurry codes.
+
+        Returns:
+            list: decode_all()-style dicts, sorted top-to-bottom, left-to-right.
+        """
+        if img is None:
+            return []
+
+        found = {}  # data → corner points (a card read by several passes is listed once)
+
+        for x_offset, y_offset, roi in self._locate_regions(img) or []:
+            data, points = self._run_strategies(roi)
+            if data and data not in found:
+                found[data] = points.reshape(-1, 2) + np.array([x_offset, y_offset], dtype=points.dtype)
+
+        if not found:
+            variants = {}
+            for name in self.strategies:
+                start = time.perf_counter()
+                variant = self._variant(name, img, variants)
+                detected, decoded, points, _ = self.multi_detector.detectAndDecodeMulti(variant)
+                decoded = decoded if detected else ()
+                for data, corners in zip(decoded, points if points is not None else []):
+                    if data and data not in found:
+                        found[data] = corners.reshape(-1, 2)
+                self._record_strategy(f"multi_{name}", time.perf_counter() - start, any(decoded))
+                if decoded and all(decoded):
+                    # Every detected code was read; other variants can't add anything
+                    break
+
+        if not found:
+            data, points = self._decode_single(img)
+            if data:
+                found[data] = points.reshape(-1, 2)
+
+        codes = []
+        for data, corners in found.items():
+            codes.append({"data": data, "page": page, "bbox": self._bbox(corners), "dpi": dpi})
+        codes.sort(key=lambda code: (code["bbox"][1], code["bbox"][0]))
+        return codes
+
+    def decode_frame(self, img, hint=None):
+        """
+        Decodes one video frame, searching the `hint` region first (e.g. where the
+        code was in the previous frame) before falling back to the whole frame.
+
+        Args:
+            img (np.ndarray): BGR frame.
+            hint (list): [x, y, width, height] region to try first (None to skip).
+
+        Returns:
+            tuple: (data, bbox) — bbox is [x, y, width, height]; (None, None) if nothing was found.
+        """
+        if img is None:
+            return None, None
+
+        if hint is not None:
+            x, y, width, height = hint
+            region = self._crop_region(img, np.array([[x, y], [x + width, y + height]], dtype=np.float32))
+            if region is not None:
+                x_offset, y_offset, roi = region
+                data, points = self._run_strategies(roi)
+                if data:
+                    return data, self._bbox(points.reshape(-1, 2) + np.array([x_offset, y_offset], dtype=points.dtype))
+
+        data, points = self._decode_single(img)
+        if data:
+            return data, self._bbox(points.reshape(-1, 2))
+        return None, None
+
+    @staticmethod
+    def _bbox(corners):
+        """
+        Bounding box [x, y, width, height] (ints, clipped at 0) of a code's corner points.
+        """
+        x_min, y_min = np.floor(corners.min(axis=0)).astype(int)
+        x_max, y_max = np.ceil(corners.max(axis=0)).astype(int)
+        return [int(max(x_min, 0)), int(max(y_min, 0)), int(x_max - x_min), int(y_max - y_min)]
+
+    def _decode_file(self, file_path, return_image):
+        """
+        Detects file type (image or PDF) and decodes it with OpenCV (no caching).
+        """
         # Determine the file extension
         ext = os.path.splitext(file_path)[1].lower()
 
         if ext == '.pdf':
-            # Handle PDF: convert all pages to images and try decoding each
-            pil_pages = convert_from_path(file_path)
-            for pil_page in pil_pages:
-                img = self._pil_to_cv2(pil_page)
-                result = self._decode_image(img, return_image)
-                if (return_image and result[0]) or (not return_image and result):
-                    # Return as soon as a QR is detected
-                    return result
-            # If no QR found in any page
-            return (None, None) if return_image else None
+            return self._decode_pdf(file_path, return_image)
 
         else:
             # Assume it's an image file
@@ -48,10 +516,76 @@ class QRCodeReader:
             result = self._decode_image(img, return_image)
             return result
 
+    def _decode_pdf(self, file_path, return_image):
+        """
+        Decodes a PDF page by page: each page is rendered on its own at `pdf_dpi`,
+        re-rendered at `pdf_retry_dpi` only if no QR was found, and released before
+        the next one. Stops at the first page containing a QR code.
+        Timings & peak raster size are available through last_pdf_report().
+        """
+        report = {"pages": [], "peak_image_bytes": 0, "total_seconds": 0.0}
+        self._local.pdf_report = report
+        start = time.perf_counter()
+
+        page_count = pdfinfo_from_path(file_path)["Pages"]
+        try:
+            for page_number in range(1, page_count + 1):
+                for dpi in self._pdf_dpis():
+                    render_start = time.perf_counter()
+                    pil_page = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+                    img = self._pil_to_cv2(pil_page)
+                    del pil_page
+                    render_seconds = time.perf_counter() - render_start
+                    metrics.observe("qr_stage_seconds", render_seconds, "pdf_render")
+
+                    decode_start = time.perf_counter()
+                    result = self._decode_image(img, return_image)
+                    found = bool(result[0]) if return_image else bool(result)
+
+                    report["peak_image_bytes"] = max(report["peak_image_bytes"], img.nbytes)
+                    report["pages"].append({
+                        "page": page_number,
+                        "dpi": dpi,
+                        "render_seconds": render_seconds,
+                        "decode_seconds": time.perf_counter() - decode_start,
+                        "found": found,
+                    })
+                    del img
+
+                    if found:
+                        # Return as soon as a QR is detected
+                        return result
+        finally:
+            report["total_seconds"] = time.perf_counter() - start
+
+        # If no QR found in any page
+        return (None, None) if return_image else None
+
+    def _pdf_dpis(self):
+        """
+        DPIs to render a PDF page at: pdf_dpi, then pdf_retry_dpi if nothing was found.
+        """
+        dpis = [self.pdf_dpi]
+        if self.pdf_retry_dpi and self.pdf_retry_dpi != self.pdf_dpi:
+            dpis.append(self.pdf_retry_dpi)
+        return dpis
+
+    def last_pdf_report(self):
+        """
+        Returns the timing & memory report of the last PDF decoded by this thread.
+
+        Returns:
+            dict or None: {"pages": [{page, dpi, render_seconds, decode_seconds, found}, ...],
+                           "peak_image_bytes": int, "total_seconds": float}
+        """
+        return getattr(self._local, "pdf_report", None)
+
     def _decode_image(self, img, return_image):
         """
         Tries to decode QR code from the given image using different strategies.
-        If initial detection fails, applies adaptive techniques to improve chances.
+        Large images are first searched at a reduced size; only the located region
+        is then decoded at full resolution, running the fallback strategies
+        (grayscale, thresholding, sharpening...) on that region instead of the whole frame.
         
         Args:
             img (np.ndarray): Image array.
@@ -60,35 +594,186 @@ class QRCodeReader:
         Returns:
             str or tuple: Decoded data (and optionally image) or None.
         """
-        # Try decoding as-is
-        data, points, _ = self.detector.detectAndDecode(img)
+        if img is None:
+            # Unreadable image
+            return (None, None) if return_image else None
 
+        data, points = self._decode_single(img)
         if data:
             if return_image:
                 cropped = self._extract_qr_region(img, points)
                 return data, cropped
             return data
 
-        # If failed: try grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        data, points, _ = self.detector.detectAndDecode(gray)
-        if data:
-            if return_image:
-                cropped = self._extract_qr_region(img, points)
-                return data, cropped
-            return data
+        # No QR found
+        return (None, None) if return_image else None
+
+    def _decode_single(self, img):
+        """
+        Single-code decode: coarse-to-fine for large images, then the whole frame.
+
+        Returns:
+            tuple: (data, points) — points in full-image coordinates; data is None if nothing was found.
+        """
+        height, width = img.shape[:2]
+        scale = self.max_detect_side / max(height, width)
+        if scale >= 1:
+            # Small image: every strategy on the whole frame
+            return self._run_strategies(img)
 
-        # If still failed: try with thresholding
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        data, points, _ = self.detector.detectAndDecode(thresh)
+        # Coarse pass: locate the code on a downscaled copy, then decode the region at full resolution
+        small = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        region = self._locate_region(img, small, scale)
+        if region is not None:
+            x_offset, y_offset, roi = region
+            data, points = self._run_strategies(roi)
+            if data:
+                return data, points + np.array([x_offset, y_offset], dtype=points.dtype)
+
+        # Not located: the (cheap) strategies on the downscaled copy...
+        data, points = self._run_strategies(small)
         if data:
-            if return_image:
-                cropped = self._extract_qr_region(img, points)
-                return data, cropped
-            return data
+            return data, points / scale
 
-        # No QR found
-        return (None, None) if return_image else None
+        # ...then a single full-resolution pass, for codes too small to survive the downscale.
+        # Every strategy at full resolution would make images without any code very slow.
+        return self._run_strategies(img, self.strategies[:1])
+
+    def _locate_region(self, img, small, scale):
+        """
+        Detects the QR code on a downscaled copy of a large image and crops the
+        matching full-resolution region (with a quiet-zone margin).
+
+        Args:
+            img (np.ndarray): Full-resolution image.
+            small (np.ndarray): `img` downscaled by `scale`.
+            scale (float): Downscale factor (< 1).
+
+        Returns:
+            tuple or None: (x_offset, y_offset, roi) or None if no code was located.
+        """
+        start = time.perf_counter()
+        found, points = self.detector.detect(small)
+        self._record_strategy("locate", time.perf_counter() - start, found)
+        if not found or points is None:
+            return None
+
+        # Map corners back to full resolution
+        return self._crop_region(img, points.reshape(-1, 2) / scale)
+
+    def _locate_regions(self, img):
+        """
+        Multi-code version of _locate_region(): detects every QR code on a downscaled
+        copy of a large image and crops each matching full-resolution region.
+
+        Returns:
+            list or None: [(x_offset, y_offset, roi), ...] or None if the image is small.
+        """
+        height, width = img.shape[:2]
+        scale = self.max_detect_side / max(height, width)
+        if scale >= 1:
+            return None
+
+        start = time.perf_counter()
+        small = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        found, points = self.multi_detector.detectMulti(small)
+        self._record_strategy("locate_multi", time.perf_counter() - start, found)
+        if not found or points is None:
+            return []
+
+        regions = [self._crop_region(img, corners.reshape(-1, 2) / scale) for corners in points]
+        return [region for region in regions if region is not None]
+
+    def _crop_region(self, img, points):
+        """
+        Crops the full-resolution region around a code's corners, with a quiet-zone margin.
+
+        Returns:
+            tuple or None: (x_offset, y_offset, roi) or None if the region is empty.
+        """
+        height, width = img.shape[:2]
+        x_min, y_min = points.min(axis=0)
+        x_max, y_max = points.max(axis=0)
+        margin = self.roi_margin * max(x_max - x_min, y_max - y_min)
+        x0 = int(max(x_min - margin, 0))
+        y0 = int(max(y_min - margin, 0))
+        x1 = int(min(x_max + margin, width))
+        y1 = int(min(y_max + margin, height))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, img[y0:y1, x0:x1]
+
+    def _run_strategies(self, img, strategies=None):
+        """
+        Runs detectAndDecode on successive variants of the image (see STRATEGIES)
+        until one succeeds, recording per-strategy attempts, successes & latency.
+
+        Args:
+            img (np.ndarray): Image to decode.
+            strategies (list): Strategies to try (self.strategies if None).
+
+        Returns:
+            tuple: (data, points) — data is None if every strategy failed.
+        """
+        variants = {}
+        for name in strategies or self.strategies:
+            start = time.perf_counter()
+            variant = self._variant(name, img, variants)
+            data, points, _ = self.detector.detectAndDecode(variant)
+            self._record_strategy(name, time.perf_counter() - start, bool(data))
+            if data:
+                return data, points
+        return None, None
+
+    def _variant(self, name, img, variants):
+        """
+        Builds (and memoizes in `variants`) the image variant for a strategy.
+        """
+        if name in variants:
+            return variants[name]
+
+        if name == "original":
+            variant = img
+        elif name == "grayscale":
+            variant = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        elif name == "otsu":
+            gray = self._variant("grayscale", img, variants)
+            _, variant = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        elif name == "adaptive":
+            gray = self._variant("grayscale", img, variants)
+            variant = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 5)
+        elif name == "sharpen":
+            gray = self._variant("grayscale", img, variants)
+            variant = cv2.filter2D(gray, -1, self.SHARPEN_KERNEL)
+        else:
+            raise ValueError(f"Unknown decode strategy: {name}")
+
+        variants[name] = variant
+        return variant
+
+    def _record_strategy(self, name, elapsed, success):
+        """
+        Updates the per-strategy success & latency counters.
+        """
+        metrics.observe("qr_decode_strategy_seconds", elapsed, name, "success" if success else "fail")
+        with self._stats_lock:
+            stats = self.strategy_stats.setdefault(name, {"attempts": 0, "successes": 0, "seconds_total": 0.0})
+            stats["attempts"] += 1
+            stats["successes"] += int(success)
+            stats["seconds_total"] += elapsed
+
+    def get_strategy_stats(self):
+        """
+        Returns per-strategy attempts, successes, success rate & average latency,
+        to help reorder `strategies` based on real traffic.
+        """
+        with self._stats_lock:
+            stats = {name: dict(values) for name, values in self.strategy_stats.items()}
+        for values in stats.values():
+            attempts = values["attempts"]
+            values["success_rate"] = values["successes"] / attempts if attempts else 0.0
+            values["seconds_avg"] = values["seconds_total"] / attempts if attempts else 0.0
+        return stats
 
     def _pil_to_cv2(self, pil_image):
         """
@@ -0,0 +1,99 @@
+# Import required libraries
+import threading
+from datetime import date
+from collections import OrderedDict
+
+class RenderCache:
+    """
+    RenderCache class
+    - Bounded LRU cache of rendered results (WhatsApp reply body, HTML result fragment...)
+      per customer, so repeat scans of the same card skip formatting & templating.
+    - Only valid results read from the database are cached; errors and offline
+      (token-only) results are cheap and rendered every time.
+    - Entries belong to one (database snapshot version, day): the first render for a
+      newer snapshot (after a reload) or a new day drops everything cached before.
+    - Thread-safe.
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        Args:
+            max_size (int): Max cached renders (least recently used are evicted).
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()  # (kind, customer_id) → rendered output
+        self._generation = None  # (snapshot version, day) the entries were rendered for
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def customer_of(result):
+        """
+        Returns the customer_id a Validator result can be cached under, or None if it
+        shouldn't be cached.
+        """
+        if not isinstance(result, dict) or not result.get("success") or result.get("offline"):
+            return None
+        data = result.get("data")
+        return data[0].get("customer_id") if data else None
+
+    def render(self, kind, result, version, render_func):
+        """
+        Returns render_func(result), from the cache when possible.
+
+        Args:
+            kind (str): What is rendered ("whatsapp", "html"...); each kind is cached separately.
+            result (dict): Validator result.
+            version (int): Database snapshot version read *before* validating
+                           (see Validator.snapshot_version), so a result built from an
+                           older snapshot is never cached under a newer version.
+            render_func (callable): Renders a result.
+        """
+        customer_id = self.customer_of(result)
+        if customer_id is None or self.max_size <= 0:
+            return render_func(result)
+
+        key = (kind, customer_id)
+        generation = (version, date.today())
+        with self._lock:
+            if self._generation is None or generation > self._generation:
+                # Reload or new day: everything cached so far is stale
+                if self._entries:
+                    self.stats["invalidations"] += 1
+                self._entries.clear()
+                self._generation = generation
+            current = generation == self._generation
+            if current and key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            self.stats["misses"] += 1
+
+        output = render_func(result)
+        if current:
+            with self._lock:
+                # Skip the store if a reload happened while rendering
+                if generation == self._generation:
+                    self._entries[key] = output
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.stats["evictions"] += 1
+        return output
+
+    def renderer(self, kind, version, render_func):
+        """
+        Returns a cached version of `render_func` (one-argument callable) for one snapshot version.
+        """
+        return lambda result: self.render(kind, result, version, render_func)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        return stats
@@ -0,0 +1,81 @@
+def format_whatsapp_reply(result):
+    """
+    Builds the WhatsApp reply text for a Validator result.
+
+    Args:
+        result (dict): Output of Validator.validate().
+
+    Returns:
+        str: Message body to send back to the user.
+    """
+    if "error" in result:
+        return f"⚠️ {result['error']}"
+
+    customer = result["data"][0]  # first record contains customer info
+    if result.get("offline"):
+        # Verified from the signed QR token alone: no name or vehicle details
+        return ("✅ QR Code is valid! (verified offline)\n\n"
+                f"🆔 ID: {customer.get('customer_id', '')}\n"
+                f"📅 Membership Expiration: {customer.get('expiration_date', '')}\n")
+
+    # Collect the lines and join once (no repeated string concatenation)
+    lines = [
+        "✅ QR Code is valid!\n",
+        f"👤 Customer: {customer.get('first_name', '')} {customer.get('last_name', '')}",
+        f"🆔 ID: {customer.get('customer_id', '')}",
+        f"📅 Membership Expiration: {customer.get('expiration_date', '')}",
+        f"🚗 Total Vehicles: {customer.get('number of cars', len(result['data']))}\n",
+    ]
+
+    # Now list vehicles
+    for idx, car in enumerate(result["data"], 1):
+        lines.append(f"🚙 Vehicle #{idx}")
+        lines.append(f"   Make & Model: {car.get('car_make', '')} {car.get('car_model', '')}")
+        lines.append(f"   VIN: {car.get('car_vin', '')}")
+        lines.append(f"   Status: {car.get('status', '')}")
+        lines.append(f"   Last Service: {car.get('last_maintenance_date', '')}")
+        lines.append(f"   Next Due: {car.get('next_maintenance_due', '')}")
+
+        if car.get('predictive_maintenance_alert') == 'True':
+            lines.append(f"   🚨 Predictive Alert: Remaining Life: {car.get('remaining_useful_life', '')}")
+
+        lines.append("")
+
+    return "\n".join(lines) + "\n"
+
+
+# WhatsApp text messages are limited to 4096 characters
+MAX_MESSAGE_LENGTH = 4096
+
+
+def format_whatsapp_replies(results, customer_ids, format_reply=format_whatsapp_reply):
+    """
+    Builds the WhatsApp reply for every QR code found in one image or PDF
+    (e.g. a fleet customer's cards). Card replies are packed into as few
+    messages as WhatsApp's length limit allows.
+
+    Args:
+        results (list): Validator results, one per decoded QR code.
+        customer_ids (list): Decoded QR payloads, in the same order.
+        format_reply (callable): Formats one result (e.g. a RenderCache.renderer() of
+                                 format_whatsapp_reply).
+
+    Returns:
+        list: Message bodies to send, in order.
+    """
+    if len(results) == 1:
+        return [format_reply(results[0])]
+
+    messages = []
+    current = f"📇 Found {len(results)} QR codes\n\n"
+    for idx, (customer_id, result) in enumerate(zip(customer_ids, results), 1):
+        part = f"🔹 Card {idx}/{len(results)} (QR: {customer_id})\n"
+        part += format_reply(result).rstrip("\n") + "\n\n"
+        if len(current) + len(part) > MAX_MESSAGE_LENGTH and current:
+            messages.append(current.rstrip("\n"))
+            current = ""
+        current += part[:MAX_MESSAGE_LENGTH]
+
+    if current:
+        messages.append(current.rstrip("\n"))
+    return messages
@@ -0,0 +1,393 @@
+# Import required libraries
+import os
+import sys
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from collections import deque, OrderedDict
+from TokenSigner import TokenSigner
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Validator error messages → outcome stored in the log
+ERROR_OUTCOMES = {
+    "no customer was found": "not_found",
+    "QR Code is Expired": "expired",
+    "QR Code signature is invalid": "invalid_signature",
+}
+
+
+def scan_outcome(result):
+    """
+    Classifies a Validator result for the scan log.
+
+    Args:
+        result (dict or None): Output of Validator.validate() (None if no QR code was read).
+
+    Returns:
+        str: "valid", "valid_offline", "not_found", "expired", "invalid_signature",
+             "unreadable" or "error".
+    """
+    if not isinstance(result, dict):
+        return "unreadable"
+    if result.get("success"):
+        return "valid_offline" if result.get("offline") else "valid"
+    return ERROR_OUTCOMES.get(result.get("error"), "error")
+
+
+def payload_customer_id(data):
+    """
+    Returns the customer_id a QR payload refers to (the id claimed by a signed token,
+    or the payload itself for bare customer_id codes).
+    """
+    data = str(data)
+    if TokenSigner.is_token(data):
+        parts = data.split(".")
+        return parts[1] if len(parts) > 1 else data
+    return data
+
+
+class ScanLog:
+    """
+    ScanLog class
+    - Append-only audit log of scans: time, customer_id, payload, outcome, source & client.
+    - record() only puts the entry on an in-process queue; a background thread writes
+      entries in batches (to SQLite, or to a rotating JSONL file), so logging never adds
+      disk latency to a scan. When the queue is full, entries are dropped and counted.
+    - Flags codes scanned more than `rate_limit` times within `rate_window` seconds
+      (kept in memory, so the check costs no I/O either).
+    - history() returns the scans of one customer, newest first.
+    """
+
+    # Longest payload stored per entry (anything longer is truncated)
+    MAX_PAYLOAD_LENGTH = 256
+
+    def __init__(self, path="scan_log.sqlite", batch_size=500, flush_interval=1.0, max_queue=10000,
+                 rate_window=60.0, rate_limit=5, max_bytes=50 * 1024 * 1024, backups=5):
+        """
+        Args:
+            path (str): Log file; .sqlite / .db for SQLite, anything else (e.g. .jsonl) for JSON lines.
+            batch_size (int): Max entries written per batch.
+            flush_interval (float): Max seconds an entry waits before its batch is written.
+            max_queue (int): Max entries waiting to be written.
+            rate_window (float): Window of the rate check, in seconds.
+            rate_limit (int): Scans of one customer allowed within the window before it is flagged.
+            max_bytes (int): JSONL only: rotate the file once it reaches this size.
+            backups (int): JSONL only: rotated files kept (scan_log.jsonl.1 ... .N).
+        """
+        self.path = path
+        self.use_sqlite = path.endswith((".sqlite", ".db"))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rate_window = rate_window
+        self.rate_limit = rate_limit
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer_conn = None  # SQLite connection owned by the writer thread
+        # customer_id → deque of recent scan times (rate check), least recently scanned first
+        self._recent = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "recorded": 0,
+            "written": 0,
+            "dropped": 0,
+            "flagged": 0,
+            "batches": 0,
+            "write_errors": 0,
+        }
+
+        if self.use_sqlite:
+            # Create the table up front so history() works before the first batch
+            conn = self._connect()
+            conn.close()
+
+        self._thread = threading.Thread(target=self._writer_loop, name="scan-log-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, data, result, source, client=None):
+        """
+        Logs one scan without blocking.
+
+        Args:
+            data (str): Decoded QR payload (None if nothing could be read).
+            result (dict or None): Validator result (see scan_outcome()).
+            source (str): Where the scan came from ("web", "api", "whatsapp"...).
+            client (str): Caller (IP address, phone number...).
+
+        Returns:
+            bool: True if the customer was flagged by the rate check.
+        """
+        now = time.time()
+        customer_id = payload_customer_id(data) if data else None
+        scans = self._count_scan(customer_id, now) if customer_id is not None else 0
+        flagged = scans > self.rate_limit
+        entry = {
+            "timestamp": now,
+            "customer_id": customer_id,
+            "payload": str(data)[:self.MAX_PAYLOAD_LENGTH] if data else None,
+            "outcome": scan_outcome(result),
+            "source": source,
+            "client": client,
+            "flagged": flagged,
+        }
+
+        if scans == self.rate_limit + 1:
+            # Warn once when the limit is crossed, not on every further scan
+            logger.warning("🚩 Customer %s scanned more than %s times in %ss",
+                           customer_id, self.rate_limit, self.rate_window)
+        try:
+            self._queue.put_nowait(entry)
+            queued = True
+        except queue.Full:
+            queued = False
+
+        with self._stats_lock:
+            self.stats["recorded" if queued else "dropped"] += 1
+            self.stats["flagged"] += int(flagged)
+        return flagged
+
+    def record_many(self, items, results, source, client=None):
+        """
+        Logs the scans of one multi-code upload / message (one entry per code).
+
+        Returns:
+            list: Rate check flag of each code.
+        """
+        return [self.record(data, result, source, client) for data, result in zip(items, results)]
+
+    def _count_scan(self, customer_id, now):
+        """
+        Remembers a scan and returns how many times the customer was scanned
+        within the last `rate_window` seconds (this scan included).
+        """
+        with self._recent_lock:
+            times = self._recent.get(customer_id)
+            if times is None:
+                times = self._recent[customer_id] = deque()
+            else:
+                self._recent.move_to_end(customer_id)
+            times.append(now)
+            while times and now - times[0] > self.rate_window:
+                times.popleft()
+            count = len(times)
+
+            # Forget customers that weren't scanned within the window (oldest first, so this
+            # stops at the first recent one: amortized O(1) per scan)
+            while True:
+                oldest, scans = next(iter(self._recent.items()))
+                if now - scans[-1] <= self.rate_window:
+                    break
+                del self._recent[oldest]
+        return count
+
+    def recent_scans(self, customer_id):
+        """
+        Returns how many times a customer was scanned within the last `rate_window` seconds.
+        """
+        now = time.time()
+        with self._recent_lock:
+            times = self._recent.get(str(customer_id), ())
+            return sum(1 for scanned_at in times if now - scanned_at <= self.rate_window)
+
+    def _writer_loop(self):
+        """
+        Writes queued entries in batches: a batch is written once it holds `batch_size`
+        entries or its oldest entry has waited `flush_interval` seconds.
+        """
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    # flush(): write what we have now
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+
+                if stopping or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if stopping:
+                # Write everything still queued before exiting
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif item is not None:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+
+    def _write(self, batch):
+        """
+        Writes one batch, timing it in the scan_log_write stage.
+        """
+        start = time.perf_counter()
+        try:
+            if self.use_sqlite:
+                self._write_sqlite(batch)
+            else:
+                self._write_jsonl(batch)
+        except Exception as e:
+            with self._stats_lock:
+                self.stats["write_errors"] += 1
+            logger.error("❌ Scan log write failed (%s entries lost): %s", len(batch), e)
+            return
+        metrics.observe("qr_stage_seconds", time.perf_counter() - start, "scan_log_write")
+        with self._stats_lock:
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+
+    def _connect(self):
+        """
+        Opens the SQLite log, creating the table & index if needed.
+        """
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scans (timestamp REAL, customer_id TEXT, payload TEXT, "
+                "outcome TEXT, source TEXT, client TEXT, flagged BOOLEAN)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_scans_customer ON scans (customer_id, timestamp)")
+        return conn
+
+    def _write_sqlite(self, batch):
+        # Opened by the writer thread on its first batch
+        conn = self._writer_conn
+        if conn is None:
+            conn = self._writer_conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO scans VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(e["timestamp"], e["customer_id"], e["payload"], e["outcome"], e["source"],
+                  e["client"], e["flagged"]) for e in batch],
+            )
+
+    def _write_jsonl(self, batch):
+        lines = "".join(json.dumps(entry) + "\n" for entry in batch)
+        if os.path.exists(self.path) and os.path.getsize(self.path) + len(lines) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _rotate(self):
+        """
+        scan_log.jsonl → scan_log.jsonl.1 → ... → .N (the oldest is deleted).
+        """
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def flush(self, timeout=None):
+        """
+        Waits until every entry recorded so far is written.
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def history(self, customer_id, limit=50, since=None):
+        """
+        Returns a customer's logged scans, newest first.
+        Entries still waiting in the queue are not included (see flush()).
+
+        Args:
+            customer_id (str): Customer to look up.
+            limit (int): Max entries to return.
+            since (float): Only scans at or after this Unix timestamp.
+
+        Returns:
+            list: Entry dicts (timestamp, customer_id, payload, outcome, source, client, flagged).
+        """
+        customer_id = str(customer_id)
+        since = since if since is not None else 0.0
+
+        if self.use_sqlite:
+            conn = sqlite3.connect(self.path, timeout=10)
+            try:
+                conn.row_factory = sqlite3.Row
+                rows = conn.execute(
+                    "SELECT * FROM scans WHERE customer_id = ? AND timestamp >= ? "
+                    "ORDER BY timestamp DESC LIMIT ?",
+                    (customer_id, since, limit),
+                ).fetchall()
+            finally:
+                conn.close()
+            return [{**dict(row), "flagged": bool(row["flagged"])} for row in rows]
+
+        # JSONL: scan the current file & the rotated ones
+        entries = []
+        for path in [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["customer_id"] == customer_id and entry["timestamp"] >= since:
+                        entries.append(entry)
+        entries.sort(key=lambda entry: entry["timestamp"], reverse=True)
+        return entries[:limit]
+
+    def get_stats(self):
+        """
+        Returns the recorded / written / dropped / flagged counters and the queue depth.
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+    def close(self):
+        """
+        Writes the remaining entries and stops the writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+if __name__ == "__main__":
+    # Scan history: python ScanLog.py <customer_id> [scan_log.sqlite | scan_log.jsonl]
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python ScanLog.py <customer_id> [log file]")
+
+    scan_log = ScanLog(sys.argv[2] if len(sys.argv) > 2 else "scan_log.sqlite")
+    for entry in scan_log.history(sys.argv[1]):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["timestamp"]))
+        flag = " 🚩" if entry["flagged"] else ""
+        print(f"{when}  {entry['outcome']:<18} {entry['source']:<10} {entry['client'] or ''}{flag}")
+    scan_log.close()
@@ -0,0 +1,904 @@
+# Import required libraries
+import os
+import sys
+import math
+import time
+import itertools
+import contextlib
+import sqlite3
+import threading
+import logging
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Fields shown for each vehicle row, in display order
+DISPLAY_HEADERS = [
+    "customer_id", "first_name", "last_name", "number of cars", "car_vin",
+    "car_make", "car_model", "expiration_date", "status",
+    "last_maintenance_date", "next_maintenance_due", "maintenance_requirements",
+    "predictive_maintenance_alert", "remaining_useful_life"
+]
+
+# Same headers, made more readable for display
+DISPLAY_TITLES = [h.replace('_', ' ').title() for h in DISPLAY_HEADERS]
+
+# date.toordinal() of 1970-01-01, to convert datetime64 days to ordinals
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def parse_expiration(value):
+    """
+    Parses an expiration_date cell ("YYYY-MM-DD").
+
+    Returns:
+        date or None: Parsed date, or None if the value is not a valid date.
+    """
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def expiry_ordinals(series):
+    """
+    Parses expiration dates ("YYYY-MM-DD") into day ordinals in one vectorized pass.
+
+    Returns:
+        np.ndarray: int64 ordinal per value, -1 when the date is missing or invalid.
+    """
+    parsed = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+    days = parsed.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    return np.where(parsed.isna().to_numpy(), -1, days.astype(np.int64) + EPOCH_ORDINAL)
+
+
+def format_rows(columns, rows):
+    """
+    Converts raw rows into display dicts (header → string), "N/A" for missing columns.
+
+    Args:
+        columns (list): Column names of the rows.
+        rows (list): Rows as lists of values.
+
+    Returns:
+        list: One dict per row, keyed by DISPLAY_HEADERS.
+    """
+    # Resolve each header's column position once, not per cell
+    positions = [(h, columns.index(h) if h in columns else None) for h in DISPLAY_HEADERS]
+    return [
+        {h: ("N/A" if i is None else str(row[i])) for h, i in positions}
+        for row in rows
+    ]
+
+
+# Date columns stored as datetime64 by compact_frame()
+DATE_COLUMNS = ["expiration_date", "last_maintenance_date", "next_maintenance_due"]
+
+
+def compact_frame(df, category_ratio=0.5):
+    """
+    Returns a memory-compact copy of the table for the pandas backend:
+    - only the served columns (DISPLAY_HEADERS) are kept (QR_code is dropped);
+    - customer_id & other integers use the smallest integer type;
+    - dates become datetime64 (8 bytes instead of a Python string per cell);
+    - text columns with few distinct values (makes, models, statuses...) become categoricals;
+    - floats become float32 when no value changes.
+    Every conversion keeps the displayed text identical; a column that can't be
+    converted losslessly (e.g. an invalid date) is left as it is.
+
+    Args:
+        df (pd.DataFrame): Table as read from Excel / the snapshot.
+        category_ratio (float): Max distinct values / rows for a text column to become categorical.
+
+    Returns:
+        pd.DataFrame: The compact table.
+    """
+    data = {}
+    for column in [h for h in DISPLAY_HEADERS if h in df.columns]:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            pass
+        elif pd.api.types.is_integer_dtype(series):
+            compact = pd.to_numeric(series, downcast="integer")
+            # Keep the original (possibly memory-mapped) column when it is already the smallest type
+            if compact.dtype != series.dtype:
+                series = compact
+        elif pd.api.types.is_float_dtype(series):
+            compact = series.astype(np.float32)
+            if ((compact.astype(np.float64) == series) | series.isna()).all():
+                series = compact
+        elif column in DATE_COLUMNS:
+            parsed = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+            # Only when every cell is a plain date, so it is displayed exactly as before
+            if parsed.notna().all() and (parsed.dt.strftime("%Y-%m-%d") == series.astype(str)).all():
+                series = parsed.astype("datetime64[s]")
+        elif series.nunique(dropna=False) <= category_ratio * len(series):
+            series = series.astype("category")
+        data[column] = series.reset_index(drop=True)
+    # No copy: unchanged columns keep sharing the snapshot's memory-mapped pages
+    return pd.DataFrame(data, copy=False)
+
+
+def memory_report(df):
+    """
+    Returns the memory footprint of each column (bytes, including Python string objects).
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    return {
+        column: {"dtype": str(df[column].dtype), "bytes": int(usage[column])}
+        for column in df.columns
+    }
+
+
+# Secondary indexes for reporting queries: name → (column, one entry per customer, row filter column)
+SORTED_INDEXES = {
+    # Membership expiry is the same on every row of a customer → index each customer once
+    "expiration_date": ("expiration_date", True, None),
+    "next_maintenance_due": ("next_maintenance_due", False, None),
+    # Remaining life is only meaningful for vehicles with a predictive alert
+    "remaining_useful_life": ("remaining_useful_life", False, "predictive_maintenance_alert"),
+}
+
+
+def sort_keys(series):
+    """
+    Converts a column into sortable float64 keys: dates become day numbers
+    (days since 1970-01-01), numbers stay as they are; missing/invalid values become NaN.
+
+    Returns:
+        tuple: (np.ndarray of keys, bool: True if the column holds dates)
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        parsed = series
+    elif series.name in DATE_COLUMNS:
+        parsed = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+    else:
+        # "N/A" & other text → NaN
+        numbers = pd.to_numeric(series, errors="coerce")
+        return numbers.to_numpy(dtype=np.float64, na_value=np.nan), False
+    days = parsed.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+    return np.where(parsed.isna().to_numpy(), np.nan, days.astype(np.float64)), True
+
+
+def sort_key(value, is_date):
+    """
+    Converts a query bound to the key space of sort_keys() (None stays None).
+    """
+    if value is None:
+        return None
+    if is_date:
+        if isinstance(value, str):
+            value = datetime.strptime(value, "%Y-%m-%d").date()
+        if isinstance(value, datetime):
+            value = value.date()
+        return float(value.toordinal() - EPOCH_ORDINAL)
+    return float(value)
+
+
+class SortedIndex:
+    """
+    SortedIndex class
+    - Secondary index on one column: keys sorted ascending next to their row offsets.
+    - Range queries are two binary searches; a page is a slice of the offsets,
+      so reports stay sub-millisecond on millions of rows.
+    - Rows with a missing or invalid value are left out.
+    """
+
+    def __init__(self, keys, offsets, is_date):
+        """
+        Args:
+            keys (np.ndarray): Sorted float64 keys (see sort_keys()).
+            offsets (np.ndarray): Row offset of each key.
+            is_date (bool): Keys are day numbers (query bounds are dates).
+        """
+        self.keys = keys
+        self.offsets = offsets
+        self.is_date = is_date
+
+    @classmethod
+    def build(cls, df, column, per_customer=False, where=None):
+        """
+        Builds the index of `column` (see SORTED_INDEXES).
+
+        Args:
+            df (pd.DataFrame): The customer & vehicle table.
+            column (str): Column to index.
+            per_customer (bool): Index only the first row of each customer.
+            where (str): Boolean column; only rows where it is true are indexed.
+        """
+        keys, is_date = sort_keys(df[column])
+        keep = ~np.isnan(keys)
+        if per_customer:
+            keep &= ~df["customer_id"].duplicated().to_numpy()
+        if where is not None and where in df.columns:
+            keep &= df[where].astype(str).to_numpy() == "True"
+
+        offsets = np.flatnonzero(keep)
+        keys = keys[offsets]
+        # Stable sort: equal keys stay in table order
+        order = np.argsort(keys, kind="stable")
+        return cls(keys[order], offsets[order], is_date)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def page(self, low=None, high=None, offset=0, limit=100, descending=False):
+        """
+        Returns one page of the rows whose key is within [low, high] (None = unbounded).
+
+        Returns:
+            tuple: (total matching rows, row offsets of the page in key order)
+        """
+        low, high = sort_key(low, self.is_date), sort_key(high, self.is_date)
+        start = 0 if low is None else int(np.searchsorted(self.keys, low, side="left"))
+        stop = len(self.keys) if high is None else int(np.searchsorted(self.keys, high, side="right"))
+        stop = max(start, stop)
+        total = stop - start
+        if descending:
+            stop = max(start, stop - offset)
+            return total, self.offsets[max(start, stop - limit):stop][::-1]
+        start = min(stop, start + offset)
+        return total, self.offsets[start:min(stop, start + limit)]
+
+
+class StorageBackend:
+    """
+    StorageBackend base class
+    - Common interface the Validator uses to look up customers.
+    - Subclasses hold the customer & vehicle table in a specific store.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        # Column names in table order; every row returned by lookup() follows this order
+        self.columns = []
+        self.stats = {"index_build_seconds": 0.0, "index_size": 0}
+
+    def lookup(self, customer_id):
+        """
+        Finds all vehicle rows of a customer.
+
+        Args:
+            customer_id (str): Decoded QR payload.
+
+        Returns:
+            list or None: List of rows (each a list of values in column order), or None if not found.
+        """
+        raise NotImplementedError
+
+    def lookup_prepared(self, customer_id):
+        """
+        Finds a customer and returns what the Validator needs to answer a scan.
+        Default implementation formats the raw rows on every call; backends
+        can override it with precomputed results.
+
+        Args:
+            customer_id (str): Decoded QR payload.
+
+        Returns:
+            tuple or None: (is_valid, formatted rows or None if expired), or None if not found.
+        """
+        rows = self.lookup(customer_id)
+        if rows is None:
+            return None
+
+        exp_date = None
+        if "expiration_date" in self.columns:
+            exp_date = parse_expiration(rows[0][self.columns.index("expiration_date")])
+
+        if exp_date is None or date.today() > exp_date:
+            return False, None
+        return True, format_rows(self.columns, rows)
+
+    def lookup_prepared_many(self, customer_ids):
+        """
+        Batch version of lookup_prepared(): one result per id, in input order.
+        Backends can override it to fetch every id in a single query.
+        """
+        return [self.lookup_prepared(customer_id) for customer_id in customer_ids]
+
+    def range_query(self, index, low=None, high=None, offset=0, limit=100, descending=False):
+        """
+        Finds the rows whose indexed column is within [low, high], sorted by it.
+
+        Args:
+            index (str): Secondary index name (see SORTED_INDEXES).
+            low, high (date, str or number): Inclusive bounds (None = unbounded).
+            offset (int): Matching rows to skip.
+            limit (int): Max rows to return.
+            descending (bool): Largest keys first.
+
+        Returns:
+            tuple: (total matching rows, page of rows as lists in column order)
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Releases any resources held by the backend.
+        """
+
+
+class PandasBackend(StorageBackend):
+    """
+    PandasBackend class
+    - Keeps the whole table in memory as a pandas DataFrame.
+    - Builds a customer_id hash index for constant-time lookups.
+    - Precomputes each customer's expiration date & formatted rows at load time,
+      so a scan is one dict lookup plus one date comparison.
+    - Formatted rows are kept as tuples of shared (interned) strings and only
+      turned into dicts when returned, to keep the per-customer footprint small.
+    - Builds sorted secondary indexes (SORTED_INDEXES) for the reporting range queries.
+    """
+
+    name = "pandas"
+
+    def __init__(self, df, index=None, precompute=True, prepared=None, expiry=None):
+        """
+        Args:
+            df (pd.DataFrame): The customer & vehicle table.
+            index (dict): Prebuilt customer_id → row offsets index (built from df if None).
+            precompute (bool): Precompute expiration dates & formatted rows for every customer.
+            prepared (dict): Already-precomputed records to reuse (see extended()).
+            expiry (dict): Prebuilt customer_id → expiration ordinal, e.g. from the
+                           compiled snapshot (parsed from df if None).
+        """
+        super().__init__()
+        self.df = df
+        self.columns = df.columns.tolist()
+        self.expiry = expiry
+        if index is None:
+            self._build_index()
+        else:
+            self.index = index
+            self.stats["index_size"] = len(index)
+
+        # Day rollover: today's ordinal is cached until the next local midnight
+        self._today = 0
+        self._rollover_at = 0.0
+
+        self.prepared = None
+        self.stats["precompute_seconds"] = 0.0
+        if precompute:
+            start = time.perf_counter()
+            self.prepared = dict(prepared) if prepared else {}
+            keys = list(self.index) if prepared is None else [k for k in self.index if k not in self.prepared]
+            self.prepared.update(self._prepare(keys))
+            self.stats["precompute_seconds"] = time.perf_counter() - start
+
+        self._build_sorted_indexes()
+
+    def _build_index(self):
+        """
+        Builds a hash index mapping customer_id (as string) to its row offsets.
+        Done once at load time so that every scan is a dictionary lookup
+        instead of a full-column string comparison.
+        """
+        start = time.perf_counter()
+
+        # Stringify the key column once, then group row positions by customer_id
+        keys = self.df['customer_id'].astype(str)
+        self.index = keys.groupby(keys, sort=False).indices
+
+        self.stats["index_build_seconds"] = time.perf_counter() - start
+        self.stats["index_size"] = len(self.index)
+
+    def _build_sorted_indexes(self):
+        """
+        Builds the secondary indexes of SORTED_INDEXES whose column is in the table.
+        """
+        start = time.perf_counter()
+        self.sorted_indexes = {
+            name: SortedIndex.build(self.df, column, per_customer, where)
+            for name, (column, per_customer, where) in SORTED_INDEXES.items()
+            if column in self.columns
+        }
+        self.stats["sorted_index_seconds"] = time.perf_counter() - start
+
+    def extended(self, df):
+        """
+        Builds a new backend for `df` by indexing only the rows appended after this table.
+        This backend is left untouched, so it can keep serving until the new one is swapped in.
+
+        Args:
+            df (pd.DataFrame): Freshly loaded table.
+
+        Returns:
+            PandasBackend or None: New backend, or None if `df` is not this table plus appended rows.
+        """
+        old_rows = len(self.df)
+        if len(df) < old_rows or df.columns.tolist() != self.columns:
+            return None
+        head = df.iloc[:old_rows].reset_index(drop=True)
+        old = self.df.reset_index(drop=True)
+        for column in self.columns:
+            if head[column].dtype == old[column].dtype:
+                if not head[column].equals(old[column]):
+                    return None
+            # Compacted columns can change type when rows are appended (new categories, wider ints)
+            elif not head[column].astype(object).equals(old[column].astype(object)):
+                return None
+
+        start = time.perf_counter()
+        index = dict(self.index)
+        prepared = dict(self.prepared) if self.prepared is not None else None
+        keys = df['customer_id'].iloc[old_rows:].astype(str)
+        for key, offsets in keys.groupby(keys, sort=False).indices.items():
+            offsets = offsets + old_rows
+            index[key] = np.concatenate([index[key], offsets]) if key in index else offsets
+            if prepared is not None:
+                # Customer gained rows → recompute its record in the new backend
+                prepared.pop(key, None)
+        index_seconds = time.perf_counter() - start
+
+        backend = PandasBackend(df, index=index, precompute=prepared is not None, prepared=prepared)
+        backend.stats["index_build_seconds"] = index_seconds
+        return backend
+
+    def _prepare(self, keys):
+        """
+        Precomputes, in one vectorized pass over the customers' rows,
+        the expiration date (as a day ordinal) and the formatted display rows.
+
+        Args:
+            keys (list): customer_ids to prepare.
+
+        Returns:
+            dict: customer_id → (expiration ordinal, formatted rows as tuples in DISPLAY_HEADERS
+                  order). The ordinal is -1 when the date is missing or invalid, so the
+                  customer counts as expired.
+        """
+        if not keys:
+            return {}
+
+        offsets_list = [self.index[key] for key in keys]
+        subset = self.df.iloc[np.concatenate(offsets_list)]
+
+        # Stringify each displayed column in one go ("N/A" when the column is missing)
+        cells = {}
+        shared = set()
+        for header in DISPLAY_HEADERS:
+            if header not in subset.columns:
+                cells[header] = np.full(len(subset), "N/A", dtype=object)
+                shared.add(header)
+            elif isinstance(subset[header].dtype, pd.CategoricalDtype):
+                # Stringify each category once; rows pick theirs by code (-1 → the trailing "nan")
+                column = subset[header]
+                strings = np.append(column.cat.categories.astype(str).to_numpy(dtype=object), "nan")
+                cells[header] = strings[column.cat.codes.to_numpy()]
+                shared.add(header)
+            else:
+                cells[header] = subset[header].astype(str).fillna("nan").to_numpy(dtype=object)
+        # Repeated values (dates, statuses...) share one string object; categorical cells already do
+        pool = {}
+        records = list(zip(*(
+            cells[header] if header in shared else [pool.setdefault(value, value) for value in cells[header]]
+            for header in DISPLAY_HEADERS
+        )))
+
+        # Parse all expiration dates at once → day ordinals (unless the snapshot already did)
+        if self.expiry is not None:
+            ordinals = None
+        elif "expiration_date" in subset.columns:
+            ordinals = expiry_ordinals(subset["expiration_date"])
+        else:
+            ordinals = np.full(len(subset), -1, dtype=np.int64)
+
+        prepared = {}
+        cursor = 0
+        for key, offsets in zip(keys, offsets_list):
+            count = len(offsets)
+            # Membership status comes from the customer's first row
+            exp_ordinal = self.expiry[key] if ordinals is None else int(ordinals[cursor])
+            prepared[key] = (exp_ordinal, records[cursor:cursor + count])
+            cursor += count
+        return prepared
+
+    def _today_ordinal(self):
+        """
+        Returns today's date ordinal, refreshed once the local day rolls over,
+        so precomputed validity stays correct across midnight.
+        """
+        if time.time() >= self._rollover_at:
+            today = date.today()
+            self._today = today.toordinal()
+            self._rollover_at = datetime.combine(today + timedelta(days=1), datetime.min.time()).timestamp()
+        return self._today
+
+    def lookup_prepared(self, customer_id):
+        if self.prepared is None:
+            return super().lookup_prepared(customer_id)
+        record = self.prepared.get(customer_id)
+        if record is None:
+            return None
+        exp_ordinal, rows = record
+        if exp_ordinal < self._today_ordinal():
+            return False, None
+        return True, [dict(zip(DISPLAY_HEADERS, row)) for row in rows]
+
+    def lookup_prepared_many(self, customer_ids):
+        if self.prepared is None:
+            return super().lookup_prepared_many(customer_ids)
+        # Same day & table for the whole batch
+        today = self._today_ordinal()
+        prepared = self.prepared
+        results = []
+        for customer_id in customer_ids:
+            record = prepared.get(customer_id)
+            if record is None:
+                results.append(None)
+            elif record[0] < today:
+                results.append((False, None))
+            else:
+                results.append((True, [dict(zip(DISPLAY_HEADERS, row)) for row in record[1]]))
+        return results
+
+    def _rows(self, offsets):
+        """
+        Returns the rows at `offsets` as lists in column order.
+        """
+        rows = self.df.iloc[offsets]
+        for column in self.columns:
+            if pd.api.types.is_datetime64_any_dtype(rows[column]):
+                # Compacted dates (see compact_frame()) go back to their "YYYY-MM-DD" text
+                rows[column] = rows[column].dt.strftime("%Y-%m-%d")
+        return rows.values.tolist()
+
+    def lookup(self, customer_id):
+        offsets = self.index.get(customer_id)
+        if offsets is None:
+            return None
+        return self._rows(offsets)
+
+    def range_query(self, index, low=None, high=None, offset=0, limit=100, descending=False):
+        sorted_index = self.sorted_indexes.get(index)
+        if sorted_index is None:
+            raise ValueError(f"No '{index}' index on this table")
+        total, offsets = sorted_index.page(low, high, offset, limit, descending)
+        return total, self._rows(offsets) if len(offsets) else []
+
+    def memory_usage(self, sample_size=1000):
+        """
+        Reports the memory footprint of the table (per column), the index and the
+        precomputed records (estimated from a sample of customers).
+
+        Returns:
+            dict: {"columns": {column: {"dtype", "bytes"}}, "table_bytes", "index_bytes",
+                   "prepared_bytes", "total_bytes"}
+        """
+        columns = memory_report(self.df)
+        table_bytes = sum(column["bytes"] for column in columns.values())
+        index_bytes = sys.getsizeof(self.index) + sum(
+            sys.getsizeof(key) + offsets.nbytes for key, offsets in self.index.items()
+        ) + sum(index.keys.nbytes + index.offsets.nbytes for index in self.sorted_indexes.values())
+
+        prepared_bytes = 0
+        if self.prepared:
+            # Deep size of a sample of records, counting shared strings once
+            seen = set()
+            sample = list(itertools.islice(self.prepared.values(), sample_size))
+            for _, rows in sample:
+                prepared_bytes += sys.getsizeof(rows)
+                for row in rows:
+                    prepared_bytes += sys.getsizeof(row)
+                    for value in row:
+                        if id(value) not in seen:
+                            seen.add(id(value))
+                            prepared_bytes += sys.getsizeof(value)
+            prepared_bytes = int(prepared_bytes * len(self.prepared) / len(sample)) + sys.getsizeof(self.prepared)
+
+        return {
+            "columns": columns,
+            "table_bytes": table_bytes,
+            "index_bytes": index_bytes,
+            "prepared_bytes": prepared_bytes,
+            "total_bytes": table_bytes + index_bytes + prepared_bytes,
+        }
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    SQLiteBackend class
+    - Reads the customer & vehicle table from a SQLite file (see import_excel()).
+    - Table is indexed on customer_id and car_vin and runs in WAL mode,
+      so lookups don't need the table in RAM and the file can be updated live.
+    - Opens one connection per thread (sqlite3 connections can't be shared across threads).
+    - Range queries use SQL indexes on the SORTED_INDEXES columns.
+    """
+
+    name = "sqlite"
+    TABLE = "customers"
+    # Ids per IN (...) query in lookup_prepared_many()
+    BATCH_SIZE = 500
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str): Path to the SQLite database file.
+        """
+        super().__init__()
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        start = time.perf_counter()
+        conn = self._connection()
+        table_info = conn.execute(f'PRAGMA table_info("{self.TABLE}")').fetchall()
+        if not table_info:
+            raise ValueError(f"No '{self.TABLE}' table found in {db_path}")
+
+        # (cid, name, type, notnull, default, pk) → keep names & declared types
+        self.columns = [row[1] for row in table_info]
+        self._types = [row[2].upper() for row in table_info]
+        self._select = (
+            "SELECT " + ", ".join(f'"{c}"' for c in self.columns)
+            + f' FROM "{self.TABLE}" WHERE customer_id = ? ORDER BY rowid'
+        )
+
+        # Files imported before the reporting indexes existed get them on first open
+        try:
+            with conn:
+                _create_sorted_indexes(conn, self.columns)
+        except sqlite3.OperationalError as e:
+            # Read-only file: range queries still work, just without the indexes
+            logger.warning("⚠️ Could not create reporting indexes in %s: %s", db_path, e)
+
+        self.stats["index_build_seconds"] = time.perf_counter() - start
+        self.stats["index_size"] = conn.execute(
+            f'SELECT COUNT(DISTINCT customer_id) FROM "{self.TABLE}"'
+        ).fetchone()[0]
+
+    def _connection(self):
+        """
+        Returns the calling thread's connection, opening it on first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _restore_types(self, row):
+        """
+        Converts SQLite values back to what pandas reads from the Excel file
+        (booleans stored as 0/1, empty floats stored as NULL).
+        """
+        values = list(row)
+        for i, col_type in enumerate(self._types):
+            if col_type == "BOOLEAN" and values[i] is not None:
+                values[i] = bool(values[i])
+            elif col_type == "REAL" and values[i] is None:
+                values[i] = math.nan
+        return values
+
+    def lookup(self, customer_id):
+        rows = self._connection().execute(self._select, (customer_id,)).fetchall()
+        if not rows:
+            return None
+        return [self._restore_types(row) for row in rows]
+
+    def lookup_prepared_many(self, customer_ids):
+        """
+        Fetches all requested customers with IN (...) queries instead of one query per id.
+        """
+        customer_ids = list(customer_ids)
+        unique_ids = list(dict.fromkeys(customer_ids))
+        key_index = self.columns.index("customer_id")
+        rows_by_id = {}
+
+        conn = self._connection()
+        select = self._select.replace("customer_id = ?", "customer_id IN ({})")
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(unique_ids), self.BATCH_SIZE):
+            chunk = unique_ids[i:i + self.BATCH_SIZE]
+            query = select.format(", ".join("?" for _ in chunk))
+            for row in conn.execute(query, chunk):
+                rows_by_id.setdefault(str(row[key_index]), []).append(self._restore_types(row))
+
+        today = date.today()
+        exp_index = self.columns.index("expiration_date") if "expiration_date" in self.columns else None
+        prepared = {}
+        for customer_id, rows in rows_by_id.items():
+            exp_date = parse_expiration(rows[0][exp_index]) if exp_index is not None else None
+            if exp_date is None or today > exp_date:
+                prepared[customer_id] = (False, None)
+            else:
+                prepared[customer_id] = (True, format_rows(self.columns, rows))
+        return [prepared.get(customer_id) for customer_id in customer_ids]
+
+    def range_query(self, index, low=None, high=None, offset=0, limit=100, descending=False):
+        if index not in SORTED_INDEXES or SORTED_INDEXES[index][0] not in self.columns:
+            raise ValueError(f"No '{index}' index on this table")
+        column, per_customer, where = SORTED_INDEXES[index]
+        is_date = column in DATE_COLUMNS
+
+        # Dates are stored as "YYYY-MM-DD" text, which sorts like the dates themselves
+        conditions, params = [f'"{column}" IS NOT NULL'], []
+        for bound, op in ((low, ">="), (high, "<=")):
+            if bound is not None:
+                conditions.append(f'"{column}" {op} ?')
+                params.append(_sql_bound(bound, is_date))
+        if is_date:
+            conditions.append(f'"{column}" GLOB \'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]\'')
+        if where is not None and where in self.columns:
+            conditions.append(f'"{where}" = 1')
+        condition = " AND ".join(conditions)
+
+        table = f'"{self.TABLE}"'
+        if per_customer:
+            matching = f"SELECT MIN(rowid) FROM {table} WHERE {condition} GROUP BY customer_id"
+            total_query = f"SELECT COUNT(DISTINCT customer_id) FROM {table} WHERE {condition}"
+        else:
+            matching = f"SELECT rowid FROM {table} WHERE {condition}"
+            total_query = f"SELECT COUNT(*) FROM {table} WHERE {condition}"
+
+        direction = "DESC" if descending else "ASC"
+        query = (
+            "SELECT " + ", ".join(f'"{c}"' for c in self.columns)
+            + f" FROM {table} WHERE rowid IN ({matching})"
+            + f' ORDER BY "{column}" {direction}, rowid {direction} LIMIT ? OFFSET ?'
+        )
+        conn = self._connection()
+        total = conn.execute(total_query, params).fetchone()[0]
+        rows = conn.execute(query, params + [limit, offset]).fetchall()
+        return total, [self._restore_types(row) for row in rows]
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def import_excel(xlsx_path, db_path, df=None):
+    """
+    Imports the Excel database (layout from create_database.py) into a SQLite file.
+    The table is rebuilt from scratch and swapped in atomically (see import_frames()).
+
+    Args:
+        xlsx_path (str): Excel file to import.
+        db_path (str): SQLite file to create / overwrite.
+        df (pd.DataFrame): Already-loaded data (read from xlsx_path if None).
+
+    Returns:
+        int: Number of imported rows.
+    """
+    if df is None:
+        df = pd.read_excel(xlsx_path)
+    return import_frames([df], db_path)
+
+
+def import_frames(frames, db_path):
+    """
+    Imports a stream of DataFrames (same columns & dtypes) into a SQLite file,
+    one chunk at a time, so arbitrarily large tables never sit in memory at once.
+    The column types come from the first frame.
+    Rows go into a staging table; once the last chunk is in, a single transaction
+    drops the live table, renames the staging table & builds the indexes. Readers of a
+    live file keep seeing the previous table until that commit, then the complete new one.
+
+    Args:
+        frames (iterable): pd.DataFrame chunks.
+        db_path (str): SQLite file to create / overwrite.
+
+    Returns:
+        int: Number of imported rows.
+    """
+    table = SQLiteBackend.TABLE
+    staging = f"{table}_import"
+    count = 0
+    insert = None
+
+    # Autocommit mode: the sqlite3 module would otherwise commit DDL statements on their own
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Left over by an interrupted import
+        conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+
+        for df in frames:
+            with _transaction(conn):
+                if insert is None:
+                    conn.execute(f'CREATE TABLE "{staging}" ({", ".join(_column_defs(df))})')
+                    placeholders = ", ".join("?" for _ in df.columns)
+                    insert = f'INSERT INTO "{staging}" VALUES ({placeholders})'
+
+                # Convert to plain Python values; NaN → NULL
+                rows = [
+                    [None if isinstance(v, float) and math.isnan(v) else v for v in row]
+                    for row in df.astype(object).values.tolist()
+                ]
+                conn.executemany(insert, rows)
+                count += len(rows)
+
+        if insert is not None:
+            # Swap: the old table (and its indexes) go away in the same commit the new one appears
+            with _transaction(conn):
+                conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{table}"')
+                conn.execute(f'CREATE INDEX "idx_{table}_customer_id" ON "{table}" (customer_id)')
+                conn.execute(f'CREATE INDEX "idx_{table}_car_vin" ON "{table}" (car_vin)')
+                _create_sorted_indexes(conn, df.columns.tolist())
+    finally:
+        conn.close()
+
+    return count
+
+
+@contextlib.contextmanager
+def _transaction(conn):
+    """
+    Runs a block in an explicit transaction on an autocommit (isolation_level=None) connection.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _create_sorted_indexes(conn, columns):
+    """
+    Creates the SQL indexes backing the SORTED_INDEXES range queries.
+    """
+    table = SQLiteBackend.TABLE
+    for column, _, _ in SORTED_INDEXES.values():
+        if column in columns:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+
+
+def _sql_bound(value, is_date):
+    """
+    Converts a range query bound to the stored SQLite representation.
+    """
+    if is_date:
+        if isinstance(value, str):
+            value = datetime.strptime(value, "%Y-%m-%d").date()
+        if isinstance(value, datetime):
+            value = value.date()
+        return value.isoformat()
+    return float(value)
+
+
+def _column_defs(df):
+    """
+    Maps pandas dtypes to SQLite column definitions.
+    """
+    column_defs = []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            col_type = "BOOLEAN"
+        elif pd.api.types.is_integer_dtype(series):
+            col_type = "INTEGER"
+        elif pd.api.types.is_float_dtype(series):
+            col_type = "REAL"
+        else:
+            col_type = "TEXT"
+        column_defs.append(f'"{column}" {col_type}')
+    return column_defs
+
+
+def sqlite_path_for(xlsx_path):
+    """
+    Returns the default SQLite file path for an Excel database.
+    """
+    return os.path.splitext(xlsx_path)[0] + ".sqlite"
+
+
+if __name__ == "__main__":
+    # Importer: python StorageBackend.py [customers_with_vehicles.xlsx] [customers_with_vehicles.sqlite]
+    source = sys.argv[1] if len(sys.argv) > 1 else "customers_with_vehicles.xlsx"
+    target = sys.argv[2] if len(sys.argv) > 2 else sqlite_path_for(source)
+    count = import_excel(source, target)
+    print(f"DONE, imported {count} rows into ({target})")
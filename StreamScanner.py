@@ -0,0 +1,282 @@
+# Import required libraries
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+import cv2
+from QRCodeReader import QRCodeReader
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class StreamScanner:
+    """
+    StreamScanner class
+    - Scans QR codes from a camera (device index) or a recorded video / stream URL.
+    - Frames are captured on one thread and decoded on a worker thread. While a decode
+      is in flight only the newest frame is kept, so slow decodes skip frames
+      instead of falling behind the camera.
+    - Searches where the code was in the previous frame first (tracking).
+    - Debounces repeat reads of the same code, so a card held in front of the
+      camera is reported once.
+    - Yields validated results as a generator and tracks sustained FPS.
+    """
+
+    def __init__(self, reader=None, validator=None, debounce=3.0, track_frames=15, frame_step=1):
+        """
+        Args:
+            reader (QRCodeReader): Reader used to decode frames (a new one if None).
+            validator (Validator): Validates decoded payloads (None yields payloads only).
+            debounce (float): Seconds a code must be out of sight before it is reported again.
+            track_frames (int): Frames without a read before the tracked region is dropped.
+            frame_step (int): Only every `frame_step`-th captured frame is considered for decoding.
+        """
+        self.reader = reader or QRCodeReader(cache_size=0)
+        self.validator = validator
+        self.debounce = debounce
+        self.track_frames = track_frames
+        self.frame_step = max(1, frame_step)
+
+        self._stop = threading.Event()
+        self._frame_ready = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+
+    def scan(self, source, realtime=None, max_results=None):
+        """
+        Scans a video source until it ends, stop() is called or `max_results` are yielded.
+
+        Args:
+            source (int or str): Camera index, video file path or stream URL.
+            realtime (bool): Pace video files at their native FPS, like a live camera
+                             (defaults to True for files, False for cameras & streams).
+            max_results (int): Stop after this many results (None for no limit).
+
+        Yields:
+            dict: {"data": str, "result": Validator result (None without validator),
+                   "bbox": [x, y, width, height], "frame": int,
+                   "timestamp": seconds since start, "latency_seconds": capture → result}
+        """
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise ValueError(f"Unable to open video source: {source}")
+
+        if realtime is None:
+            realtime = isinstance(source, (str, os.PathLike)) and os.path.exists(source)
+        fps = capture.get(cv2.CAP_PROP_FPS) if realtime else 0
+
+        self._reset()
+        threads = [
+            threading.Thread(target=self._capture_loop, args=(capture, fps), name="stream-capture", daemon=True),
+            threading.Thread(target=self._decode_loop, name="stream-decode", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        yielded = 0
+        try:
+            while True:
+                item = self._results.get()
+                if item is None:
+                    # Decode worker finished (source ended or stop() was called)
+                    break
+                yield item
+                yielded += 1
+                if max_results is not None and yielded >= max_results:
+                    break
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+            capture.release()
+            self._finished = time.monotonic()
+
+    def stop(self):
+        """
+        Stops the current scan (the generator ends after the frame being decoded).
+        """
+        self._stop.set()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+
+    def _reset(self):
+        """
+        Prepares the per-scan state.
+        """
+        self._stop.clear()
+        self._results = queue.Queue()
+        self._frame_ready = threading.Condition()
+        self._pending = None  # newest (frame index, captured at, frame) not yet decoded
+        self._capture_done = False
+        self._seen = {}  # payload → last time it was read (debounce)
+        self._started = time.monotonic()
+        self._finished = None
+        with self._stats_lock:
+            self.stats = {
+                "frames_read": 0,
+                "frames_decoded": 0,
+                "frames_skipped": 0,
+                "tracked_frames": 0,
+                "codes_read": 0,
+                "duplicates": 0,
+                "results": 0,
+                "decode_seconds_total": 0.0,
+                "decode_seconds_max": 0.0,
+            }
+
+    def _capture_loop(self, capture, fps):
+        """
+        Reads frames and hands the newest one to the decode worker.
+        A frame still waiting when the next one arrives is dropped (counted as skipped).
+        """
+        frame_index = -1
+        try:
+            while not self._stop.is_set():
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                frame_index += 1
+                captured_at = time.monotonic()
+                with self._stats_lock:
+                    self.stats["frames_read"] += 1
+
+                if frame_index % self.frame_step == 0:
+                    with self._frame_ready:
+                        if self._pending is not None:
+                            with self._stats_lock:
+                                self.stats["frames_skipped"] += 1
+                        self._pending = (frame_index, captured_at, frame)
+                        self._frame_ready.notify()
+
+                if fps > 0:
+                    # Recorded video: wait until the next frame would be shown
+                    delay = self._started + (frame_index + 1) / fps - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+        finally:
+            with self._frame_ready:
+                self._capture_done = True
+                self._frame_ready.notify()
+
+    def _decode_loop(self):
+        """
+        Decodes the newest frame, tracking the code position and debouncing repeats.
+        """
+        hint = None
+        misses = 0
+        try:
+            while True:
+                with self._frame_ready:
+                    while self._pending is None and not self._capture_done and not self._stop.is_set():
+                        self._frame_ready.wait()
+                    if self._stop.is_set() or self._pending is None:
+                        return
+                    frame_index, captured_at, frame = self._pending
+                    self._pending = None
+
+                start = time.perf_counter()
+                data, bbox = self.reader.decode_frame(frame, hint)
+                elapsed = time.perf_counter() - start
+                metrics.observe("qr_stage_seconds", elapsed, "stream_frame_decode")
+                self._record_frame(elapsed, hint is not None, bool(data))
+
+                if not data:
+                    misses += 1
+                    if misses >= self.track_frames:
+                        hint = None
+                    continue
+
+                # Search the same area first in the next frames
+                hint, misses = bbox, 0
+
+                if self._debounced(data, captured_at):
+                    continue
+
+                result = self.validator.validate(data) if self.validator is not None else None
+                with self._stats_lock:
+                    self.stats["results"] += 1
+                self._results.put({
+                    "data": data,
+                    "result": result,
+                    "bbox": bbox,
+                    "frame": frame_index,
+                    "timestamp": captured_at - self._started,
+                    "latency_seconds": time.monotonic() - captured_at,
+                })
+        except Exception as e:
+            logger.exception("❌ Stream decode failed: %s", e)
+        finally:
+            self._results.put(None)
+
+    def _debounced(self, data, now):
+        """
+        Returns True if `data` was already read within the last `debounce` seconds.
+        Every read refreshes the timer, so a code held in view stays silent.
+        """
+        last_seen = self._seen.get(data)
+        self._seen[data] = now
+        if len(self._seen) > 1000:
+            # Forget codes that left the view long ago
+            self._seen = {key: seen for key, seen in self._seen.items() if now - seen <= self.debounce}
+
+        if last_seen is not None and now - last_seen <= self.debounce:
+            with self._stats_lock:
+                self.stats["duplicates"] += 1
+            return True
+        return False
+
+    def _record_frame(self, elapsed, tracked, found):
+        """
+        Updates the per-frame decode counters.
+        """
+        with self._stats_lock:
+            self.stats["frames_decoded"] += 1
+            self.stats["tracked_frames"] += int(tracked)
+            self.stats["codes_read"] += int(found)
+            self.stats["decode_seconds_total"] += elapsed
+            self.stats["decode_seconds_max"] = max(self.stats["decode_seconds_max"], elapsed)
+
+    def get_stats(self):
+        """
+        Returns frame counters plus sustained capture & decode FPS of the current (or last) scan.
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        if not stats:
+            return stats
+
+        elapsed = (self._finished or time.monotonic()) - self._started
+        stats["elapsed_seconds"] = elapsed
+        stats["capture_fps"] = stats["frames_read"] / elapsed if elapsed else 0.0
+        stats["decode_fps"] = stats["frames_decoded"] / elapsed if elapsed else 0.0
+        stats["skip_rate"] = stats["frames_skipped"] / stats["frames_read"] if stats["frames_read"] else 0.0
+        stats["decode_seconds_avg"] = (
+            stats["decode_seconds_total"] / stats["frames_decoded"] if stats["frames_decoded"] else 0.0
+        )
+        return stats
+
+
+if __name__ == "__main__":
+    # Kiosk mode: python StreamScanner.py [camera index | video file | stream URL]
+    from Validator import Validator
+    from ReplyFormatter import format_whatsapp_reply
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "0"
+    source = int(source) if source.isdigit() else source
+
+    scanner = StreamScanner(validator=Validator())
+    try:
+        for item in scanner.scan(source):
+            print(f"[frame {item['frame']}] {item['data']} ({item['latency_seconds'] * 1000:.0f} ms)")
+            print(format_whatsapp_reply(item["result"]))
+    except KeyboardInterrupt:
+        pass
+
+    stats = scanner.get_stats()
+    print(f"DONE, {stats['frames_read']} frames read at {stats['capture_fps']:.1f} FPS, "
+          f"{stats['frames_decoded']} decoded at {stats['decode_fps']:.1f} FPS, "
+          f"{stats['frames_skipped']} skipped, {stats['results']} results")
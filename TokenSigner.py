@@ -0,0 +1,169 @@
+# Import required libraries
+import os
+import sys
+import hmac
+import base64
+import hashlib
+import secrets
+from datetime import date, datetime
+
+class TokenSigner:
+    """
+    TokenSigner class
+    - Builds self-contained QR payloads: "QR1.<customer_id>.<YYYYMMDD expiry>.<key id>.<signature>".
+    - The signature is a truncated HMAC-SHA256 over the rest of the payload, so a kiosk
+      holding the key can reject forged or expired codes without touching the database.
+    - Several keys can be configured at once (by key id) to rotate keys without
+      invalidating cards that are already printed.
+    - Payloads without the "QR1." prefix (bare customer_ids) are not tokens and are left alone.
+    """
+
+    PREFIX = "QR1"
+    # 96-bit signature → 16 base64url characters, keeps the QR code small
+    SIGNATURE_BYTES = 12
+
+    def __init__(self, keys, signing_key_id=None):
+        """
+        Args:
+            keys (dict): key id → secret (str or bytes). Key ids must not contain ".".
+            signing_key_id (str): Key used by sign() (the first key if None).
+        """
+        if not keys:
+            raise ValueError("At least one signing key is required")
+        self.keys = {
+            str(key_id): secret.encode() if isinstance(secret, str) else bytes(secret)
+            for key_id, secret in keys.items()
+        }
+        for key_id in self.keys:
+            if not key_id or "." in key_id:
+                raise ValueError(f"Invalid key id: {key_id!r}")
+
+        self.signing_key_id = str(signing_key_id) if signing_key_id is not None else next(iter(self.keys))
+        if self.signing_key_id not in self.keys:
+            raise ValueError(f"Unknown signing key id: {self.signing_key_id}")
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a signer from QR_TOKEN_KEYS ("k1:secret,k0:old-secret") and
+        QR_TOKEN_KEY_ID (signing key, defaults to the first one).
+
+        Returns:
+            TokenSigner: The signer, or None if no keys are configured.
+        """
+        raw = os.environ.get("QR_TOKEN_KEYS", "").strip()
+        if not raw:
+            return None
+
+        keys = {}
+        for entry in raw.split(","):
+            key_id, sep, secret = entry.strip().partition(":")
+            if not sep or not secret:
+                raise ValueError("QR_TOKEN_KEYS entries must look like <key id>:<secret>")
+            keys[key_id] = secret
+        return cls(keys, os.environ.get("QR_TOKEN_KEY_ID") or None)
+
+    def _signature(self, key_id, message):
+        """
+        Returns the base64url (unpadded) truncated HMAC of `message`.
+        """
+        digest = hmac.new(self.keys[key_id], message.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:self.SIGNATURE_BYTES]).rstrip(b"=").decode()
+
+    def sign(self, customer_id, expiration_date):
+        """
+        Builds the signed QR payload of a customer.
+
+        Args:
+            customer_id (str): Customer id (must not contain ".").
+            expiration_date (str or date): Membership expiry ("YYYY-MM-DD" or a date).
+
+        Returns:
+            str: The token to encode in the QR code.
+        """
+        customer_id = str(customer_id)
+        if not customer_id or "." in customer_id:
+            raise ValueError(f"Invalid customer id: {customer_id!r}")
+        if isinstance(expiration_date, str):
+            expiration_date = datetime.strptime(expiration_date[:10], "%Y-%m-%d").date()
+
+        message = f"{self.PREFIX}.{customer_id}.{expiration_date:%Y%m%d}.{self.signing_key_id}"
+        return f"{message}.{self._signature(self.signing_key_id, message)}"
+
+    @classmethod
+    def is_token(cls, payload):
+        """
+        Returns True if `payload` uses the token format (signed or not).
+        """
+        return isinstance(payload, str) and payload.startswith(cls.PREFIX + ".")
+
+    def verify(self, payload, today=None):
+        """
+        Checks the signature and expiry of a token, without any I/O.
+
+        Args:
+            payload (str): Decoded QR payload.
+            today (date): Reference day for the expiry check (date.today() if None).
+
+        Returns:
+            dict: {"status": "valid" | "expired" | "invalid", "customer_id": str,
+                   "expiration_date": date, "key_id": str} (customer_id, expiration_date
+                   & key_id are None when invalid), or None if `payload` is not a token.
+        """
+        if not self.is_token(payload):
+            return None
+
+        invalid = {"status": "invalid", "customer_id": None, "expiration_date": None, "key_id": None}
+        parts = payload.split(".")
+        if len(parts) != 5:
+            return invalid
+
+        _, customer_id, expiry, key_id, signature = parts
+        if key_id not in self.keys or not customer_id:
+            return invalid
+
+        message = payload[:-len(signature) - 1]
+        if not hmac.compare_digest(signature.encode(), self._signature(key_id, message).encode()):
+            return invalid
+
+        try:
+            # Slicing beats strptime on this hot path
+            expiration_date = date(int(expiry[:4]), int(expiry[4:6]), int(expiry[6:]))
+        except ValueError:
+            return invalid
+
+        today = today or date.today()
+        return {
+            "status": "valid" if today <= expiration_date else "expired",
+            "customer_id": customer_id,
+            "expiration_date": expiration_date,
+            "key_id": key_id,
+        }
+
+
+def generate_secret():
+    """
+    Returns a new random secret suitable for QR_TOKEN_KEYS.
+    """
+    return secrets.token_urlsafe(32)
+
+
+if __name__ == "__main__":
+    # python TokenSigner.py genkey | sign <customer_id> <YYYY-MM-DD> | verify <payload>
+    command = sys.argv[1] if len(sys.argv) > 1 else "genkey"
+
+    if command == "genkey":
+        print(generate_secret())
+        sys.exit(0)
+
+    signer = TokenSigner.from_env()
+    if signer is None:
+        sys.exit("❌ Set QR_TOKEN_KEYS (e.g. QR_TOKEN_KEYS=k1:$(python TokenSigner.py genkey))")
+
+    if command == "sign" and len(sys.argv) == 4:
+        print(signer.sign(sys.argv[2], sys.argv[3]))
+    elif command == "verify" and len(sys.argv) == 3:
+        result = signer.verify(sys.argv[2])
+        print(result if result is not None else "Not a signed token (bare customer_id)")
+    else:
+        sys.exit("Usage: python TokenSigner.py genkey | sign <customer_id> <YYYY-MM-DD> | verify <payload>")
@@ -1,51 +1,549 @@
 # Import required libraries
+import os
+import math
+import time
+import logging
+import threading
 import pandas as pd
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from DatabaseSnapshot import DatabaseSnapshot, file_lock
+from StorageBackend import (
+    StorageBackend, PandasBackend, SQLiteBackend, import_excel, sqlite_path_for,
+    DISPLAY_TITLES, parse_expiration, format_rows, compact_frame,
+)
+from TokenSigner import TokenSigner
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 class Validator:
     """
     Validator class
-    - Loads the customer & vehicle database.
+    - Loads the customer & vehicle database through a storage backend
+      (in-memory pandas table or SQLite file).
+    - Optionally watches the database file and hot-swaps in a fresh table when it changes.
     - Validates a scanned QR code against the database.
+    - Signed QR tokens (see TokenSigner) are checked for forgery & expiry locally first;
+      bare customer_id payloads go straight to the database.
     - Checks for customer existence & membership expiration.
     - Formats results for display.
+    - Answers reporting queries (expiring memberships, maintenance due & alerts)
+      from the backend's sorted secondary indexes, one page at a time.
     """
-    def __init__(self):
-        # Load the Excel file into a pandas DataFrame
-        self.df = pd.read_excel('customers_with_vehicles.xlsx')
-        print("Validator Connected to Database")
-    
-    def validate(self, data):
+
+    # Max rows per reporting page
+    MAX_REPORT_LIMIT = 1000
+
+    # Customer-level fields returned by expiring_memberships()
+    CUSTOMER_FIELDS = ["customer_id", "first_name", "last_name", "number of cars", "expiration_date"]
+    def __init__(self, database_path='customers_with_vehicles.xlsx', use_snapshot=True, backend='pandas',
+                 compact=True, signer=None):
+        """
+        Args:
+            database_path (str): Excel database generated by create_database.py
+                                 (or a .sqlite file for the SQLite backend).
+            use_snapshot (bool): Pandas backend only: load from the compiled snapshot
+                                 (rebuilt if the Excel changed) instead of parsing the Excel file.
+            backend (str or StorageBackend): 'pandas', 'sqlite' or a ready-made backend instance.
+            compact (bool): Pandas backend only: keep just the served columns, in compact
+                            types (categoricals, dates, small ints) — see compact_frame().
+            signer (TokenSigner): Verifies signed QR tokens (built from QR_TOKEN_KEYS if None;
+                                  without keys, signed tokens are rejected).
+        """
+        self.database_path = database_path
+        self.use_snapshot = use_snapshot
+        self.compact = compact
+        self.backend_kind = None if isinstance(backend, StorageBackend) else backend
+        self.signer = signer if signer is not None else TokenSigner.from_env()
+
+        # Signature of the source file the current backend was built from
+        self._loaded_signature = self._source_signature()
+
+        if isinstance(backend, StorageBackend):
+            self.backend = backend
+        else:
+            self.backend = self._load_backend()
+
+        # Lookup counters (guarded by a lock since Flask serves requests from several threads)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "lookups": 0,
+            "lookup_hits": 0,
+            "lookup_misses": 0,
+            "lookup_seconds_total": 0.0,
+            "lookup_seconds_max": 0.0,
+            "tokens_verified": 0,
+            "tokens_rejected": 0,
+            "offline_results": 0,
+            "snapshot_version": 1,
+            "reloads": 0,
+            "reload_errors": 0,
+            "last_reload_mode": None,
+            "last_reload_seconds": 0.0,
+        }
+
+        # Hot reload state
+        self._reload_lock = threading.Lock()
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+
+        logger.info("Validator Connected to Database (%s)", self.backend.name)
+
+    def _load_dataframe(self):
+        """
+        Reads the customer & vehicle table for the pandas backend.
+
+        Returns:
+            tuple: (pd.DataFrame, dict of prebuilt PandasBackend arguments — the snapshot's
+                   customer_id index & expiration ordinals, empty when read from Excel)
+        """
+        prebuilt = {}
+        if self.use_snapshot:
+            # Memory-mapped columnar snapshot, compiled from the Excel file when stale
+            df, prebuilt = DatabaseSnapshot(self.database_path).load(with_index=True)
+        else:
+            # Load the Excel file into a pandas DataFrame
+            df = pd.read_excel(self.database_path)
+        # compact_frame() keeps the row order, so the prebuilt offsets stay valid
+        return (compact_frame(df) if self.compact else df), prebuilt
+
+    def _load_backend(self):
+        """
+        Builds a new storage backend from the database file.
+        """
+        if self.backend_kind == 'pandas':
+            df, prebuilt = self._load_dataframe()
+            return PandasBackend(df, **prebuilt)
+        elif self.backend_kind == 'sqlite':
+            return SQLiteBackend(self._prepare_sqlite(self.database_path))
+        raise ValueError(f"Unknown storage backend: {self.backend_kind}")
+
+    def _prepare_sqlite(self, database_path):
+        """
+        Returns the SQLite file to open. An Excel path is imported into a sibling
+        .sqlite file first, unless that file is already newer than the workbook.
+        The import swaps the new table in with a single commit (see import_frames()),
+        so scans served from the same file keep finding customers meanwhile.
+        Several processes watching the same workbook take turns on a lock file;
+        the ones that waited find the import done and skip it.
+        """
+        if database_path.endswith(('.sqlite', '.db')):
+            return database_path
+
+        db_path = sqlite_path_for(database_path)
+        if self._sqlite_is_stale(database_path, db_path):
+            with file_lock(db_path + '.import.lock'):
+                if self._sqlite_is_stale(database_path, db_path):
+                    import_excel(database_path, db_path)
+        return db_path
+
+    @staticmethod
+    def _sqlite_is_stale(xlsx_path, db_path):
+        """
+        True if the SQLite file is missing or older than the workbook. Commits land in
+        the WAL file first, so its mtime counts as well.
+        """
+        imported_at = [os.path.getmtime(path) for path in (db_path, db_path + '-wal') if os.path.exists(path)]
+        return not imported_at or max(imported_at) < os.path.getmtime(xlsx_path)
+
+    def _source_signature(self):
+        """
+        Returns (mtime, size) of the watched database file(s), used to detect changes.
+        A SQLite file is watched together with its WAL file, since writes land there first.
+        """
+        paths = [self.database_path]
+        if self.database_path.endswith(('.sqlite', '.db')):
+            paths.append(self.database_path + '-wal')
+
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def reload(self, force=False):
+        """
+        Rebuilds the table from the database file and swaps it in atomically.
+        The new table & index are fully built before the swap, so scans in flight
+        keep using the old one and never see a half-loaded table.
+        If the file only gained rows at the end, just those rows are indexed.
+
+        Args:
+            force (bool): Reload even if the file has not changed.
+
+        Returns:
+            bool: True if a new snapshot was swapped in.
+        """
+        if self.backend_kind is None:
+            # Backend was supplied by the caller; we don't know how to rebuild it
+            return False
+
+        with self._reload_lock:
+            # Read the signature before loading, so a change made mid-load triggers another reload
+            signature = self._source_signature()
+            if not force and signature == self._loaded_signature:
+                return False
+
+            start = time.perf_counter()
+            current = self.backend
+
+            if self.backend_kind == 'pandas':
+                df, prebuilt = self._load_dataframe()
+                new_backend = current.extended(df) if isinstance(current, PandasBackend) else None
+                mode = "append"
+                if new_backend is None:
+                    new_backend = PandasBackend(df, **prebuilt)
+                    mode = "full"
+                # Pointer swap: a single attribute assignment is atomic
+                self.backend = new_backend
+            else:
+                # SQLite is read live; only re-import when the source is an Excel file
+                self._prepare_sqlite(self.database_path)
+                mode = "live"
+
+            self._loaded_signature = signature
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self.stats["snapshot_version"] += 1
+                self.stats["reloads"] += 1
+                self.stats["last_reload_mode"] = mode
+                self.stats["last_reload_seconds"] = elapsed
+
+        metrics.observe("qr_stage_seconds", elapsed, "reload")
+        logger.info("Validator reloaded database (%s) in %.3fs", mode, elapsed)
+        return True
+
+    def start_watching(self, interval=5.0):
+        """
+        Starts a background thread that polls the database file every `interval`
+        seconds and reloads it when it changes.
+        """
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(
+            target=self._watch_loop, args=(interval,), name="validator-reload", daemon=True
+        )
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        """
+        Stops the background reload thread.
+        """
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join()
+            self._watch_thread = None
+
+    def _watch_loop(self, interval):
+        while not self._watch_stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the current snapshot if the new file can't be loaded
+                with self._stats_lock:
+                    self.stats["reload_errors"] += 1
+                logger.error("❌ Database reload failed: %s", e)
+
+    @property
+    def columns(self):
+        """
+        Column names of the rows returned by the backend.
+        """
+        return self.backend.columns
+
+    @property
+    def snapshot_version(self):
+        """
+        Version of the database snapshot being served (bumped after every reload).
+        """
+        return self.stats["snapshot_version"]
+
+    def get_stats(self):
+        """
+        Returns a snapshot of the index build time, lookup latency & reload counters.
+        """
+        backend = self.backend
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update(backend.stats)
+        stats["backend"] = backend.name
+        stats["lookup_seconds_avg"] = (
+            stats["lookup_seconds_total"] / stats["lookups"] if stats["lookups"] else 0.0
+        )
+        return stats
+
+    def memory_report(self):
+        """
+        Returns the memory footprint of the loaded data, per column
+        (see PandasBackend.memory_usage()); None for backends that don't hold it in RAM.
+        """
+        backend = self.backend
+        return backend.memory_usage() if hasattr(backend, "memory_usage") else None
+
+    def _record_lookup(self, elapsed, hit):
+        """
+        Updates the lookup latency counters.
+        """
+        with self._stats_lock:
+            self.stats["lookups"] += 1
+            self.stats["lookup_hits" if hit else "lookup_misses"] += 1
+            self.stats["lookup_seconds_total"] += elapsed
+            if elapsed > self.stats["lookup_seconds_max"]:
+                self.stats["lookup_seconds_max"] = elapsed
+        metrics.observe("qr_stage_seconds", elapsed, "lookup")
+
+    def _check_token(self, data):
+        """
+        Verifies a signed QR token locally (no I/O).
+
+        Returns:
+            tuple: (error result or None, verified token or None). Both are None
+                   for bare customer_id payloads.
+        """
+        if not TokenSigner.is_token(data):
+            return None, None
+
+        start = time.perf_counter()
+        token = self.signer.verify(data) if self.signer is not None else None
+        metrics.observe("qr_stage_seconds", time.perf_counter() - start, "token_verify")
+
+        status = token["status"] if token is not None else "invalid"
+        with self._stats_lock:
+            self.stats["tokens_verified" if status == "valid" else "tokens_rejected"] += 1
+
+        if status == "expired":
+            return {"error": "QR Code is Expired"}, None
+        if status != "valid":
+            logger.warning("⚠️ Rejected QR token with an invalid signature")
+            return {"error": "QR Code signature is invalid"}, None
+        return None, token
+
+    def _offline_result(self, token):
+        """
+        Result for a verified token answered without the database
+        (customer id & expiry only, no vehicle details).
+        """
+        with self._stats_lock:
+            self.stats["offline_results"] += 1
+        return {
+            "success": True,
+            "offline": True,
+            "headers": ["Customer Id", "Expiration Date"],
+            "data": [{
+                "customer_id": token["customer_id"],
+                "expiration_date": token["expiration_date"].isoformat(),
+            }]
+        }
+
+    def validate(self, data, details=True):
         """
         Validate the QR code data.
+        Signed tokens are checked for forgery & expiry first, without any I/O.
         Looks up the customer in the database using their customer_id.
-        Returns error if not found, else checks expiration.
+        Returns error if not found or expired, else the formatted customer data.
+
+        Args:
+            data (str): Decoded QR payload (signed token or bare customer_id).
+            details (bool): If False, a valid signed token is answered from the token
+                            alone (no lookup, no vehicle details). Bare customer_ids
+                            are always looked up.
         """
-        print("Checking if data in Database...")
-        
-        # Find rows where customer_id matches scanned data
-        customer_rows = self.df[self.df['customer_id'].astype(str) == data]
-        
-        if customer_rows.empty:
+        error, token = self._check_token(data)
+        if error is not None:
+            return error
+        if token is not None:
+            if not details:
+                return self._offline_result(token)
+            data = token["customer_id"]
+
+        logger.debug("Checking if data in Database...")
+
+        # Find the customer's precomputed record through the storage backend's customer_id index
+        # (read self.backend once so a concurrent reload can't swap it mid-scan)
+        backend = self.backend
+        start = time.perf_counter()
+        try:
+            record = backend.lookup_prepared(str(data))
+        except Exception as e:
+            if token is None:
+                raise
+            # Database unavailable: the verified token still proves membership
+            logger.warning("⚠️ Database lookup failed, answering from the QR token: %s", e)
+            return self._offline_result(token)
+        self._record_lookup(time.perf_counter() - start, record is not None)
+
+        if record is not None:
+            logger.debug("DONE.")
+        return self._build_result(backend, record)
+
+    def validate_many(self, items, details=True):
+        """
+        Validates many QR payloads in one pass over the index
+        (one backend snapshot & one date check for the whole batch).
+
+        Args:
+            items (list): Decoded QR payloads (signed tokens or bare customer_ids).
+            details (bool): See validate().
+
+        Returns:
+            list: One validate()-style result per item, in input order.
+        """
+        results = [None] * len(items)
+        tokens = {}
+        lookups = []  # (input position, customer_id)
+        for i, item in enumerate(items):
+            error, token = self._check_token(item)
+            if error is not None:
+                results[i] = error
+            elif token is not None and not details:
+                results[i] = self._offline_result(token)
+            else:
+                if token is not None:
+                    tokens[i] = token
+                lookups.append((i, token["customer_id"] if token is not None else str(item)))
+
+        if not lookups:
+            return results
+
+        backend = self.backend
+        start = time.perf_counter()
+        try:
+            records = backend.lookup_prepared_many([customer_id for _, customer_id in lookups])
+        except Exception as e:
+            if len(tokens) < len(lookups):
+                raise
+            logger.warning("⚠️ Database lookup failed, answering from the QR tokens: %s", e)
+            for i, token in tokens.items():
+                results[i] = self._offline_result(token)
+            return results
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.stats["lookups"] += len(records)
+            hits = sum(record is not None for record in records)
+            self.stats["lookup_hits"] += hits
+            self.stats["lookup_misses"] += len(records) - hits
+            self.stats["lookup_seconds_total"] += elapsed
+        metrics.observe("qr_stage_seconds", elapsed, "lookup_batch")
+
+        for (i, _), record in zip(lookups, records):
+            results[i] = self._build_result(backend, record)
+        return results
+
+    def _build_result(self, backend, record):
+        """
+        Turns a backend record (see StorageBackend.lookup_prepared) into the result dict.
+        """
+        if record is None:
             # No customer found
             return {"error": "no customer was found"}
-        else:
-            # Customer(s) found → convert rows to list of lists
-            all_customer_data = customer_rows.values.tolist()
-            print("DONE.")
-            # Check expiration date next
-            return self.check_exp_date(all_customer_data)
+
+        if "expiration_date" not in backend.columns:
+            # Column not found in Excel
+            return {"error": "Expiration date column not found in database."}
+
+        is_valid, rows = record
+        if not is_valid:
+            # Membership expired
+            return {"error": "QR Code is Expired"}
+
+        # Membership is valid → rows are already formatted for display
+        return {
+            "success": True,
+            "headers": DISPLAY_TITLES,
+            "data": rows
+        }
+
+    def _report(self, index, low, high, offset, limit, descending=False, fields=None):
+        """
+        Runs a range query on a secondary index and formats the page for display.
+
+        Returns:
+            dict: {"total": matching rows, "offset": int, "limit": int, "items": display dicts}
+        """
+        offset = max(0, int(offset))
+        limit = max(0, min(int(limit), self.MAX_REPORT_LIMIT))
+
+        backend = self.backend
+        with metrics.timer("qr_stage_seconds", "report_query"):
+            total, rows = backend.range_query(index, low, high, offset, limit, descending)
+            items = format_rows(backend.columns, rows)
+        if fields is not None:
+            items = [{field: item[field] for field in fields} for item in items]
+        return {"total": total, "offset": offset, "limit": limit, "items": items}
+
+    def expiring_memberships(self, days=30, offset=0, limit=100, today=None):
+        """
+        Customers whose membership expires within the next `days` days (today included),
+        soonest first.
+
+        Args:
+            days (int): Window length in days.
+            offset (int): Customers to skip (paging).
+            limit (int): Max customers to return (capped at MAX_REPORT_LIMIT).
+            today (date): Start of the window (date.today() if None).
+
+        Returns:
+            dict: {"total", "offset", "limit", "items": customer dicts (CUSTOMER_FIELDS)}
+        """
+        today = today or date.today()
+        try:
+            until = today + timedelta(days=int(days))
+        except OverflowError:
+            raise ValueError(f"'days' is out of range: {days}") from None
+        return self._report("expiration_date", today, until, offset, limit, fields=self.CUSTOMER_FIELDS)
+
+    def maintenance_alerts(self, max_remaining=None, offset=0, limit=100):
+        """
+        Vehicles with a predictive maintenance alert, lowest remaining useful life first.
+
+        Args:
+            max_remaining (float): Only vehicles with at most this remaining life (None for all).
+            offset (int): Vehicles to skip (paging).
+            limit (int): Max vehicles to return (capped at MAX_REPORT_LIMIT).
+
+        Returns:
+            dict: {"total", "offset", "limit", "items": vehicle row dicts}
+        """
+        if max_remaining is not None and not math.isfinite(max_remaining):
+            # NaN compares false with everything and would match every row
+            raise ValueError(f"'max_remaining' must be a finite number: {max_remaining}")
+        return self._report("remaining_useful_life", None, max_remaining, offset, limit)
+
+    def maintenance_due(self, before, after=None, offset=0, limit=100):
+        """
+        Vehicles whose next maintenance is due before `before` (excluded), earliest first.
+
+        Args:
+            before (date or str): Exclusive upper bound ("YYYY-MM-DD" or a date).
+            after (date or str): Optional inclusive lower bound.
+            offset (int): Vehicles to skip (paging).
+            limit (int): Max vehicles to return (capped at MAX_REPORT_LIMIT).
+
+        Returns:
+            dict: {"total", "offset", "limit", "items": vehicle row dicts}
+        """
+        if isinstance(before, str):
+            before = datetime.strptime(before, "%Y-%m-%d").date()
+        if before == date.min:
+            raise ValueError(f"'before' is out of range: {before}")
+        return self._report("next_maintenance_due", after, before - timedelta(days=1), offset, limit)
 
     def check_exp_date(self, customer_data):
         """
         Checks if the customer's membership is still valid.
-        Looks at the expiration_date field.
+        Looks at the expiration_date field of raw rows (as returned by backend.lookup()).
         """
-        print("Checking Expiration Date...")
+        logger.debug("Checking Expiration Date...")
+        start = time.perf_counter()
         today = date.today()
         
         # Find the index of the 'expiration_date' column
-        headers_from_df = self.df.columns.tolist()
+        headers_from_df = self.columns
         try:
             exp_date_col_idx = headers_from_df.index('expiration_date')
         except ValueError:
@@ -53,12 +551,12 @@ class Validator:
             return {"error": "Expiration date column not found in database."}
         
         # Parse expiration date of first record
-        exp_date_str = str(customer_data[0][exp_date_col_idx])
-        exp_date = datetime.strptime(exp_date_str, "%Y-%m-%d").date()
+        exp_date = parse_expiration(customer_data[0][exp_date_col_idx])
+        metrics.observe("qr_stage_seconds", time.perf_counter() - start, "expiration_check")
 
-        if today <= exp_date:
+        if exp_date is not None and today <= exp_date:
             # Membership is valid
-            print("DONE.")
+            logger.debug("DONE.")
             return self.format_customer_data(customer_data)
         else:
             # Membership expired
@@ -66,36 +564,13 @@ class Validator:
         
     def format_customer_data(self, customer_data):
         """
-        Formats the customer & vehicle data for rendering in HTML.
+        Formats raw customer & vehicle rows for rendering in HTML.
         Returns a dictionary with headers and data.
         """
-        # Expected headers in display order
-        headers = [
-            "customer_id", "first_name", "last_name", "number of cars", "car_vin",
-            "car_make", "car_model", "expiration_date", "status",
-            "last_maintenance_date", "next_maintenance_due", "maintenance_requirements",
-            "predictive_maintenance_alert", "remaining_useful_life"
-        ]
-        
-        # Actual column names from the DataFrame
-        df_columns = self.df.columns.tolist()
-        
-        formatted_data = []
-        for item_list in customer_data:  # each row as list
-            row_data = {}
-            for header_name in headers:
-                try:
-                    # Map header to DataFrame column index
-                    col_index = df_columns.index(header_name)
-                    row_data[header_name] = str(item_list[col_index])
-                except ValueError:
-                    # In case header not found in DataFrame
-                    row_data[header_name] = "N/A"
-            formatted_data.append(row_data)
-        
-        # Prepare final result
+        with metrics.timer("qr_stage_seconds", "format"):
+            rows = format_rows(self.columns, customer_data)
         return {
             "success": True,
-            "headers": [h.replace('_', ' ').title() for h in headers],  # Make headers more readable
-            "data": formatted_data
+            "headers": DISPLAY_TITLES,
+            "data": rows
         }
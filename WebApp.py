@@ -1,21 +1,113 @@
 import os
-import requests
-from flask import Flask, request, render_template
+import time
+import atexit
+import logging
+from flask import Flask, request, render_template, jsonify, g, Response
 from QRCodeReader import QRCodeReader
 from Validator import Validator
+from WebhookQueue import WebhookQueue
+from GraphClient import GraphClient
+from markupsafe import Markup
+from ReplyFormatter import format_whatsapp_reply, format_whatsapp_replies
+from RenderCache import RenderCache
+from ScanLog import ScanLog
+from WhatsAppConfig import VERIFY_TOKEN, ACCESS_TOKEN, PHONE_NUMBER_ID, GRAPH_API_URL
+from Metrics import metrics
+
+# LOG_LEVEL=WARNING silences the per-scan messages on the hot path (DEBUG shows every step)
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Your WhatsApp config
-VERIFY_TOKEN = "my_verify_token"
-ACCESS_TOKEN = "EAAR9abQEip0BPO622DbDDHlJOEGxpVzZCdg7reHWHB9qwTaialtZAQHjxYLDoeDdLMnoZAnVLjPhs9vzEdwbdjsJrh1T4bRB2ZCVZCZBgd2l3hfYxSpRD3kFPfQHIt10ZC9yQq4TECUdcXk3e1aJQgz9H1jCGYbXu6glhAgi1iuZBV8oCeV3ebTH3vw1tKiRkQkWPL5dPG80ret55JmIT4mporvn08egWJccB4VtZBmsDFxMZD"
-PHONE_NUMBER_ID = "699992206533063"
+# Max items accepted by /api/scan/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 100))
 
-reader = QRCodeReader()
-validator = Validator()
+# App services, created by init_services() (left None in spawned decode workers, see the end of the file)
+graph = None
+reader = None
+validator = None
+render_cache = None
+scan_log = None
+webhook_queue = None
 
-UPLOAD_FOLDER = "temp_uploaded_file"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+def init_services(validator_instance=None, scan_log_path=None, watch=True):
+    """
+    Creates the services the routes use: Graph API client, QR reader, Validator,
+    render cache, scan log & webhook workers.
+
+    Args:
+        validator_instance (Validator): Validator to serve (a default Validator() if None).
+        scan_log_path (str): Scan log file (SCAN_LOG_PATH, default scan_log.sqlite, if None).
+        watch (bool): Reload the database in the background when its file changes.
+    """
+    global graph, reader, validator, render_cache, scan_log, webhook_queue
+
+    # Shared keep-alive client for Graph API calls (pooled connections, timeouts & retries)
+    graph = GraphClient(GRAPH_API_URL, ACCESS_TOKEN)
+
+    reader = QRCodeReader()
+    validator = validator_instance or Validator()
+    if watch:
+        # Pick up database changes (renewals, new vehicles) without restarting the app
+        validator.start_watching()
+
+    # Rendered WhatsApp replies & HTML result fragments per customer (dropped on reload / new day)
+    render_cache = RenderCache(int(os.environ.get("RENDER_CACHE_SIZE", 10000)))
+
+    # Audit log of every scan, written in batches by a background thread (.sqlite or .jsonl)
+    scan_log = ScanLog(
+        scan_log_path or os.environ.get("SCAN_LOG_PATH", "scan_log.sqlite"),
+        rate_window=float(os.environ.get("SCAN_RATE_WINDOW", 60)),
+        rate_limit=int(os.environ.get("SCAN_RATE_LIMIT", 5)),
+    )
+    # The writer is a daemon thread: write what is still queued when the app exits
+    atexit.register(scan_log.close)
+
+    # Background workers for webhook messages (bounded queue, deduplicated by message id)
+    webhook_queue = WebhookQueue(process_message, workers=int(os.environ.get("WEBHOOK_WORKERS", 4)))
+
+
+def render_result(result):
+    """
+    Renders the HTML result fragment of one scan (templates/result.html).
+    """
+    with metrics.timer("qr_stage_seconds", "html_render"):
+        return Markup(render_template('result.html', result=result))
+
+
+def read_upload(file):
+    """
+    Reads an uploaded file into memory, timing the upload_receive stage.
+    """
+    with metrics.timer("qr_stage_seconds", "upload_receive"):
+        return file.read()
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    # Label by route pattern (not raw path) to keep the number of series bounded
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - g.get("request_start", time.perf_counter())
+    metrics.observe("qr_http_request_seconds", elapsed, route, request.method, str(response.status_code))
+    return response
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Per-stage latency histograms & gauges in Prometheus text format.
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route('/', methods=['GET', 'POST'])
@@ -24,23 +116,186 @@ def upload_file():
         result = None
         file = request.files['file']
         if file:
-            filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-            file.save(filepath)
-
-            # Decode QR
-            qr_data = reader.smart_decode(filepath)
+            # Decode QR straight from the uploaded bytes (nothing is written to disk)
+            qr_data = reader.smart_decode(read_upload(file))
+            # Read the snapshot version before validating (see RenderCache.render)
+            version = validator.snapshot_version
             if qr_data:
                 result = validator.validate(qr_data)
             else:
                 result = "Invalid or unreadable QR code"
+            scan_log.record(qr_data, result, "web", request.remote_addr)
+            result_html = render_cache.render("html", result, version, render_result)
+            return render_template('index.html', result=result, result_html=result_html)
 
-            os.remove(filepath)
         return render_template('index.html', result=result)
     
     # For GET requests, don't pass any result
     return render_template('index.html')
 
 
+@app.route('/api/scan', methods=['POST'])
+def api_scan():
+    """
+    JSON scan API for kiosks & integrations.
+    Accepts an uploaded image/PDF ("file" form field) or JSON {"customer_id": "..."}
+    and returns the Validator result as JSON.
+    """
+    file = request.files.get('file')
+    if file:
+        qr_data = reader.smart_decode(read_upload(file))
+        if not qr_data:
+            scan_log.record(None, None, "api", request.remote_addr)
+            return jsonify({"error": "Invalid or unreadable QR code"}), 422
+    else:
+        payload = request.get_json(silent=True) or {}
+        qr_data = payload.get('customer_id')
+        if qr_data is None:
+            return jsonify({"error": "Send a 'file' upload or a JSON 'customer_id'"}), 400
+
+    result = validator.validate(qr_data)
+    scan_log.record(qr_data, result, "api", request.remote_addr)
+    return jsonify({"customer_id": str(qr_data), **result})
+
+
+@app.route('/api/scan/batch', methods=['POST'])
+def api_scan_batch():
+    """
+    Batch version of /api/scan.
+    Accepts many uploads ("files" form field, decoded in parallel) or
+    JSON {"customer_ids": [...]}, and validates them all in a single pass over the index.
+    """
+    files = request.files.getlist('files')
+    if files:
+        if len(files) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} items per batch"}), 413
+        names = [file.filename for file in files]
+        payloads = [read_upload(file) for file in files]
+        # Several images → decode on the process pool; a single one inline
+        decoded = reader.decode_many(payloads) if len(payloads) > 1 else [reader.smart_decode(payloads[0])]
+    else:
+        body = request.get_json(silent=True) or {}
+        customer_ids = body.get('customer_ids')
+        if not isinstance(customer_ids, list):
+            return jsonify({"error": "Send 'files' uploads or a JSON 'customer_ids' list"}), 400
+        if len(customer_ids) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} items per batch"}), 413
+        names = [str(customer_id) for customer_id in customer_ids]
+        decoded = customer_ids
+
+    # Validate every readable code at once
+    readable = [i for i, qr_data in enumerate(decoded) if qr_data]
+    validated = dict(zip(readable, validator.validate_many([decoded[i] for i in readable])))
+
+    scan_log.record_many(decoded, [validated.get(i) for i in range(len(decoded))], "api", request.remote_addr)
+
+    results = []
+    for i, name in enumerate(names):
+        if i in validated:
+            results.append({"input": name, "customer_id": str(decoded[i]), **validated[i]})
+        else:
+            results.append({"input": name, "error": "Invalid or unreadable QR code"})
+    return jsonify({"results": results})
+
+
+@app.route('/api/scan/all', methods=['POST'])
+def api_scan_all():
+    """
+    Multi-code scan: finds every QR code in one uploaded photo or PDF (all pages)
+    and validates them in a single batched lookup.
+    Each result carries the page & bounding box [x, y, width, height] of its code.
+    """
+    file = request.files.get('file')
+    if not file:
+        return jsonify({"error": "Send a 'file' upload"}), 400
+
+    codes = reader.decode_all(read_upload(file))
+    if not codes:
+        scan_log.record(None, None, "api", request.remote_addr)
+        return jsonify({"error": "Invalid or unreadable QR code"}), 422
+
+    validated = validator.validate_many([code["data"] for code in codes])
+    scan_log.record_many([code["data"] for code in codes], validated, "api", request.remote_addr)
+    results = []
+    for code, result in zip(codes, validated):
+        results.append({
+            "customer_id": code["data"],
+            "page": code["page"],
+            "bbox": code["bbox"],
+            "dpi": code["dpi"],
+            **result,
+        })
+    return jsonify({"results": results})
+
+
+@app.route('/api/scans/<customer_id>')
+def api_scan_history(customer_id):
+    """
+    Scan history of one customer from the audit log, newest first (?limit=, default 50),
+    plus the number of scans within the rate check window.
+    """
+    try:
+        limit = min(int(request.args.get('limit', 50)), 1000)
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    return jsonify({
+        "customer_id": customer_id,
+        "recent_scans": scan_log.recent_scans(customer_id),
+        "scans": scan_log.history(customer_id, limit=limit),
+    })
+
+
+def report_response(query, *args):
+    """
+    Runs a Validator report with the request's paging (?offset=&limit=) and returns it as JSON.
+    Invalid parameters (bad numbers or dates, out-of-range values) answer 400.
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 100))
+        return jsonify(query(*args, offset=offset, limit=limit))
+    except (ValueError, OverflowError) as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+
+
+@app.route('/api/reports/expiring')
+def api_report_expiring():
+    """
+    Memberships expiring in the next ?days= days (default 30), soonest first.
+    """
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({"error": "'days' must be an integer"}), 400
+    return report_response(validator.expiring_memberships, days)
+
+
+@app.route('/api/reports/maintenance-alerts')
+def api_report_maintenance_alerts():
+    """
+    Vehicles with a predictive maintenance alert, lowest remaining useful life first
+    (optionally only those with at most ?max_remaining= km left).
+    """
+    max_remaining = request.args.get('max_remaining')
+    try:
+        max_remaining = float(max_remaining) if max_remaining is not None else None
+    except ValueError:
+        return jsonify({"error": "'max_remaining' must be a number"}), 400
+    return report_response(validator.maintenance_alerts, max_remaining)
+
+
+@app.route('/api/reports/maintenance-due')
+def api_report_maintenance_due():
+    """
+    Vehicles whose next maintenance is due before ?before=YYYY-MM-DD
+    (optionally on or after ?after=YYYY-MM-DD), earliest first.
+    """
+    before = request.args.get('before')
+    if not before:
+        return jsonify({"error": "Send a 'before' date (YYYY-MM-DD)"}), 400
+    return report_response(validator.maintenance_due, before, request.args.get('after'))
+
+
 @app.route("/webhook", methods=["GET", "POST"])
 def webhook():
     if request.method == "GET":
@@ -49,127 +304,115 @@ def webhook():
         challenge = request.args.get("hub.challenge")
 
         if mode == "subscribe" and token == VERIFY_TOKEN:
-            print("✅ Webhook verified!")
+            logger.info("✅ Webhook verified!")
             return challenge, 200
         else:
             return "❌ Verification failed", 403
 
     if request.method == "POST":
         data = request.get_json()
-        print("📩 Incoming webhook:", data)
+        logger.debug("📩 Incoming webhook: %s", data)
 
+        # Queue the messages and acknowledge right away; Meta retries slow webhooks
         try:
-            entry = data.get("entry", [])[0]
-            changes = entry.get("changes", [])[0]
-            value = changes.get("value", {})
-            messages = value.get("messages", [])
-
-            if not messages:
-                return "OK", 200
-
-            message = messages[0]
-            from_number = message["from"]
-            msg_type = message["type"]
-
-            if msg_type == "image":
-                media_id = message["image"]["id"]
-                print(f"📷 Image media_id: {media_id}")
-
-                # Step 1: Get media URL
-                media_url = get_media_url(media_id)
-                if not media_url:
-                    send_whatsapp_message(from_number, "❌ Failed to get image URL.")
-                    return "OK", 200
-
-                # Step 2: Download the image
-                image_path = os.path.join(UPLOAD_FOLDER, f"{media_id}.jpg")
-                download_image(media_url, image_path)
-
-                # Step 3: Decode & Validate
-                qr_data = reader.smart_decode(image_path)
-                os.remove(image_path)
+            for entry in data.get("entry", []):
+                for changes in entry.get("changes", []):
+                    for message in changes.get("value", {}).get("messages", []):
+                        if not webhook_queue.submit(message.get("id"), message):
+                            logger.info("↩️ Skipped message %s (duplicate or queue full)", message.get('id'))
+        except Exception as e:
+            logger.error("❌ Error: %s", e)
 
-                if not qr_data:
-                    send_whatsapp_message(from_number, "❌ Invalid or unreadable QR code.")
-                    return "OK", 200
+        return "OK", 200
 
-                result = validator.validate(qr_data)
 
-                # Step 4: Format result
-                if "error" in result:
-                    reply = f"⚠️ {result['error']}"
-                else:
-                    customer = result["data"][0]  # first record contains customer info
-                    reply = "✅ QR Code is valid!\n\n"
-                    reply += f"👤 Customer: {customer.get('first_name', '')} {customer.get('last_name', '')}\n"
-                    reply += f"🆔 ID: {customer.get('customer_id', '')}\n"
-                    reply += f"📅 Membership Expiration: {customer.get('expiration_date', '')}\n"
-                    reply += f"🚗 Total Vehicles: {customer.get('number of cars', len(result['data']))}\n\n"
-
-                    # Now list vehicles
-                    for idx, car in enumerate(result["data"], 1):
-                        reply += f"🚙 Vehicle #{idx}\n"
-                        reply += f"   Make & Model: {car.get('car_make', '')} {car.get('car_model', '')}\n"
-                        reply += f"   VIN: {car.get('car_vin', '')}\n"
-                        reply += f"   Status: {car.get('status', '')}\n"
-                        reply += f"   Last Service: {car.get('last_maintenance_date', '')}\n"
-                        reply += f"   Next Due: {car.get('next_maintenance_due', '')}\n"
-
-                        if car.get('predictive_maintenance_alert') == 'True':
-                            reply += f"   🚨 Predictive Alert: Remaining Life: {car.get('remaining_useful_life', '')}\n"
-
-                        reply += "\n"
-
-                send_whatsapp_message(from_number, reply)
+def process_message(message):
+    """
+    Handles one WhatsApp message on a webhook worker thread:
+    fetch the image (or PDF document), decode & validate every QR code in it,
+    then reply to the sender.
+
+    Returns:
+        bool: False if the media could not be fetched (see WebhookQueue).
+    """
+    from_number = message["from"]
+    msg_type = message["type"]
+
+    if msg_type in ("image", "document"):
+        media_id = message[msg_type]["id"]
+        logger.info("📷 %s media_id: %s", msg_type.title(), media_id)
+
+        # Step 1: Get media URL
+        media_url = get_media_url(media_id)
+        if not media_url:
+            send_whatsapp_message(from_number, "❌ Failed to get image URL.")
+            return False
+
+        # Step 2: Download the image into memory
+        image_bytes = download_image(media_url)
+        if not image_bytes:
+            send_whatsapp_message(from_number, "❌ Failed to download image.")
+            return False
+
+        # Step 3: Decode every QR code (several cards may be in one photo / PDF) & validate them in one batch
+        codes = reader.decode_all(image_bytes)
+
+        if not codes:
+            scan_log.record(None, None, "whatsapp", from_number)
+            send_whatsapp_message(from_number, "❌ Invalid or unreadable QR code.")
+            return
+
+        customer_ids = [code["data"] for code in codes]
+        version = validator.snapshot_version
+        results = validator.validate_many(customer_ids)
+        scan_log.record_many(customer_ids, results, "whatsapp", from_number)
+
+        # Step 4: Format result(s)
+        with metrics.timer("qr_stage_seconds", "reply_format"):
+            replies = format_whatsapp_replies(
+                results, customer_ids, render_cache.renderer("whatsapp", version, format_whatsapp_reply)
+            )
+
+        for reply in replies:
+            send_whatsapp_message(from_number, reply)
 
-            else:
-                print(f"📄 Received message type: {msg_type}")
-                send_whatsapp_message(from_number, "📷 Please send a QR code image.")
+    else:
+        logger.info("📄 Received message type: %s", msg_type)
+        send_whatsapp_message(from_number, "📷 Please send a QR code image or PDF.")
 
-        except Exception as e:
-            print("❌ Error:", e)
 
-        return "OK", 200
+metrics.gauge("qr_webhook_queue_depth", "Webhook messages waiting for a worker.",
+              lambda: webhook_queue.get_stats()["queue_depth"])
+metrics.gauge("qr_validator_snapshot_version", "Database snapshot currently served (bumped on reload).",
+              lambda: validator.get_stats()["snapshot_version"])
+metrics.gauge("qr_scan_log_queue_depth", "Scan log entries waiting to be written.",
+              lambda: scan_log.get_stats()["queue_depth"])
+metrics.gauge("qr_render_cache_size", "Rendered replies & HTML fragments held in the render cache.",
+              lambda: render_cache.get_stats()["size"])
+metrics.gauge("qr_decode_cache_size", "Payloads held in the decode cache.",
+              lambda: reader.cache.get_stats()["size"] if reader.cache else 0)
 
 
 def get_media_url(media_id):
-    url = f"https://graph.facebook.com/v18.0/{media_id}"
-    headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
-    params = {"fields": "url"}
-
-    r = requests.get(url, headers=headers, params=params)
-    if r.ok:
-        return r.json().get("url")
-    print("❌ Failed to get media URL:", r.text)
-    return None
+    return graph.get_media_url(media_id)
 
 
-def download_image(url, filepath):
-    headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
-    r = requests.get(url, headers=headers)
-    with open(filepath, "wb") as f:
-        f.write(r.content)
-    print(f"✅ Image downloaded: {filepath}")
+def download_image(url):
+    content = graph.download_media(url)
+    if content is not None:
+        logger.info("✅ Image downloaded: %s bytes", len(content))
+    return content
 
 
 def send_whatsapp_message(to, message):
-    url = f"https://graph.facebook.com/v18.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "messaging_product": "whatsapp",
-        "to": to,
-        "type": "text",
-        "text": {"body": message}
-    }
-
-    r = requests.post(url, headers=headers, json=data)
-    if r.ok:
-        print("✅ Reply sent!")
-    else:
-        print("❌ Failed to send message:", r.text)
+    graph.send_message(PHONE_NUMBER_ID, to, message)
+
+
+# decode_many() workers are spawned processes: when the app is started with `python WebApp.py`
+# each of them re-imports this file as "__mp_main__", and must not start its own services.
+# WEBAPP_AUTOSTART=0 leaves the call to the importer (e.g. Benchmark.py, with its own Validator).
+if __name__ != "__mp_main__" and os.environ.get("WEBAPP_AUTOSTART", "1") != "0":
+    init_services()
 
 
 if __name__ == "__main__":
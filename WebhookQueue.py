@@ -0,0 +1,176 @@
+# Import required libraries
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class MessageDeduplicator:
+    """
+    MessageDeduplicator class
+    - Remembers recently accepted WhatsApp message ids (bounded size & TTL).
+    - Used to drop deliveries that Meta retries.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0):
+        """
+        Args:
+            max_size (int): How many recent message ids to remember.
+            ttl (float): Seconds a message id is remembered.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._seen = OrderedDict()  # message id → accepted at (monotonic)
+        self._lock = threading.Lock()
+
+    def seen(self, message_id):
+        """
+        Checks a message id and remembers it.
+
+        Returns:
+            bool: True if the id was already accepted within the TTL.
+        """
+        now = time.monotonic()
+        with self._lock:
+            # Forget ids older than the TTL (oldest first)
+            while self._seen:
+                oldest_id, accepted_at = next(iter(self._seen.items()))
+                if now - accepted_at <= self.ttl:
+                    break
+                del self._seen[oldest_id]
+
+            if message_id in self._seen:
+                return True
+
+            self._seen[message_id] = now
+            if len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+            return False
+
+    def forget(self, message_id):
+        """
+        Forgets a message id, so a later delivery is accepted again.
+        """
+        with self._lock:
+            self._seen.pop(message_id, None)
+
+
+class WebhookQueue:
+    """
+    WebhookQueue class
+    - Lets the webhook acknowledge Meta immediately and process messages in the background.
+    - Bounded queue served by a fixed pool of worker threads.
+    - Drops retried deliveries of a message id that was already accepted; a message whose
+      processing failed is forgotten, so its redelivery is processed again.
+    - Tracks queue depth, wait & processing latency.
+    """
+
+    def __init__(self, handler, workers=4, max_queue=1000, dedup_size=10000, dedup_ttl=3600.0):
+        """
+        Args:
+            handler (callable): Called with each message dict by a worker thread. Raising
+                                or returning False marks the message as failed.
+            workers (int): Number of worker threads.
+            max_queue (int): Max queued messages; new ones are rejected when full.
+            dedup_size (int): How many recent message ids to remember.
+            dedup_ttl (float): Seconds a message id is remembered.
+        """
+        self.handler = handler
+        self.dedup = MessageDeduplicator(dedup_size, dedup_ttl)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "failed": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "process_seconds_total": 0.0,
+            "process_seconds_max": 0.0,
+        }
+
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, message_id, message):
+        """
+        Queues a message for background processing.
+
+        Args:
+            message_id (str): WhatsApp message id, used to drop retried deliveries (None skips the check).
+            message (dict): Message payload passed to the handler.
+
+        Returns:
+            bool: True if queued, False if it was a duplicate or the queue is full.
+        """
+        if message_id is not None and self.dedup.seen(message_id):
+            with self._lock:
+                self.stats["duplicates"] += 1
+            return False
+
+        try:
+            self._queue.put_nowait((time.monotonic(), message_id, message))
+        except queue.Full:
+            # Let a later retry from Meta go through
+            self.dedup.forget(message_id)
+            with self._lock:
+                self.stats["rejected"] += 1
+            return False
+
+        with self._lock:
+            self.stats["enqueued"] += 1
+        return True
+
+    def _worker(self):
+        while True:
+            queued_at, message_id, message = self._queue.get()
+            started = time.monotonic()
+            failed = False
+            try:
+                failed = self.handler(message) is False
+            except Exception as e:
+                failed = True
+                logger.exception("❌ Error: %s", e)
+            finally:
+                if failed and message_id is not None:
+                    # Let Meta's redelivery through, so the sender still gets a reply
+                    self.dedup.forget(message_id)
+                finished = time.monotonic()
+                self._record(started - queued_at, finished - started, failed)
+                self._queue.task_done()
+
+    def _record(self, wait_seconds, process_seconds, failed):
+        metrics.observe("qr_stage_seconds", wait_seconds, "webhook_wait")
+        metrics.observe("qr_stage_seconds", process_seconds, "webhook_process")
+        with self._lock:
+            self.stats["failed" if failed else "processed"] += 1
+            self.stats["wait_seconds_total"] += wait_seconds
+            self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], wait_seconds)
+            self.stats["process_seconds_total"] += process_seconds
+            self.stats["process_seconds_max"] = max(self.stats["process_seconds_max"], process_seconds)
+
+    def join(self):
+        """
+        Blocks until every queued message has been processed (useful in tests).
+        """
+        self._queue.join()
+
+    def get_stats(self):
+        """
+        Returns the queue counters plus current depth & average latencies.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        done = stats["processed"] + stats["failed"]
+        stats["queue_depth"] = self._queue.qsize()
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / done if done else 0.0
+        stats["process_seconds_avg"] = stats["process_seconds_total"] / done if done else 0.0
+        return stats
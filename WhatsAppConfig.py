@@ -0,0 +1,8 @@
+import os
+
+# Your WhatsApp config (environment variables override the defaults)
+VERIFY_TOKEN = os.environ.get("VERIFY_TOKEN", "my_verify_token")
+ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN", "EAAR9abQEip0BPO622DbDDHlJOEGxpVzZCdg7reHWHB9qwTaialtZAQHjxYLDoeDdLMnoZAnVLjPhs9vzEdwbdjsJrh1T4bRB2ZCVZCZBgd2l3hfYxSpRD3kFPfQHIt10ZC9yQq4TECUdcXk3e1aJQgz9H1jCGYbXu6glhAgi1iuZBV8oCeV3ebTH3vw1tKiRkQkWPL5dPG80ret55JmIT4mporvn08egWJccB4VtZBmsDFxMZD")
+PHONE_NUMBER_ID = os.environ.get("PHONE_NUMBER_ID", "699992206533063")
+# Graph API base URL (override to point at a local stand-in when testing)
+GRAPH_API_URL = os.environ.get("GRAPH_API_URL", "https://graph.facebook.com/v18.0")
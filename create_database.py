@@ -1,11 +1,23 @@
+import io
 import os
+import csv
 import random
+import argparse
+import itertools
 import qrcode
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from faker import Faker
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.drawing.image import Image
 from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
 from datetime import datetime, timedelta
+from DatabaseSnapshot import DatabaseSnapshot
+from StorageBackend import import_frames
+from TokenSigner import TokenSigner
 
 # Initialize Faker for generating fake names and data
 fake = Faker()
@@ -43,37 +55,51 @@ car_models = {
     ]
 }
 
-print("Removing previous QR code images...")
 
-# Define the folder to store QR code images
-qr_folder = "QRcodes"
+# Column headers of the generated table; QR_code holds the embedded image (Excel) or the image path
+HEADERS = [
+    'customer_id', 'first_name', 'last_name', 'number of cars',
+    'car_vin', 'car_make', 'car_model',
+    'expiration_date', 'status', 'last_maintenance_date', 'next_maintenance_due',
+    'maintenance_requirements', 'predictive_maintenance_alert', 'remaining_useful_life',
+    'QR_code'
+]
+
+# Customers generated per worker task
+CHUNK_SIZE = 2000
+
+# Above this many customers, QR images are no longer embedded in the workbook by default
+EMBED_IMAGE_LIMIT = 10_000
 
-# If the folder doesn't exist, create it. Otherwise, delete all previous QR images inside
-if not os.path.exists(qr_folder):
-    os.makedirs(qr_folder)
-else:
-    for filename in os.listdir(qr_folder):
-        file_path = os.path.join(qr_folder, filename)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
 
-# This list will store all generated data for export
-all_data = []
+def generate_customer(customer_id=None, qr_folder=None, signer=None):
+    """
+    Generates one fake customer and a record for each of their vehicles.
 
-print("Generating fake customers, vehicles and QR codes...")
+    Args:
+        customer_id (str): Customer id to use (a random unique 6-digit id if None).
+        qr_folder (str): Folder to save the customer's QR code image in (None to skip the image).
+        signer (TokenSigner): Encode a signed token (id + expiry) instead of the bare customer_id.
+
+    Returns:
+        list: One record (dict) per vehicle.
+    """
+    rows = []
 
-# Generate data for 500 fake customers
-for _ in range(500):
     # Generate basic customer data
     first_name = fake.first_name()
     last_name = fake.last_name()
-    customer_id = str(fake.unique.random_int(100000, 999999))
+    if customer_id is None:
+        customer_id = str(fake.unique.random_int(100000, 999999))
     expiration_date = str(fake.date_between(start_date='-5y', end_date='+5y'))
 
-    # Generate and save a QR code image for the customer ID
-    qr_path = f"{qr_folder}/{customer_id}.png"
-    img = qrcode.make(customer_id)
-    img.save(qr_path)
+    # Generate and save a QR code image for the customer ID (or its signed token)
+    qr_path = None
+    if qr_folder is not None:
+        qr_path = f"{qr_folder}/{customer_id}.png"
+        payload = signer.sign(customer_id, expiration_date) if signer is not None else customer_id
+        img = qrcode.make(payload)
+        img.save(qr_path)
 
     # Randomly assign number of cars the customer owns
     car_num = random.choices(vehicle_count, weights=weights)[0]
@@ -116,7 +142,7 @@ for _ in range(500):
             remaining_life = "N/A"
 
         # Append the record as a dictionary
-        all_data.append({
+        rows.append({
             'customer_id': customer_id,
             'first_name': first_name,
             'last_name': last_name,
@@ -131,80 +157,332 @@ for _ in range(500):
             'maintenance_requirements': maintenance_requirements,
             'predictive_maintenance_alert': predictive_maintenance_alert,
             'remaining_useful_life': remaining_life,
-            'qr_path': qr_path  # Path to the QR code image file
+            'qr_path': qr_path  # Path to the QR code image file (None if not generated)
         })
 
-print("Adding data to Excel file...")
+    return rows
+
+
+def sample_customer_ids(num_customers, seed):
+    """
+    Draws unique customer_ids. They are 6-digit ids while those suffice;
+    the range widens for larger datasets so millions of customers stay unique.
+
+    Returns:
+        list: customer_ids (str), in random order.
+    """
+    high = max(999_999, 100_000 + num_customers * 10)
+    return [str(i) for i in random.Random(seed).sample(range(100_000, high + 1), num_customers)]
+
+
+def generate_chunk(task):
+    """
+    Process-pool task: generates the records (and QR images) of one chunk of customers.
+    Each chunk is seeded on its own, so the output doesn't depend on the number of workers.
+
+    Args:
+        task (tuple): (chunk seed, customer_ids, qr_folder, signer)
+
+    Returns:
+        list: Vehicle records (dicts) of the chunk.
+    """
+    chunk_seed, customer_ids, qr_folder, signer = task
+    random.seed(chunk_seed)
+    fake.seed_instance(chunk_seed)
+    # Uniqueness (VINs) is tracked per chunk, so memory stays flat
+    fake.unique.clear()
+
+    rows = []
+    for customer_id in customer_ids:
+        rows.extend(generate_customer(customer_id, qr_folder, signer))
+    return rows
+
+
+def iter_record_chunks(num_customers, seed=None, qr_folder=None, workers=None, chunk_size=CHUNK_SIZE,
+                       signer=None):
+    """
+    Generates vehicle records chunk by chunk on a process pool, in a stable order.
+    At most two chunks per worker are in flight, so memory doesn't grow with the dataset size.
+
+    Args:
+        num_customers (int): Number of customers.
+        seed (int): Seed for a reproducible dataset (random if None).
+        qr_folder (str): Folder for the QR code images (None to skip them).
+        workers (int): Worker processes (defaults to the CPU count; 1 runs inline).
+        chunk_size (int): Customers per task.
+        signer (TokenSigner): Sign the QR payloads (see generate_customer()).
+
+    Yields:
+        list: Vehicle records (dicts) of each chunk.
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    customer_ids = sample_customer_ids(num_customers, seed)
+    tasks = (
+        (seed * 1_000_003 + index, customer_ids[start:start + chunk_size], qr_folder, signer)
+        for index, start in enumerate(range(0, num_customers, chunk_size))
+    )
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for task in tasks:
+            yield generate_chunk(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(generate_chunk, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_records(num_customers, qr_folder=None, seed=None, workers=1):
+    """
+    Generates vehicle records for `num_customers` fake customers.
+
+    Args:
+        num_customers (int): Number of customers.
+        qr_folder (str): Folder for the QR code images (None to skip them).
+        seed (int): Seed for a reproducible dataset (random if None).
+        workers (int): Worker processes (see iter_record_chunks()).
+
+    Returns:
+        list: All vehicle records (dicts).
+    """
+    all_data = []
+    for chunk in iter_record_chunks(num_customers, seed, qr_folder, workers):
+        all_data.extend(chunk)
+    return all_data
+
+
+def records_to_frame(rows):
+    """
+    Converts records to a DataFrame with the dtypes pandas reads back from the Excel file
+    (integer customer_id, float remaining_useful_life with NaN for "N/A").
+    The QR_code column holds the image path.
+    """
+    df = pd.DataFrame(rows).rename(columns={'qr_path': 'QR_code'})[HEADERS]
+    df['customer_id'] = df['customer_id'].astype('int64')
+    df['remaining_useful_life'] = pd.to_numeric(df['remaining_useful_life'], errors='coerce')
+    return df
+
+
+def write_workbook(chunks, path="customers_with_vehicles.xlsx", embed_images=True):
+    """
+    Streams the records into an Excel file with a write-only workbook
+    (rows are flushed to disk as they are added).
+
+    Args:
+        chunks (iterable): Lists of vehicle records.
+        path (str): Excel file to write.
+        embed_images (bool): Embed each customer's QR code image in the QR_code column.
+
+    Returns:
+        int: Number of rows written.
+    """
+    chunks = iter(chunks)
+    first_chunk = next(chunks, [])
+
+    # Create a new write-only Excel workbook and worksheet
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+
+    # Column widths must be set before any row is streamed: size them from the first chunk
+    for col_idx, header in enumerate(HEADERS[:-1]):
+        max_length = max([len(header)] + [len(str(row[header])) for row in first_chunk])
+        ws.column_dimensions[get_column_letter(col_idx + 1)].width = max_length + 2  # Extra space for readability
+
+    # QR_code column width is set specifically for the 60px image (~8.4)
+    qr_column = get_column_letter(len(HEADERS))
+    ws.column_dimensions[qr_column].width = 60 * 0.14
+
+    # Center alignment for all cell values
+    center_alignment = Alignment(horizontal='center', vertical='center')
+
+    def centered(values):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.alignment = center_alignment
+            cells.append(cell)
+        return cells
+
+    ws.append(centered(HEADERS))
+    row_number = 1
+
+    for chunk in itertools.chain([first_chunk], chunks):
+        for row in chunk:
+            row_number += 1
+
+            if embed_images and row['qr_path']:
+                # Row height to make the 60px image appear centered (~45 for 60px)
+                ws.row_dimensions[row_number].height = 60 * 0.75
+
+                # Load the image bytes now, so thousands of images don't keep files open until save
+                with open(row['qr_path'], 'rb') as f:
+                    img = Image(io.BytesIO(f.read()))
+                img.width = img.height = 60
+                ws.add_image(img, f'{qr_column}{row_number}')
+
+            # Insert values (the QR_code cell stays empty, the image sits on top of it)
+            ws.append(centered([row[header] for header in HEADERS[:-1]] + ['']))
+
+    # Save the workbook as an Excel file
+    wb.save(path)
+    return row_number - 1
+
+
+def write_csv(chunks, path):
+    """
+    Streams the records into a CSV file (QR_code holds the image path).
+
+    Returns:
+        int: Number of rows written.
+    """
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for chunk in chunks:
+            writer.writerows([row[header] for header in HEADERS[:-1]] + [row['qr_path'] or ''] for row in chunk)
+            count += len(chunk)
+    return count
+
+
+def write_parquet(chunks, path):
+    """
+    Streams the records into a Parquet file, one row group per chunk (requires pyarrow).
+
+    Returns:
+        int: Number of rows written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from None
+
+    count = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(records_to_frame(chunk), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def write_sqlite(chunks, path):
+    """
+    Streams the records into a SQLite file readable by Validator(backend='sqlite').
+
+    Returns:
+        int: Number of rows written.
+    """
+    return import_frames((records_to_frame(chunk) for chunk in chunks), path)
+
+
+# Output writer by file extension
+WRITERS = {
+    '.xlsx': write_workbook,
+    '.csv': write_csv,
+    '.parquet': write_parquet,
+    '.sqlite': write_sqlite,
+    '.db': write_sqlite,
+}
 
-# Create a new Excel workbook and select the default worksheet
-wb = Workbook()
-ws = wb.active
 
-# Define and write the column headers, including new fields
-headers = [
-    'customer_id', 'first_name', 'last_name', 'number of cars', 
-    'car_vin', 'car_make', 'car_model',
-    'expiration_date', 'status', 'last_maintenance_date', 'next_maintenance_due',
-    'maintenance_requirements', 'predictive_maintenance_alert', 'remaining_useful_life',
-    'QR_code'
-]
-ws.append(headers)
-
-# Center alignment for all cell values
-center_alignment = Alignment(horizontal='center', vertical='center')
-
-# Loop over each row of data to populate the Excel sheet
-for row in all_data:
-    # Insert values except the image
-    ws.append([
-        row['customer_id'],
-        row['first_name'],
-        row['last_name'],
-        row['number of cars'],
-        row['car_vin'],
-        row['car_make'], # Changed from car_type
-        row['car_model'],
-        row['expiration_date'],
-        row['status'],
-        row['last_maintenance_date'],
-        row['next_maintenance_due'],
-        row['maintenance_requirements'],
-        row['predictive_maintenance_alert'],
-        row['remaining_useful_life'],
-        '',  # Placeholder for image
-    ])
-
-    # Adjust row height to fit QR image
-    ws.row_dimensions[ws.max_row].height = 80
-
-    # Create an image object and resize it
-    img = Image(row['qr_path'])
-    img.width = img.height = 60
-
-    # Calculate target cell (last column, current row)
-    img_cell = f'{chr(ord("A") + len(headers) - 1)}{ws.max_row}' # Dynamically get last column letter
-
-    # Adjust column width and row height to make image appear centered
-    ws.column_dimensions[chr(ord("A") + len(headers) - 1)].width = img.width * 0.14  # ~11.2 width for 80px
-    ws.row_dimensions[ws.max_row].height = img.height * 0.75  # ~60 height for 80px
-
-    # Insert the image into the worksheet
-    ws.add_image(img, img_cell)
-
-print("Resizing columns...")
-
-# Auto-adjust all columns and apply alignment
-for col_idx, col in enumerate(ws.columns):
-    # Skip QR_code column for auto-adjusting width as it's set specifically for image
-    if col_idx == len(headers) - 1:
-        continue
-    max_length = max(len(str(cell.value)) if cell.value is not None else 0 for cell in col)
-    adjusted_width = max_length + 2  # Extra space for readability
-    ws.column_dimensions[col[0].column_letter].width = adjusted_width
-    for cell in col:
-        cell.alignment = center_alignment  # Apply center alignment
-
-# Save the workbook as an Excel file
-wb.save("customers_with_vehicles.xlsx")
-
-print("DONE, All data is successfully generated and stored in (customers_with_vehicles.xlsx)")
\ No newline at end of file
+def reset_qr_folder(qr_folder):
+    """
+    Creates the QR code folder, or deletes all previous QR images inside it.
+    """
+    if not os.path.exists(qr_folder):
+        os.makedirs(qr_folder)
+    else:
+        for filename in os.listdir(qr_folder):
+            file_path = os.path.join(qr_folder, filename)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+
+
+def report_progress(chunks, num_customers, chunk_size=CHUNK_SIZE):
+    """
+    Passes chunks through, printing progress roughly every 10%.
+    """
+    total_chunks = max(1, -(-num_customers // chunk_size))
+    step = max(1, total_chunks // 10)
+    for index, chunk in enumerate(chunks, start=1):
+        if index % step == 0 or index == total_chunks:
+            print(f"  {min(index * chunk_size, num_customers)}/{num_customers} customers generated")
+        yield chunk
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate the fake customer & vehicle database and QR codes.")
+    parser.add_argument("--customers", type=int, default=500, help="Number of customers")
+    parser.add_argument("--seed", type=int, help="Seed for a reproducible dataset")
+    parser.add_argument("--output", default="customers_with_vehicles.xlsx",
+                        help="Output file: .xlsx, .csv, .parquet or .sqlite")
+    parser.add_argument("--qr-folder", default="QRcodes", help="Folder for the QR code images")
+    parser.add_argument("--no-qr", action="store_true", help="Don't generate QR code images")
+    parser.add_argument("--embed-images", action=argparse.BooleanOptionalAction, default=None,
+                        help=f"Embed QR images in the workbook (default: only up to {EMBED_IMAGE_LIMIT} customers)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--signed", action="store_true",
+                        help="Encode signed tokens (id + expiry) in the QR codes; keys come from QR_TOKEN_KEYS")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    ext = os.path.splitext(args.output)[1].lower()
+    if ext not in WRITERS:
+        raise SystemExit(f"Unsupported output format: {ext} (use {', '.join(WRITERS)})")
+
+    signer = None
+    if args.signed:
+        signer = TokenSigner.from_env()
+        if signer is None:
+            raise SystemExit("--signed needs QR_TOKEN_KEYS (e.g. QR_TOKEN_KEYS=k1:$(python TokenSigner.py genkey))")
+
+    qr_folder = None
+    if not args.no_qr:
+        print("Removing previous QR code images...")
+
+        # Define the folder to store QR code images
+        qr_folder = args.qr_folder
+        reset_qr_folder(qr_folder)
+
+    print(f"Generating {args.customers} fake customers, vehicles{'' if args.no_qr else ' and QR codes'}...")
+    chunks = report_progress(
+        iter_record_chunks(args.customers, args.seed, qr_folder, args.workers, signer=signer), args.customers
+    )
+
+    print(f"Adding data to ({args.output})...")
+    if ext == '.xlsx':
+        embed_images = args.embed_images
+        if embed_images is None:
+            embed_images = args.customers <= EMBED_IMAGE_LIMIT
+        count = write_workbook(chunks, args.output, embed_images=embed_images and qr_folder is not None)
+    else:
+        count = WRITERS[ext](chunks, args.output)
+
+    print(f"DONE, {count} rows are successfully generated and stored in ({args.output})")
+
+    if ext == '.xlsx':
+        print("Compiling database snapshot...")
+
+        # Pre-build the binary snapshot so the Validator starts without parsing the Excel file
+        snapshot = DatabaseSnapshot(args.output)
+        snapshot.compile()
+
+        print(f"DONE, snapshot is stored in ({snapshot.snapshot_dir})")
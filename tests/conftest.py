@@ -0,0 +1,74 @@
+# Shared fixtures: the modules live at the repository root (flat layout)
+import os
+import sys
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TODAY = date.today()
+VALID_UNTIL = (TODAY + timedelta(days=30)).isoformat()
+EXPIRED_ON = (TODAY - timedelta(days=30)).isoformat()
+
+
+def make_table():
+    """
+    Small customer & vehicle table shaped like the one read from the Excel file:
+    100001 valid with two cars, 100002 expired, 100003 valid with a maintenance alert.
+    """
+    return pd.DataFrame({
+        "customer_id": [100001, 100001, 100002, 100003],
+        "first_name": ["Ada", "Ada", "Bob", "Cy"],
+        "last_name": ["Lovelace", "Lovelace", "Stone", "Young"],
+        "number of cars": [2, 2, 1, 1],
+        "car_vin": ["VIN0000000000001", "VIN0000000000002", "VIN0000000000003", "VIN0000000000004"],
+        "car_make": ["Toyota", "Lexus", "Toyota", "Toyota"],
+        "car_model": ["Camry", "RX", "Yaris", "Hilux"],
+        "expiration_date": [VALID_UNTIL, VALID_UNTIL, EXPIRED_ON, (TODAY + timedelta(days=400)).isoformat()],
+        "status": ["Operational", "Idle", "Operational", "Awaiting Parts"],
+        "last_maintenance_date": ["2025-01-10", "2025-02-11", "2025-03-12", "2025-04-13"],
+        "next_maintenance_due": ["2025-07-10", "2025-08-11", "2025-09-12", "2025-10-13"],
+        "maintenance_requirements": ["Oil Change", "No immediate requirements", "Battery Check", "Tire Rotation"],
+        "predictive_maintenance_alert": [False, False, False, True],
+        "remaining_useful_life": [np.nan, np.nan, np.nan, 120.0],
+        "QR_code": [np.nan] * 4,
+    })
+
+
+@pytest.fixture
+def table():
+    return make_table()
+
+
+@pytest.fixture
+def xlsx_path(tmp_path, table):
+    path = tmp_path / "customers.xlsx"
+    table.to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def webapp(tmp_path_factory):
+    """
+    WebApp wired to the fixture table and a scan log in a temp folder
+    (WEBAPP_AUTOSTART=0 keeps the import from starting the production services).
+    """
+    os.environ["WEBAPP_AUTOSTART"] = "0"
+    import WebApp
+    from Validator import Validator
+
+    folder = tmp_path_factory.mktemp("webapp")
+    path = folder / "customers.xlsx"
+    make_table().to_excel(path, index=False)
+    WebApp.init_services(validator_instance=Validator(str(path)),
+                         scan_log_path=str(folder / "scan_log.sqlite"), watch=False)
+    yield WebApp
+    WebApp.scan_log.close()
+
+
+@pytest.fixture
+def flask_client(webapp):
+    return webapp.app.test_client()
@@ -0,0 +1,173 @@
+# Webhook tests for AsyncWebApp, against a local stand-in for the Graph API (GRAPH_API_URL).
+# Run from the repository root: python -m pytest -q tests
+import os
+import io
+import json
+import sys
+import queue
+import importlib
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import qrcode
+from starlette.testclient import TestClient
+from conftest import ROOT, make_table
+
+PHONE_NUMBER_ID = "1234567890"
+
+
+class GraphStub(BaseHTTPRequestHandler):
+    """
+    Graph API stand-in: records every request and answers with the queued
+    (status, headers, body) for its (method, path), or 200 {} when none is queued.
+    """
+
+    requests = []
+    responses = {}
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        path = self.path.split("?")[0]
+        GraphStub.requests.append((self.command, path, json.loads(body) if body else None))
+
+        try:
+            status, headers, payload = GraphStub.responses[(self.command, path)].get_nowait()
+        except (KeyError, queue.Empty):
+            status, headers, payload = 200, {}, b"{}"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+    @classmethod
+    def queue(cls, method, path, status, body=b"{}", headers=None):
+        cls.responses.setdefault((method, path), queue.Queue()).put((status, headers or {}, body))
+
+    @classmethod
+    def sent(cls):
+        """
+        Returns the bodies of the messages sent through the stub.
+        """
+        return [body for method, path, body in cls.requests
+                if method == "POST" and path == f"/{PHONE_NUMBER_ID}/messages"]
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def client(stub, tmp_path_factory):
+    # The app reads its config at import time; templates are relative to the repo root
+    os.environ["GRAPH_API_URL"] = stub
+    os.environ["PHONE_NUMBER_ID"] = PHONE_NUMBER_ID
+    folder = tmp_path_factory.mktemp("async_webapp")
+    make_table().to_excel(folder / "customers.xlsx", index=False)
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        app_module = importlib.import_module("AsyncWebApp")
+        from Validator import Validator
+        # Services injected before startup are kept by the lifespan
+        app_module.init_services(validator_instance=Validator(str(folder / "customers.xlsx")),
+                                 scan_log_path=str(folder / "scan_log.jsonl"), watch=False)
+        with TestClient(app_module.app) as test_client:
+            yield test_client
+    finally:
+        os.chdir(cwd)
+
+
+def test_import_creates_no_services():
+    code = ("import threading, AsyncWebApp as m; "
+            "assert m.validator is None and m.executor is None and m.scan_log is None; "
+            "assert threading.active_count() == 1")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.fixture(autouse=True)
+def reset_stub():
+    GraphStub.requests.clear()
+    GraphStub.responses.clear()
+
+
+def delivery(*messages):
+    return {"entry": [{"changes": [{"value": {"messages": list(messages)}}]}]}
+
+
+def text_message(message_id, sender="15550001111"):
+    return {"id": message_id, "from": sender, "type": "text", "text": {"body": "hello"}}
+
+
+def test_duplicate_messages_are_processed_once(client):
+    # Background processing finishes before the test client returns the response
+    response = client.post("/webhook", json=delivery(text_message("wamid.1"), text_message("wamid.2")))
+    assert response.status_code == 200
+
+    # Meta redelivers the same message (e.g. after a slow acknowledgement)
+    response = client.post("/webhook", json=delivery(text_message("wamid.1")))
+    assert response.status_code == 200
+
+    sent = GraphStub.sent()
+    assert len(sent) == 2
+    assert all(body["to"] == "15550001111" for body in sent)
+
+
+def test_rate_limited_reply_is_retried(client):
+    GraphStub.queue("POST", f"/{PHONE_NUMBER_ID}/messages", 429, headers={"Retry-After": "0"})
+
+    response = client.post("/webhook", json=delivery(text_message("wamid.retry")))
+    assert response.status_code == 200
+
+    # First attempt rate limited, second one delivered
+    assert len(GraphStub.sent()) == 2
+
+
+def test_media_lookup_is_retried_on_server_error(client, stub):
+    image = io.BytesIO()
+    qrcode.make("000000").save(image, format="PNG")
+    GraphStub.queue("GET", "/media.1", 503)
+    GraphStub.queue("GET", "/media.1", 200, json.dumps({"url": f"{stub}/download/media.1"}).encode())
+    GraphStub.queue("GET", "/download/media.1", 200, image.getvalue(), {"Content-Type": "image/png"})
+
+    message = {"id": "wamid.image", "from": "15550001111", "type": "image", "image": {"id": "media.1"}}
+    response = client.post("/webhook", json=delivery(message))
+    assert response.status_code == 200
+
+    lookups = [path for method, path, _ in GraphStub.requests if method == "GET" and path == "/media.1"]
+    assert len(lookups) == 2
+    # The code was downloaded, decoded & answered (unknown customer)
+    assert len(GraphStub.sent()) == 1
+
+
+def test_malformed_json_is_rejected(client):
+    response = client.post("/webhook", content=b"{not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert GraphStub.sent() == []
+
+
+def test_redelivery_after_a_failed_media_lookup_is_processed(client):
+    GraphStub.queue("GET", "/media.2", 404)
+    message = {"id": "wamid.failed", "from": "15550001111", "type": "image", "image": {"id": "media.2"}}
+    client.post("/webhook", json=delivery(message))
+    assert GraphStub.sent()[-1]["text"]["body"] == "❌ Failed to get image URL."
+
+    # The failed message was forgotten: Meta's redelivery is handled again
+    client.post("/webhook", json=delivery(message))
+    lookups = [path for method, path, _ in GraphStub.requests if method == "GET" and path == "/media.2"]
+    assert len(lookups) == 2
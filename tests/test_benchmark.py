@@ -0,0 +1,43 @@
+# Benchmark harness: latency summaries and a small end-to-end run of the CLI
+import sys
+import json
+import subprocess
+import pytest
+from Benchmark import summarize, sample_ids
+from conftest import ROOT
+
+
+def test_summarize():
+    summary = summarize([0.001, 0.002, 0.003, 0.004])
+    assert summary["count"] == 4
+    assert summary["p50_ms"] == pytest.approx(2.5)
+    assert summary["max_ms"] == pytest.approx(4.0)
+    assert summary["throughput_per_s"] == pytest.approx(400.0)
+    assert summarize([]) == {"count": 0}
+
+
+def test_sample_ids_mixes_in_unknown_ids():
+    known = [str(i) for i in range(100000, 100100)]
+    ids = sample_ids(known, 1000, 0.2, seed=1)
+    misses = sum(customer_id not in known for customer_id in ids)
+    assert len(ids) == 1000 and 100 < misses < 300
+    assert sample_ids(known, 1000, 0.2, seed=1) == ids
+
+
+def test_small_run_writes_a_comparable_report(tmp_path):
+    output = tmp_path / "bench.json"
+    command = [sys.executable, "Benchmark.py", "--customers", "20", "--lookups", "50", "--batch-size", "10",
+               "--degradations", "clean,rotate", "--decode-samples", "2", "--requests", "3",
+               "--output", str(output)]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+
+    report = json.loads(output.read_text())
+    results = report["results"]
+    assert {"lookup_pandas", "lookup_sqlite", "decode", "requests"} <= set(results)
+    assert results["requests"]["api_scan_id"]["count"] == 3
+    assert report["dataset"]["customers"] == 20
+
+    compared = subprocess.run(command + ["--compare", str(output)], cwd=ROOT, capture_output=True,
+                              text=True, timeout=300)
+    assert compared.returncode == 0 and "p95 ms" in compared.stdout
@@ -0,0 +1,57 @@
+# Compact columnar table for the pandas backend: lossless type conversions & memory report
+import numpy as np
+import pandas as pd
+from StorageBackend import PandasBackend, compact_frame, memory_report, format_rows
+from Validator import Validator
+from conftest import make_table
+
+
+def big_table(copies=50):
+    df = pd.concat([make_table()] * copies, ignore_index=True)
+    df["customer_id"] = np.arange(len(df)) // 2 + 100000
+    df["car_vin"] = [f"VIN{i:013d}" for i in range(len(df))]
+    return df
+
+
+def test_types_are_compacted():
+    df = compact_frame(big_table())
+    assert "QR_code" not in df.columns
+    assert df["customer_id"].dtype == np.int32
+    assert df["number of cars"].dtype == np.int8
+    assert df["expiration_date"].dtype == "datetime64[s]"
+    assert df["car_make"].dtype == "category"
+    # Unique values stay plain strings
+    assert df["car_vin"].dtype != "category"
+    assert df["remaining_useful_life"].dtype == np.float32
+
+
+def test_displayed_text_is_unchanged():
+    df = big_table()
+    compact = compact_frame(df)
+    assert format_rows(compact.columns.tolist(), PandasBackend(compact, precompute=False).lookup("100000")) == \
+        format_rows(df.columns.tolist(), df[df["customer_id"] == 100000].values.tolist())
+
+
+def test_columns_that_cannot_be_converted_losslessly_are_kept():
+    df = big_table()
+    df["expiration_date"] = df["expiration_date"].astype(object)
+    df.loc[3, "expiration_date"] = "not a date"
+    df["remaining_useful_life"] = df["remaining_useful_life"].fillna(0.1)
+    compact = compact_frame(df)
+    assert compact["expiration_date"].dtype == object
+    assert compact["remaining_useful_life"].dtype == np.float64
+
+
+def test_memory_shrinks_and_is_reported_per_column():
+    df = big_table()
+    before = sum(column["bytes"] for column in memory_report(df).values())
+    report = memory_report(compact_frame(df))
+    assert sum(column["bytes"] for column in report.values()) < before / 2
+    assert report["car_make"]["dtype"] == "category"
+
+
+def test_validator_memory_report(xlsx_path):
+    report = Validator(xlsx_path).memory_report()
+    assert report["total_bytes"] == report["table_bytes"] + report["index_bytes"] + report["prepared_bytes"]
+    assert set(report["columns"]) <= set(make_table().columns)
+    assert Validator(xlsx_path, backend="sqlite").memory_report() is None
@@ -0,0 +1,46 @@
+# Fake dataset generation (create_database.py): reproducible chunks & the output writers
+import csv
+import pytest
+from create_database import (
+    iter_record_chunks, generate_records, records_to_frame, sample_customer_ids,
+    write_workbook, write_csv, write_sqlite, HEADERS,
+)
+from Validator import Validator
+
+
+def test_customer_ids_are_unique_and_reproducible():
+    ids = sample_customer_ids(5000, seed=1)
+    assert len(set(ids)) == 5000
+    assert sample_customer_ids(5000, seed=1) == ids
+
+
+def test_same_seed_gives_the_same_dataset_whatever_the_worker_count():
+    inline = [row for chunk in iter_record_chunks(30, seed=7, workers=1, chunk_size=8) for row in chunk]
+    pooled = [row for chunk in iter_record_chunks(30, seed=7, workers=2, chunk_size=8) for row in chunk]
+    assert inline == pooled
+    assert len({row["customer_id"] for row in inline}) == 30
+
+
+def test_every_vehicle_row_of_a_customer_agrees():
+    df = records_to_frame(generate_records(20, seed=3))
+    assert df.columns.tolist() == HEADERS
+    per_customer = df.groupby("customer_id")
+    assert (per_customer["expiration_date"].nunique() == 1).all()
+    assert (per_customer.size() == per_customer["number of cars"].first()).all()
+    assert df["car_vin"].is_unique
+
+
+@pytest.mark.parametrize("writer, suffix", [(write_workbook, ".xlsx"), (write_csv, ".csv"), (write_sqlite, ".sqlite")])
+def test_writers_store_every_row(tmp_path, writer, suffix):
+    rows = generate_records(12, seed=5)
+    path = str(tmp_path / f"customers{suffix}")
+    kwargs = {"embed_images": False} if writer is write_workbook else {}
+    assert writer(iter([rows[:10], rows[10:]]), path, **kwargs) == len(rows)
+
+    if suffix == ".csv":
+        with open(path, newline="") as f:
+            assert len(list(csv.reader(f))) == len(rows) + 1
+        return
+    validator = Validator(path, backend="sqlite" if suffix == ".sqlite" else "pandas")
+    assert len(validator.backend.lookup(rows[0]["customer_id"])) == sum(
+        row["customer_id"] == rows[0]["customer_id"] for row in rows)
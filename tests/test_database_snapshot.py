@@ -0,0 +1,102 @@
+# Compiled columnar snapshot: round trip, recompiles & the stored customer_id index
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from DatabaseSnapshot import DatabaseSnapshot
+from StorageBackend import PandasBackend, compact_frame
+from Validator import Validator
+from conftest import make_table
+
+
+@pytest.fixture
+def snapshot(xlsx_path):
+    return DatabaseSnapshot(xlsx_path)
+
+
+@pytest.fixture
+def hashes(snapshot, monkeypatch):
+    counted = []
+    source_hash = snapshot._source_hash
+    monkeypatch.setattr(snapshot, "_source_hash", lambda: counted.append(1) or source_hash())
+    return counted
+
+
+def touch(path, content_changed=False):
+    if content_changed:
+        df = pd.read_excel(path)
+        df.loc[0, "first_name"] = "Grace"
+        df.to_excel(path, index=False)
+    later = time.time() + 2
+    os.utime(path, (later, later))
+
+
+def test_load_round_trips_the_table(snapshot, table):
+    df = snapshot.load()
+    assert df["first_name"].dtype == "category"
+    assert df["customer_id"].tolist() == table["customer_id"].tolist()
+    assert df["first_name"].astype(str).tolist() == table["first_name"].tolist()
+    assert df["remaining_useful_life"].isna().sum() == 3
+    assert not snapshot.is_stale()
+
+
+def test_only_changed_contents_trigger_a_compile(snapshot, hashes):
+    version = snapshot.compile()["version"]
+    hashes.clear()
+
+    touch(snapshot.source_path)
+    snapshot.load()
+    assert snapshot._read_manifest()["version"] == version
+
+    touch(snapshot.source_path, content_changed=True)
+    df = snapshot.load()
+    assert df["first_name"].iloc[0] == "Grace"
+    assert snapshot._read_manifest()["version"] != version
+    # One hash for the touch, one for the change (reused by the compile)
+    assert len(hashes) == 2
+    # The replaced version is removed
+    assert sorted(os.listdir(snapshot.snapshot_dir)).count(version) == 0
+
+
+@pytest.mark.parametrize("damage", ["missing", "half-written", "missing version"])
+def test_damaged_manifest_is_recompiled(snapshot, damage):
+    manifest = snapshot.compile()
+    if damage == "missing":
+        os.remove(snapshot.manifest_path)
+    elif damage == "half-written":
+        with open(snapshot.manifest_path, "w") as f:
+            f.write(json.dumps(manifest)[:40])
+    else:
+        os.rename(os.path.join(snapshot.snapshot_dir, manifest["version"]),
+                  os.path.join(snapshot.snapshot_dir, "elsewhere"))
+
+    assert len(snapshot.load()) == 4
+    assert snapshot._read_manifest() is not None
+
+
+def test_stored_index_matches_the_one_built_from_the_table(snapshot):
+    df, prebuilt = snapshot.load(with_index=True)
+    built = PandasBackend(compact_frame(df))
+    stored = PandasBackend(compact_frame(df), **prebuilt)
+
+    assert prebuilt["index"].keys() == built.index.keys()
+    for key, offsets in built.index.items():
+        assert np.array_equal(prebuilt["index"][key], offsets)
+    assert stored.prepared == built.prepared
+    assert stored.lookup_prepared("100002") == (False, None)
+
+
+def test_table_without_customer_id_has_no_stored_index(tmp_path):
+    path = tmp_path / "vehicles.xlsx"
+    make_table().drop(columns=["customer_id"]).to_excel(path, index=False)
+    df, prebuilt = DatabaseSnapshot(str(path)).load(with_index=True)
+    assert prebuilt == {} and len(df) == 4
+
+
+def test_validator_serves_from_the_stored_index(xlsx_path):
+    validator = Validator(xlsx_path)
+    assert validator.backend.expiry is not None
+    assert validator.validate("100001")["success"]
+    assert "error" in validator.validate("999999")
@@ -0,0 +1,107 @@
+# Graph API client: retries, Retry-After cap & no duplicate POSTs
+import asyncio
+import httpx
+import pytest
+import requests
+import GraphClient as graph_module
+from GraphClient import GraphClient, AsyncGraphClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.ok = status_code < 400
+        self._body = body or {}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waited = []
+    monkeypatch.setattr(graph_module.time, "sleep", waited.append)
+    return waited
+
+
+def client_answering(*responses):
+    client = GraphClient("http://graph.test", "token", backoff=0.1, max_backoff=5.0)
+    replies = list(responses)
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append(method)
+        return replies.pop(0)
+
+    client.session.request = request
+    return client, calls
+
+
+def test_get_is_retried_on_server_errors(sleeps):
+    client, calls = client_answering(FakeResponse(503), FakeResponse(502), FakeResponse(200, body={"url": "u"}))
+    assert client.get_media_url("media.1") == "u"
+    assert len(calls) == 3
+    assert len(sleeps) == 2 and sleeps[0] < sleeps[1] <= client.max_backoff
+    assert client.get_stats()["media_url"]["retries"] == 2
+
+
+def test_post_is_not_retried_on_server_errors(sleeps):
+    client, calls = client_answering(FakeResponse(500))
+    assert client.send_message("123", "15550001111", "hi") is False
+    assert calls == ["POST"] and sleeps == []
+
+
+def test_short_retry_after_is_honored(sleeps):
+    client, calls = client_answering(FakeResponse(429, {"Retry-After": "2"}), FakeResponse(200))
+    assert client.send_message("123", "15550001111", "hi") is True
+    assert sleeps == [2.0]
+
+
+def test_retry_after_longer_than_the_cap_gives_up(sleeps):
+    client, calls = client_answering(FakeResponse(429, {"Retry-After": "3600"}), FakeResponse(200))
+    # The worker is released right away with the rate-limited response
+    assert client.send_message("123", "15550001111", "hi") is False
+    assert calls == ["POST"] and sleeps == []
+    assert client.get_stats()["send_message"]["retries"] == 0
+
+
+def test_exponential_backoff_is_capped():
+    client = GraphClient("http://graph.test", "token", backoff=1.0, max_backoff=3.0)
+    assert client._retry_delay(10, None) == 3.0
+
+
+def test_connection_failures_raise_after_the_retries(sleeps):
+    client = GraphClient("http://graph.test", "token", max_retries=2)
+
+    def request(method, url, **kwargs):
+        raise requests.ConnectionError("down")
+
+    client.session.request = request
+    with pytest.raises(requests.ConnectionError):
+        client.get_media_url("media.1")
+    assert len(sleeps) == 2
+
+
+def test_async_client_caps_retry_after(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(429, headers={"Retry-After": "3600"})
+
+    async def run():
+        client = AsyncGraphClient("http://graph.test", "token", max_backoff=5.0)
+        await client.session.aclose()
+        client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await client.send_message("123", "15550001111", "hi")
+        finally:
+            await client.close()
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=5)) is False
+    assert calls == ["POST"]
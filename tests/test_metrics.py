@@ -0,0 +1,56 @@
+# Latency histograms, gauges and the /metrics endpoint
+import pytest
+from Metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.histogram("stage_seconds", "Stage durations.", ("stage",), buckets=(0.1, 1.0))
+    return registry
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        registry.observe("stage_seconds", seconds, "decode")
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="decode",le="0.1"} 2' in text
+    assert 'stage_seconds_bucket{stage="decode",le="1.0"} 3' in text
+    assert 'stage_seconds_bucket{stage="decode",le="+Inf"} 4' in text
+    assert 'stage_seconds_sum{stage="decode"} 3.65' in text
+    assert 'stage_seconds_count{stage="decode"} 4' in text
+
+
+def test_label_values_are_escaped(registry):
+    registry.observe("stage_seconds", 0.01, 'a"b\nc')
+    assert 'stage="a\\"b\\nc"' in registry.render()
+
+
+def test_timer_records_even_when_the_block_raises(registry):
+    with pytest.raises(RuntimeError):
+        with registry.timer("stage_seconds", "lookup"):
+            raise RuntimeError("boom")
+    assert 'stage_seconds_count{stage="lookup"} 1' in registry.render()
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    registry.histogram("stage_seconds", "Stage durations.", ("stage",))
+    with registry.timer("stage_seconds", "decode"):
+        pass
+    assert "stage_seconds_count" not in registry.render()
+
+
+def test_failing_gauge_is_left_out(registry):
+    registry.gauge("queue_depth", "Queued items.", lambda: 3)
+    registry.gauge("broken", "Fails.", lambda: 1 / 0)
+    text = registry.render()
+    assert "queue_depth 3.0" in text and "broken" not in text
+
+
+def test_metrics_endpoint_reports_requests_and_stages(flask_client):
+    flask_client.post("/api/scan", json={"customer_id": "100001"})
+    text = flask_client.get("/metrics").get_data(as_text=True)
+    assert 'qr_stage_seconds_count{stage="lookup"}' in text
+    assert 'route="/api/scan",method="POST",status="200"' in text
+    assert "qr_validator_snapshot_version" in text
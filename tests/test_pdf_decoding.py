@@ -0,0 +1,102 @@
+# PDF decoding page by page. Poppler is replaced by rendered page images, so the
+# calls made to pdf2image (which page, at which DPI) can be checked without it.
+import io
+import pytest
+import qrcode
+from PIL import Image
+import QRCodeReader as reader_module
+from QRCodeReader import QRCodeReader
+
+
+def page_with(payload=None):
+    page = Image.new("RGB", (400, 400), "white")
+    if payload is not None:
+        image = io.BytesIO()
+        qrcode.make(payload, box_size=6).save(image, format="PNG")
+        page.paste(Image.open(image).convert("RGB"), (40, 40))
+    return page
+
+
+class FakePoppler:
+    """
+    Stands in for pdfinfo_from_path / convert_from_path over a list of page images.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.renders = []  # (page number, dpi)
+
+    def info(self, path):
+        return {"Pages": len(self.pages)}
+
+    def convert(self, path, dpi, first_page, last_page):
+        assert first_page == last_page, "pages must be rendered one at a time"
+        self.renders.append((first_page, dpi))
+        return [self.pages[first_page - 1].copy()]
+
+
+@pytest.fixture
+def poppler(monkeypatch):
+    def install(*pages):
+        fake = FakePoppler(list(pages))
+        monkeypatch.setattr(reader_module, "pdfinfo_from_path", fake.info)
+        monkeypatch.setattr(reader_module, "convert_from_path", fake.convert)
+        return fake
+    return install
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "cards.pdf"
+    path.write_bytes(b"%PDF-1.4 stand-in")
+    return str(path)
+
+
+def test_stops_at_the_first_page_with_a_code(poppler, pdf_path):
+    fake = poppler(page_with(), page_with("100001"), page_with("100003"))
+    reader = QRCodeReader(cache_size=0, pdf_dpi=100, pdf_retry_dpi=200)
+    assert reader.smart_decode(pdf_path) == "100001"
+    # Blank first page retried at the higher DPI, then page 2 found at the first try; page 3 never rendered
+    assert fake.renders == [(1, 100), (1, 200), (2, 100)]
+
+    report = reader.last_pdf_report()
+    assert [(page["page"], page["found"]) for page in report["pages"]] == [(1, False), (1, False), (2, True)]
+    assert report["peak_image_bytes"] == 400 * 400 * 3
+
+
+def test_pdf_without_codes(poppler, pdf_path):
+    fake = poppler(page_with(), page_with())
+    reader = QRCodeReader(cache_size=0, pdf_retry_dpi=None)
+    assert reader.smart_decode(pdf_path) is None
+    assert reader.smart_decode(pdf_path, return_image=True) == (None, None)
+    assert [page for page, _ in fake.renders] == [1, 2, 1, 2]
+
+
+def test_pdf_bytes_are_decoded_from_a_temporary_copy(poppler, tmp_path, monkeypatch):
+    poppler(page_with("100003"))
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    assert QRCodeReader(cache_size=0).smart_decode(b"%PDF-1.4 stand-in") == "100003"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_decode_all_collects_the_codes_of_every_page(poppler, pdf_path):
+    two_cards = page_with("100001")
+    image = io.BytesIO()
+    qrcode.make("100002", box_size=6).save(image, format="PNG")
+    two_cards.paste(Image.open(image).convert("RGB").resize((150, 150)), (240, 240))
+    fake = poppler(two_cards, page_with(), page_with("100003"))
+
+    codes = QRCodeReader(cache_size=0, pdf_dpi=100, pdf_retry_dpi=200).decode_all(pdf_path)
+    assert [(code["data"], code["page"], code["dpi"]) for code in codes] == [
+        ("100001", 1, 100), ("100002", 1, 100), ("100003", 3, 100)]
+    # Every page is searched; only the blank one is re-rendered
+    assert fake.renders == [(1, 100), (2, 100), (2, 200), (3, 100)]
+
+
+def test_cached_decode_all_results_are_copies(poppler, pdf_path):
+    fake = poppler(page_with("100001"))
+    reader = QRCodeReader()
+    first = reader.decode_all(pdf_path)
+    first[0]["data"] = "changed"
+    assert reader.decode_all(pdf_path)[0]["data"] == "100001"
+    assert len(fake.renders) == 1
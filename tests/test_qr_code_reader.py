@@ -0,0 +1,174 @@
+# QR code reader: single & multi-code images, the decode cache and the decode_many() pool
+import io
+import shutil
+import tempfile
+import numpy as np
+import pytest
+import qrcode
+from PIL import Image
+from QRCodeReader import QRCodeReader, DecodeCache
+
+
+def qr_png(payload, box_size=8):
+    image = io.BytesIO()
+    qrcode.make(payload, box_size=box_size).save(image, format="PNG")
+    return image.getvalue()
+
+
+def side_by_side(*payloads):
+    images = [Image.open(io.BytesIO(qr_png(payload))).convert("RGB") for payload in payloads]
+    sheet = Image.new("RGB", (sum(image.width for image in images), max(image.height for image in images)), "white")
+    x = 0
+    for image in images:
+        sheet.paste(image, (x, 0))
+        x += image.width
+    out = io.BytesIO()
+    sheet.save(out, format="PNG")
+    return out.getvalue()
+
+
+@pytest.fixture(scope="module")
+def reader():
+    reader = QRCodeReader()
+    yield reader
+    reader.close()
+
+
+def test_smart_decode_reads_bytes_paths_and_file_objects(reader, tmp_path):
+    data = qr_png("100001")
+    path = tmp_path / "code.png"
+    path.write_bytes(data)
+    assert reader.smart_decode(data) == "100001"
+    assert reader.smart_decode(str(path)) == "100001"
+    assert reader.smart_decode(io.BytesIO(data)) == "100001"
+
+
+def test_images_are_decoded_without_temporary_files(monkeypatch):
+    def no_temp_files(*args, **kwargs):
+        raise AssertionError("wrote a temporary file")
+
+    monkeypatch.setattr(tempfile, "mkstemp", no_temp_files)
+    monkeypatch.setattr(tempfile, "NamedTemporaryFile", no_temp_files)
+    reader = QRCodeReader(cache_size=0)
+    assert reader.smart_decode(bytearray(qr_png("100001"))) == "100001"
+    assert reader.decode_all(io.BytesIO(qr_png("100002")))[0]["data"] == "100002"
+
+
+@pytest.mark.skipif(shutil.which("pdftoppm") is None, reason="Poppler is not installed")
+def test_pdf_bytes_use_a_private_temporary_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    pdf = io.BytesIO()
+    Image.open(io.BytesIO(qr_png("100003"))).convert("RGB").save(pdf, format="PDF")
+    assert QRCodeReader(cache_size=0).smart_decode(pdf.getvalue()) == "100003"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unreadable_images_decode_to_none(reader):
+    blank = io.BytesIO()
+    Image.new("RGB", (200, 200), "white").save(blank, format="PNG")
+    assert reader.smart_decode(blank.getvalue()) is None
+    assert reader.smart_decode(b"") is None
+
+
+def test_resubmitted_images_are_served_from_the_cache():
+    reader = QRCodeReader()
+    data = qr_png("100002")
+    assert reader.smart_decode(data) == "100002"
+    assert reader.smart_decode(memoryview(data)) == "100002"
+    assert reader.cache.get_stats()["hits"] == 1
+
+
+def test_decode_cache_evicts_and_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("QRCodeReader.time.monotonic", lambda: now[0])
+    cache = DecodeCache(max_size=2, ttl=10)
+    for key in ("a", "b", "a", "c"):
+        cache.put(key, key.upper())
+    # "b" was the least recently stored
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, "A")
+    now[0] += 11
+    assert cache.get("c") == (False, None)
+    assert cache.get_stats() == {"hits": 1, "misses": 2, "evictions": 1, "expired": 1, "size": 1}
+
+
+def test_unreadable_images_are_cached_too(monkeypatch):
+    reader = QRCodeReader()
+    decodes = []
+    decode_buffer = reader._decode_buffer
+    monkeypatch.setattr(reader, "_decode_buffer", lambda *args: decodes.append(1) or decode_buffer(*args))
+    for _ in range(2):
+        assert reader.smart_decode(b"not an image") is None
+    assert len(decodes) == 1
+    # The cropped image is not cached: those calls always decode
+    reader.smart_decode(qr_png("100001"), return_image=True)
+    reader.smart_decode(qr_png("100001"), return_image=True)
+    assert len(decodes) == 3
+
+
+def on_canvas(payload, size=(1600, 1200), at=(900, 700), box_size=4):
+    canvas = Image.new("RGB", size, "white")
+    if payload is not None:
+        canvas.paste(Image.open(io.BytesIO(qr_png(payload, box_size=box_size))).convert("RGB"), at)
+    out = io.BytesIO()
+    canvas.save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_located_region_is_decoded_at_full_resolution():
+    reader = QRCodeReader(cache_size=0, max_detect_side=512)
+    data, cropped = reader.smart_decode(on_canvas("100001", box_size=8), return_image=True)
+    assert data == "100001"
+    # The crop comes from the full-resolution image, around the code only
+    assert 150 < cropped.shape[0] < 300 and 150 < cropped.shape[1] < 300
+    stats = reader.get_strategy_stats()
+    assert stats["locate"] == {**stats["locate"], "attempts": 1, "successes": 1}
+    assert stats["original"]["attempts"] == 1
+
+
+def test_codes_too_small_to_locate_are_found_at_full_resolution():
+    reader = QRCodeReader(cache_size=0, max_detect_side=256)
+    assert reader.smart_decode(on_canvas("100003", box_size=4)) == "100003"
+    stats = reader.get_strategy_stats()
+    assert stats["locate"]["successes"] == 0 and stats["original"]["successes"] == 1
+
+
+def test_large_images_without_a_code_skip_most_full_resolution_strategies():
+    reader = QRCodeReader(cache_size=0, max_detect_side=256)
+    assert reader.smart_decode(on_canvas(None)) is None
+    stats = reader.get_strategy_stats()
+    # Every strategy on the downscaled copy, then a single one at full resolution
+    assert stats["original"]["attempts"] == 2
+    assert all(stats[name]["attempts"] == 1 for name in QRCodeReader.STRATEGIES[1:])
+
+
+def test_decode_all_finds_every_code(reader):
+    codes = reader.decode_all(side_by_side("100001", "100002", "100003"))
+    assert sorted(code["data"] for code in codes) == ["100001", "100002", "100003"]
+
+
+def test_decode_many_keeps_input_order_and_caches_raw_items(tmp_path):
+    reader = QRCodeReader()
+    path = tmp_path / "code.png"
+    path.write_bytes(qr_png("100001"))
+    items = [qr_png("100002"), str(path), memoryview(qr_png("100003")), b"not an image"]
+    try:
+        assert reader.decode_many(items, max_workers=2) == ["100002", "100001", "100003", None]
+        hits = reader.cache.get_stats()["hits"]
+        # Raw items (memoryviews included) come back from the cache without touching the pool
+        assert reader.decode_many(items[:1] + items[2:3]) == ["100002", "100003"]
+        assert reader.cache.get_stats()["hits"] == hits + 2
+
+        unordered = dict(reader.decode_many(items, ordered=False))
+        assert unordered == {0: "100002", 1: "100001", 2: "100003", 3: None}
+    finally:
+        reader.close()
+
+
+def test_decode_frame_searches_the_hint_region_first(reader):
+    frame = np.array(Image.open(io.BytesIO(side_by_side("100001"))).convert("RGB"))[:, :, ::-1].copy()
+    data, bbox = reader.decode_frame(frame)
+    assert data == "100001" and len(bbox) == 4
+    # Next frame: found again around the previous position
+    assert reader.decode_frame(frame, hint=bbox)[0] == "100001"
+    assert reader.decode_frame(None) == (None, None)
@@ -0,0 +1,67 @@
+# Rendered reply & HTML fragment cache: hits, snapshot / day invalidation and eviction
+from datetime import date, timedelta
+import RenderCache as render_module
+from RenderCache import RenderCache
+
+
+def valid(customer_id="100001"):
+    return {"success": True, "data": [{"customer_id": customer_id}]}
+
+
+class Renderer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, result):
+        self.calls += 1
+        return f"{RenderCache.customer_of(result)}#{self.calls}"
+
+
+def test_repeat_scans_are_rendered_once():
+    cache, render = RenderCache(), Renderer()
+    assert cache.render("html", valid(), 1, render) == cache.render("html", valid(), 1, render)
+    # Each kind is cached on its own
+    cache.render("whatsapp", valid(), 1, render)
+    assert render.calls == 2
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_errors_and_offline_results_are_not_cached():
+    cache, render = RenderCache(), Renderer()
+    for result in ({"error": "QR Code is Expired"}, {**valid(), "offline": True}, None):
+        cache.render("html", result, 1, render)
+        cache.render("html", result, 1, render)
+    assert render.calls == 6 and cache.get_stats()["size"] == 0
+
+
+def test_newer_snapshot_drops_the_cache_and_older_results_are_not_stored():
+    cache, render = RenderCache(), Renderer()
+    cache.render("html", valid(), 1, render)
+    assert cache.render("html", valid(), 2, render).endswith("#2")
+    assert cache.get_stats()["invalidations"] == 1
+    # A result validated against the old snapshot is rendered but not cached
+    cache.render("html", valid("100003"), 1, render)
+    assert cache.get_stats()["size"] == 1
+
+
+def test_new_day_drops_the_cache(monkeypatch):
+    cache, render = RenderCache(), Renderer()
+    cache.render("html", valid(), 1, render)
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(render_module, "date", Tomorrow)
+    cache.render("html", valid(), 1, render)
+    assert render.calls == 2
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache, render = RenderCache(max_size=2), Renderer()
+    renderer = cache.renderer("html", 1, render)
+    for customer_id in ("1", "2", "1", "3"):
+        renderer(valid(customer_id))
+    renderer(valid("1"))
+    assert render.calls == 3 and cache.get_stats()["evictions"] == 1
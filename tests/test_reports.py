@@ -0,0 +1,65 @@
+# Reporting queries over the sorted secondary indexes (Validator & /api/reports/*)
+import math
+from datetime import timedelta
+import pytest
+from Validator import Validator
+from conftest import TODAY
+
+
+@pytest.fixture(params=["pandas", "sqlite"])
+def validator(request, xlsx_path):
+    return Validator(xlsx_path, backend=request.param)
+
+
+def test_expiring_memberships_lists_customers_once_soonest_first(validator):
+    report = validator.expiring_memberships(days=60)
+    assert report["total"] == 1
+    assert [item["customer_id"] for item in report["items"]] == ["100001"]
+
+    report = validator.expiring_memberships(days=500)
+    assert [item["customer_id"] for item in report["items"]] == ["100001", "100003"]
+
+
+def test_reports_page_through_results(validator):
+    first = validator.maintenance_due("2026-01-01", limit=2)
+    second = validator.maintenance_due("2026-01-01", offset=2, limit=2)
+    assert first["total"] == second["total"] == 4
+    vins = [item["car_vin"] for item in first["items"] + second["items"]]
+    assert vins == ["VIN0000000000001", "VIN0000000000002", "VIN0000000000003", "VIN0000000000004"]
+
+
+def test_maintenance_alerts_only_lists_flagged_vehicles(validator):
+    assert [item["car_vin"] for item in validator.maintenance_alerts()["items"]] == ["VIN0000000000004"]
+    assert validator.maintenance_alerts(max_remaining=100)["total"] == 0
+
+
+def test_out_of_range_bounds_are_rejected(validator):
+    with pytest.raises(ValueError):
+        validator.expiring_memberships(days=10 ** 9)
+    with pytest.raises(ValueError):
+        validator.maintenance_alerts(max_remaining=math.nan)
+    with pytest.raises(ValueError):
+        validator.maintenance_alerts(max_remaining=math.inf)
+    with pytest.raises(ValueError):
+        validator.maintenance_due("0001-01-01")
+
+
+def test_report_routes(flask_client):
+    response = flask_client.get("/api/reports/expiring?days=500&limit=1")
+    assert response.status_code == 200
+    assert response.get_json()["total"] == 2 and len(response.get_json()["items"]) == 1
+
+    until = (TODAY + timedelta(days=1)).isoformat()
+    assert flask_client.get(f"/api/reports/maintenance-due?before={until}").get_json()["total"] == 4
+
+
+@pytest.mark.parametrize("query", [
+    "/api/reports/expiring?days=999999999999",
+    "/api/reports/expiring?days=soon",
+    "/api/reports/maintenance-alerts?max_remaining=nan",
+    "/api/reports/maintenance-due?before=yesterday",
+    "/api/reports/maintenance-due",
+    "/api/reports/expiring?offset=-x",
+])
+def test_report_routes_reject_invalid_parameters(flask_client, query):
+    assert flask_client.get(query).status_code == 400
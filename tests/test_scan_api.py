@@ -0,0 +1,90 @@
+# JSON scan API (/api/scan, /api/scan/batch, /api/scan/all, /api/scans/<id>) and the upload page
+import io
+import qrcode
+from PIL import Image
+
+
+def qr_png(payload):
+    image = io.BytesIO()
+    qrcode.make(payload).save(image, format="PNG")
+    return image.getvalue()
+
+
+def upload(data, name="code.png"):
+    return (io.BytesIO(data), name)
+
+
+def test_scan_by_customer_id(flask_client):
+    body = flask_client.post("/api/scan", json={"customer_id": "100001"}).get_json()
+    assert body["customer_id"] == "100001" and body["success"]
+    assert [row["car_vin"] for row in body["data"]] == ["VIN0000000000001", "VIN0000000000002"]
+    assert flask_client.post("/api/scan", json={"customer_id": "100002"}).get_json()["error"] == "QR Code is Expired"
+
+
+def test_scan_by_upload(flask_client):
+    response = flask_client.post("/api/scan", data={"file": upload(qr_png("100003"))})
+    assert response.status_code == 200 and response.get_json()["customer_id"] == "100003"
+
+    blank = io.BytesIO()
+    Image.new("RGB", (100, 100), "white").save(blank, format="PNG")
+    response = flask_client.post("/api/scan", data={"file": upload(blank.getvalue())})
+    assert response.status_code == 422
+
+
+def test_scan_without_input_is_a_client_error(flask_client):
+    assert flask_client.post("/api/scan", json={}).status_code == 400
+    assert flask_client.post("/api/scan/batch", json={"customer_ids": "100001"}).status_code == 400
+    assert flask_client.post("/api/scan/all").status_code == 400
+
+
+def test_batch_of_ids_keeps_input_order(flask_client):
+    body = flask_client.post("/api/scan/batch", json={"customer_ids": ["100002", "999999", "100001", ""]}).get_json()
+    results = body["results"]
+    assert [result["input"] for result in results] == ["100002", "999999", "100001", ""]
+    assert results[0]["error"] == "QR Code is Expired"
+    assert results[1]["error"] == "no customer was found"
+    assert results[2]["success"]
+    assert results[3]["error"] == "Invalid or unreadable QR code"
+
+
+def test_batch_of_uploads(flask_client):
+    files = [upload(qr_png("100001"), "a.png"), upload(b"not an image", "b.png"), upload(qr_png("100003"), "c.png")]
+    results = flask_client.post("/api/scan/batch", data={"files": files}).get_json()["results"]
+    assert [result["input"] for result in results] == ["a.png", "b.png", "c.png"]
+    assert [result.get("success", False) for result in results] == [True, False, True]
+
+
+def test_batch_size_is_limited(webapp, flask_client):
+    ids = ["100001"] * (webapp.MAX_BATCH_SIZE + 1)
+    assert flask_client.post("/api/scan/batch", json={"customer_ids": ids}).status_code == 413
+
+
+def test_scan_all_returns_every_code_with_its_position(flask_client):
+    images = [Image.open(io.BytesIO(qr_png(payload))).convert("RGB") for payload in ("100001", "999999")]
+    sheet = Image.new("RGB", (images[0].width * 2, images[0].height), "white")
+    sheet.paste(images[0], (0, 0))
+    sheet.paste(images[1], (images[0].width, 0))
+    data = io.BytesIO()
+    sheet.save(data, format="PNG")
+
+    results = flask_client.post("/api/scan/all", data={"file": upload(data.getvalue())}).get_json()["results"]
+    by_id = {result["customer_id"]: result for result in results}
+    assert by_id["100001"]["success"] and by_id["999999"]["error"] == "no customer was found"
+    assert by_id["100001"]["bbox"][0] < by_id["999999"]["bbox"][0]
+    assert by_id["100001"]["page"] == 1
+
+
+def test_scans_are_in_the_history(webapp, flask_client):
+    flask_client.post("/api/scan", json={"customer_id": "100003"})
+    webapp.scan_log.flush(timeout=5)
+    body = flask_client.get("/api/scans/100003?limit=1").get_json()
+    assert body["recent_scans"] >= 1
+    assert len(body["scans"]) == 1 and body["scans"][0]["source"] == "api"
+    assert flask_client.get("/api/scans/100003?limit=x").status_code == 400
+
+def test_upload_page_renders_the_result(flask_client):
+    assert flask_client.get("/").status_code == 200
+    page = flask_client.post("/", data={"file": upload(qr_png("100001"))}).get_data(as_text=True)
+    assert "Lovelace" in page
+    page = flask_client.post("/", data={"file": upload(b"junk")}).get_data(as_text=True)
+    assert "Invalid or unreadable QR code" in page
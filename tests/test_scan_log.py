@@ -0,0 +1,91 @@
+# Scan audit log: batched background writes, rate check, history & JSONL rotation
+import json
+import pytest
+from ScanLog import ScanLog, scan_outcome, payload_customer_id
+from TokenSigner import TokenSigner
+
+VALID = {"success": True, "data": [{"customer_id": "100001"}]}
+
+
+@pytest.fixture(params=["scan_log.sqlite", "scan_log.jsonl"])
+def scan_log(request, tmp_path):
+    scan_log = ScanLog(str(tmp_path / request.param), flush_interval=0.05, rate_limit=2)
+    yield scan_log
+    scan_log.close()
+
+
+def test_outcomes():
+    assert scan_outcome(VALID) == "valid"
+    assert scan_outcome({**VALID, "offline": True}) == "valid_offline"
+    assert scan_outcome({"error": "QR Code is Expired"}) == "expired"
+    assert scan_outcome({"error": "Expiration date column not found in database."}) == "error"
+    assert scan_outcome(None) == "unreadable"
+
+
+def test_tokens_are_logged_under_their_customer():
+    token = TokenSigner({"k1": "secret"}).sign("100001", "2030-01-31")
+    assert payload_customer_id(token) == "100001"
+    assert payload_customer_id(100002) == "100002"
+
+
+def test_history_returns_written_scans_newest_first(scan_log):
+    scan_log.record("100001", VALID, "web", "10.0.0.1")
+    scan_log.record("100001", {"error": "QR Code is Expired"}, "api")
+    scan_log.record("100002", VALID, "web")
+    scan_log.record(None, None, "whatsapp", "15550001111")
+    assert scan_log.flush(timeout=5)
+
+    history = scan_log.history("100001")
+    assert [entry["outcome"] for entry in history] == ["expired", "valid"]
+    assert history[1]["client"] == "10.0.0.1" and history[1]["flagged"] is False
+    assert len(scan_log.history("100001", limit=1)) == 1
+    assert scan_log.get_stats()["written"] == 4
+
+
+def test_repeated_scans_are_flagged(scan_log):
+    flags = scan_log.record_many(["100001"] * 4, [VALID] * 4, "web")
+    assert flags == [False, False, True, True]
+    assert scan_log.recent_scans("100001") == 4
+    scan_log.flush(timeout=5)
+    assert [entry["flagged"] for entry in scan_log.history("100001")] == [True, True, False, False]
+
+
+def test_rate_window_forgets_old_scans(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ScanLog.time.time", lambda: now[0])
+    scan_log = ScanLog(str(tmp_path / "scan_log.jsonl"), rate_window=10, rate_limit=1)
+    try:
+        scan_log.record("100001", VALID, "web")
+        now[0] += 11
+        assert scan_log.record("100001", VALID, "web") is False
+        assert scan_log.recent_scans("100001") == 1
+        # Customers not scanned within the window are dropped from memory
+        scan_log.record("100002", VALID, "web")
+        now[0] += 11
+        scan_log.record("100003", VALID, "web")
+        assert list(scan_log._recent) == ["100003"]
+    finally:
+        scan_log.close()
+
+
+def test_jsonl_log_rotates(tmp_path):
+    path = tmp_path / "scan_log.jsonl"
+    scan_log = ScanLog(str(path), max_bytes=400, backups=2)
+    for _ in range(3):
+        scan_log.record_many(["100001"] * 3, [VALID] * 3, "web")
+        scan_log.flush(timeout=5)
+    scan_log.close()
+
+    assert (tmp_path / "scan_log.jsonl.1").exists()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines and all(entry["customer_id"] == "100001" for entry in lines)
+    # History spans the rotated files too
+    assert len(scan_log.history("100001", limit=100)) == 9
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    scan_log = ScanLog(str(tmp_path / "scan_log.jsonl"), max_queue=1, flush_interval=60)
+    scan_log.close()  # no writer: the queue is never drained
+    scan_log.record("100001", VALID, "web")
+    scan_log.record("100001", VALID, "web")
+    assert scan_log.get_stats()["dropped"] == 1
@@ -0,0 +1,115 @@
+# Storage backends (pandas / SQLite) and the SQLite importer
+import sqlite3
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+from StorageBackend import PandasBackend, SQLiteBackend, import_excel, import_frames, compact_frame
+from conftest import make_table, VALID_UNTIL
+
+
+@pytest.fixture(params=["pandas", "sqlite"])
+def backend(request, tmp_path, table):
+    if request.param == "pandas":
+        backend = PandasBackend(compact_frame(table))
+    else:
+        db_path = str(tmp_path / "customers.sqlite")
+        import_frames([table], db_path)
+        backend = SQLiteBackend(db_path)
+    yield backend
+    backend.close()
+
+
+def test_lookup_returns_every_row_of_a_customer(backend):
+    rows = backend.lookup("100001")
+    assert [row[backend.columns.index("car_vin")] for row in rows] == ["VIN0000000000001", "VIN0000000000002"]
+    assert backend.lookup("999999") is None
+
+
+def test_lookup_prepared_checks_expiry(backend):
+    valid, rows = backend.lookup_prepared("100001")
+    assert valid and rows[0]["expiration_date"] == VALID_UNTIL and len(rows) == 2
+    assert backend.lookup_prepared("100002") == (False, None)
+    assert backend.lookup_prepared("999999") is None
+
+
+def test_lookup_prepared_many_keeps_input_order(backend):
+    results = backend.lookup_prepared_many(["100002", "999999", "100001", "100002"])
+    assert results[0] == (False, None)
+    assert results[1] is None
+    assert results[2][0] is True
+    assert results[3] == results[0]
+
+
+def test_import_excel_round_trip(tmp_path, xlsx_path):
+    db_path = str(tmp_path / "customers.sqlite")
+    assert import_excel(xlsx_path, db_path) == 4
+    backend = SQLiteBackend(db_path)
+    try:
+        assert backend.lookup("100003")[0][backend.columns.index("predictive_maintenance_alert")] is True
+    finally:
+        backend.close()
+
+
+def test_reimport_is_atomic_for_readers(tmp_path):
+    db_path = str(tmp_path / "customers.sqlite")
+    import_frames([make_table()], db_path)
+    reader = sqlite3.connect(db_path)
+    seen = []
+
+    def frames():
+        # A reader checks the live table between the chunks of a re-import
+        for customer_id in (200001, 200002):
+            seen.append(reader.execute("SELECT COUNT(*) FROM customers").fetchone()[0])
+            df = make_table().iloc[:1].copy()
+            df["customer_id"] = customer_id
+            yield df
+
+    assert import_frames(frames(), db_path) == 2
+    # The old table stayed complete until the swap, then only the new rows are visible
+    assert seen == [4, 4]
+    assert reader.execute("SELECT customer_id FROM customers ORDER BY rowid").fetchall() == [(200001,), (200002,)]
+    indexes = {row[0] for row in reader.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_customers_customer_id" in indexes
+    reader.close()
+
+
+def test_precomputed_rows_match_formatting_on_demand(table):
+    backend = PandasBackend(compact_frame(table))
+    slow = PandasBackend(compact_frame(table), precompute=False)
+    for customer_id in ("100001", "100003"):
+        assert backend.lookup_prepared(customer_id) == slow.lookup_prepared(customer_id)
+    assert backend.stats["precompute_seconds"] > 0
+
+
+def test_invalid_expiration_counts_as_expired(table):
+    table["expiration_date"] = table["expiration_date"].astype(object)
+    table.loc[table["customer_id"] == 100003, "expiration_date"] = "someday"
+    assert PandasBackend(compact_frame(table)).lookup_prepared("100003") == (False, None)
+
+
+def test_precomputed_validity_rolls_over_at_midnight(table, monkeypatch):
+    backend = PandasBackend(compact_frame(table))
+    assert backend.lookup_prepared("100001")[0] is True
+    # Jump past the expiry: the cached day is refreshed once the rollover time has passed
+    later = date.today() + timedelta(days=31)
+    monkeypatch.setattr(backend, "_today", later.toordinal())
+    monkeypatch.setattr(backend, "_rollover_at", float("inf"))
+    assert backend.lookup_prepared("100001") == (False, None)
+    monkeypatch.setattr(backend, "_rollover_at", 0.0)
+    assert backend.lookup_prepared("100001")[0] is True
+
+
+def test_appended_rows_are_indexed_incrementally(table):
+    backend = PandasBackend(compact_frame(table))
+    new = table.iloc[[0]].copy()
+    new["car_vin"] = "VIN0000000000009"
+    grown = pd.concat([table, new, table.iloc[[2]].assign(customer_id=100009)], ignore_index=True)
+
+    extended = backend.extended(compact_frame(grown))
+    assert extended is not None
+    assert len(extended.lookup_prepared("100001")[1]) == 3
+    assert extended.lookup_prepared("100009") == (False, None)
+    # The old backend is untouched
+    assert len(backend.lookup_prepared("100001")[1]) == 2
+    # Changed rows are not an append
+    assert backend.extended(compact_frame(table.assign(first_name="Zed"))) is None
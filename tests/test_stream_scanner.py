@@ -0,0 +1,72 @@
+# Video stream scanning: frame handoff, tracking, debouncing and validation
+import io
+import cv2
+import numpy as np
+import pytest
+import qrcode
+from PIL import Image
+from StreamScanner import StreamScanner
+from StorageBackend import PandasBackend, compact_frame
+from Validator import Validator
+from conftest import make_table
+
+SIZE = (320, 320)
+
+
+def frame_of(payload):
+    canvas = np.full((SIZE[1], SIZE[0], 3), 255, dtype=np.uint8)
+    if payload is not None:
+        image = io.BytesIO()
+        qrcode.make(payload, box_size=6).save(image, format="PNG")
+        code = np.array(Image.open(image).convert("RGB"))[:, :, ::-1]
+        canvas[20:20 + code.shape[0], 20:20 + code.shape[1]] = code
+    return canvas
+
+
+@pytest.fixture
+def video(tmp_path):
+    """
+    Writes a short clip: code 100001, then nothing, then code 100003 (at 50 fps).
+    """
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 50, SIZE)
+    if not writer.isOpened():
+        pytest.skip("No MJPG video writer in this OpenCV build")
+    for payload, count in (("100001", 15), (None, 5), ("100003", 15)):
+        frame = frame_of(payload)
+        for _ in range(count):
+            writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_each_code_is_reported_once_and_validated(video):
+    validator = Validator(backend=PandasBackend(compact_frame(make_table())))
+    scanner = StreamScanner(validator=validator, debounce=5.0)
+    results = list(scanner.scan(video, realtime=True))
+
+    assert [item["data"] for item in results] == ["100001", "100003"]
+    assert results[0]["result"]["success"] and results[0]["bbox"][0] >= 0
+    assert results[0]["frame"] < results[1]["frame"]
+
+    stats = scanner.get_stats()
+    assert stats["frames_read"] == 35 and stats["results"] == 2
+    assert stats["duplicates"] > 0 and stats["tracked_frames"] > 0
+
+
+def test_max_results_stops_the_scan(video):
+    scanner = StreamScanner()
+    results = list(scanner.scan(video, realtime=True, max_results=1))
+    assert len(results) == 1 and results[0]["result"] is None
+    assert scanner.get_stats()["frames_read"] < 35
+
+
+def test_frame_step_skips_frames(video):
+    scanner = StreamScanner(frame_step=5)
+    list(scanner.scan(video, realtime=True))
+    assert scanner.get_stats()["frames_decoded"] <= 7
+
+
+def test_unopenable_source_raises(tmp_path):
+    with pytest.raises(ValueError):
+        next(StreamScanner().scan(str(tmp_path / "missing.avi")))
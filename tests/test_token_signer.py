@@ -0,0 +1,97 @@
+# Signed QR tokens: signature & expiry checks, key rotation and Validator handling
+from datetime import date, timedelta
+import pytest
+from TokenSigner import TokenSigner, generate_secret
+from StorageBackend import PandasBackend, compact_frame
+from Validator import Validator
+from conftest import make_table, TODAY, VALID_UNTIL
+
+
+@pytest.fixture
+def signer():
+    return TokenSigner({"k1": "secret-one", "k0": "secret-zero"})
+
+
+def test_valid_token_round_trips(signer):
+    token = signer.sign("100001", "2030-01-31")
+    assert token.startswith("QR1.100001.20300131.k1.")
+    checked = signer.verify(token, today=date(2030, 1, 31))
+    assert checked == {"status": "valid", "customer_id": "100001",
+                       "expiration_date": date(2030, 1, 31), "key_id": "k1"}
+    assert signer.verify(token, today=date(2030, 2, 1))["status"] == "expired"
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda token: token.replace("100001", "100002"),
+    lambda token: token.replace("20300131", "20990131"),
+    lambda token: token[:-1] + ("A" if token[-1] != "A" else "B"),
+    lambda token: token.replace(".k1.", ".k9."),
+    lambda token: token + ".extra",
+])
+def test_tampered_tokens_are_invalid(signer, tamper):
+    assert signer.verify(tamper(signer.sign("100001", "2030-01-31")))["status"] == "invalid"
+
+
+def test_bare_customer_ids_are_not_tokens(signer):
+    assert signer.verify("100001") is None
+    assert not TokenSigner.is_token(None)
+
+
+def test_rotated_keys_still_verify_old_cards():
+    old = TokenSigner({"k0": "secret-zero"}).sign("100001", "2030-01-31")
+    rotated = TokenSigner({"k1": "secret-one", "k0": "secret-zero"})
+    assert rotated.verify(old, today=date(2030, 1, 1))["status"] == "valid"
+    assert TokenSigner({"k1": "secret-one"}).verify(old)["status"] == "invalid"
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv("QR_TOKEN_KEYS", raising=False)
+    assert TokenSigner.from_env() is None
+    monkeypatch.setenv("QR_TOKEN_KEYS", f"k1:{generate_secret()},k0:old")
+    monkeypatch.setenv("QR_TOKEN_KEY_ID", "k0")
+    assert TokenSigner.from_env().signing_key_id == "k0"
+    monkeypatch.setenv("QR_TOKEN_KEYS", "no-secret")
+    with pytest.raises(ValueError):
+        TokenSigner.from_env()
+
+
+def test_invalid_keys_and_ids_are_rejected(signer):
+    with pytest.raises(ValueError):
+        TokenSigner({})
+    with pytest.raises(ValueError):
+        TokenSigner({"a.b": "secret"})
+    with pytest.raises(ValueError):
+        signer.sign("100.001", "2030-01-31")
+
+
+class FailingBackend(PandasBackend):
+    def lookup_prepared(self, customer_id):
+        raise OSError("database unavailable")
+
+
+def test_validator_checks_tokens_before_the_database(signer):
+    validator = Validator(backend=PandasBackend(compact_frame(make_table())), signer=signer)
+    valid = signer.sign("100001", VALID_UNTIL)
+
+    assert validator.validate(valid)["data"][0]["car_vin"] == "VIN0000000000001"
+    assert validator.validate(valid, details=False)["offline"] is True
+    assert validator.validate(signer.sign("100001", TODAY - timedelta(days=1))) == {"error": "QR Code is Expired"}
+    assert validator.validate(valid.replace("100001", "100003")) == {"error": "QR Code signature is invalid"}
+    # Bare ids still go to the database
+    assert validator.validate("100001")["success"]
+    stats = validator.get_stats()
+    assert stats["tokens_verified"] == 2 and stats["tokens_rejected"] == 2
+
+
+def test_verified_token_answers_when_the_database_fails(signer):
+    validator = Validator(backend=FailingBackend(compact_frame(make_table())), signer=signer)
+    assert validator.validate(signer.sign("100001", VALID_UNTIL))["offline"] is True
+    with pytest.raises(OSError):
+        validator.validate("100001")
+
+
+def test_tokens_are_rejected_without_keys(monkeypatch):
+    monkeypatch.delenv("QR_TOKEN_KEYS", raising=False)
+    validator = Validator(backend=PandasBackend(compact_frame(make_table())))
+    token = TokenSigner({"k1": "secret"}).sign("100001", VALID_UNTIL)
+    assert validator.validate(token) == {"error": "QR Code signature is invalid"}
@@ -0,0 +1,48 @@
+# Validator: customer_id index lookups, results & lookup statistics
+import pytest
+from StorageBackend import PandasBackend, compact_frame, DISPLAY_TITLES
+from Validator import Validator
+from conftest import make_table
+
+
+@pytest.fixture(params=[True, False], ids=["compact", "raw"])
+def validator(request):
+    df = make_table()
+    return Validator(backend=PandasBackend(compact_frame(df) if request.param else df))
+
+
+def test_valid_customer_returns_every_vehicle(validator):
+    result = validator.validate("100001")
+    assert result["success"] and result["headers"] == DISPLAY_TITLES
+    assert [row["car_model"] for row in result["data"]] == ["Camry", "RX"]
+    # Numeric payloads are looked up by their text
+    assert validator.validate(100001) == result
+
+
+def test_expired_and_unknown_customers(validator):
+    assert validator.validate("100002") == {"error": "QR Code is Expired"}
+    assert validator.validate("999999") == {"error": "no customer was found"}
+    # Exact key match only: no prefix or padded matches
+    assert validator.validate("10000") == {"error": "no customer was found"}
+    assert validator.validate(" 100001") == {"error": "no customer was found"}
+
+
+def test_missing_expiration_column():
+    validator = Validator(backend=PandasBackend(make_table().drop(columns=["expiration_date"])))
+    assert validator.validate("100001") == {"error": "Expiration date column not found in database."}
+
+
+def test_validate_many_matches_validate(validator):
+    items = ["100001", "999999", "100002", "100001"]
+    assert validator.validate_many(items) == [validator.validate(item) for item in items]
+    assert validator.validate_many([]) == []
+
+
+def test_index_and_lookup_statistics(validator):
+    validator.validate("100001")
+    validator.validate("999999")
+    validator.validate_many(["100003", "999998"])
+    stats = validator.get_stats()
+    assert stats["backend"] == "pandas" and stats["index_size"] == 3
+    assert stats["lookups"] == 4 and stats["lookup_hits"] == 2 and stats["lookup_misses"] == 2
+    assert stats["lookup_seconds_total"] > 0
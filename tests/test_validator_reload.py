@@ -0,0 +1,67 @@
+# Validator hot reload (pandas snapshot & Excel-backed SQLite)
+import os
+import time
+import pandas as pd
+import pytest
+import Validator as validator_module
+from Validator import Validator
+from StorageBackend import import_frames
+
+
+def append_customer(xlsx_path, customer_id):
+    df = pd.read_excel(xlsx_path)
+    new = df.iloc[:1].copy()
+    new["customer_id"] = customer_id
+    pd.concat([df, new]).to_excel(xlsx_path, index=False)
+    # mtime resolution: make sure the change is seen as newer
+    later = time.time() + 2
+    os.utime(xlsx_path, (later, later))
+
+
+@pytest.mark.parametrize("backend", ["pandas", "sqlite"])
+def test_reload_picks_up_new_customers(xlsx_path, backend):
+    validator = Validator(xlsx_path, backend=backend)
+    assert "error" in validator.validate("100009")
+    version = validator.snapshot_version
+
+    append_customer(xlsx_path, 100009)
+    assert validator.reload() is True
+    assert validator.validate("100009")["success"]
+    assert validator.snapshot_version == version + 1
+    # Nothing changed since → no reload
+    assert validator.reload() is False
+
+
+def test_sqlite_reload_keeps_answering_during_import(xlsx_path, monkeypatch):
+    validator = Validator(xlsx_path, backend="sqlite")
+    answers = []
+
+    def chunked_import(source, db_path):
+        # Import row by row and scan between the chunks, as a concurrent request would
+        def frames():
+            for _, row in pd.read_excel(source).iterrows():
+                answers.append(validator.validate("100001").get("success", False))
+                yield row.to_frame().T.infer_objects()
+        return import_frames(frames(), db_path)
+
+    monkeypatch.setattr(validator_module, "import_excel", chunked_import)
+    later = time.time() + 2
+    os.utime(xlsx_path, (later, later))
+    assert validator.reload() is True
+    assert answers == [True] * 4
+    assert validator.validate("100001")["success"]
+
+
+def test_waiting_process_skips_a_finished_import(xlsx_path, monkeypatch):
+    validator = Validator(xlsx_path, backend="sqlite")
+    imports = []
+    monkeypatch.setattr(validator_module, "import_excel", lambda *args: imports.append(args))
+
+    # The .sqlite file (and its WAL) is newer than the workbook: nothing to import
+    assert validator._prepare_sqlite(xlsx_path).endswith(".sqlite")
+    assert imports == []
+
+    later = time.time() + 2
+    os.utime(xlsx_path, (later, later))
+    validator._prepare_sqlite(xlsx_path)
+    assert len(imports) == 1
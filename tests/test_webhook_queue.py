@@ -0,0 +1,151 @@
+# Background webhook processing (WebhookQueue) and the Flask /webhook route
+import io
+import threading
+import qrcode
+import pytest
+from WebhookQueue import WebhookQueue, MessageDeduplicator
+
+
+def wait_for(queue_):
+    queue_.join()
+    return queue_.get_stats()
+
+
+def test_messages_are_processed_in_the_background():
+    handled = []
+    webhook_queue = WebhookQueue(handled.append, workers=2)
+    for i in range(5):
+        assert webhook_queue.submit(f"wamid.{i}", {"n": i})
+
+    stats = wait_for(webhook_queue)
+    assert sorted(message["n"] for message in handled) == [0, 1, 2, 3, 4]
+    assert stats["enqueued"] == stats["processed"] == 5 and stats["queue_depth"] == 0
+
+
+def test_redelivered_messages_are_dropped():
+    handled = []
+    webhook_queue = WebhookQueue(handled.append, workers=1)
+    assert webhook_queue.submit("wamid.1", {"n": 1})
+    assert not webhook_queue.submit("wamid.1", {"n": 1})
+    # Messages without an id are never deduplicated
+    assert webhook_queue.submit(None, {"n": 2}) and webhook_queue.submit(None, {"n": 2})
+
+    stats = wait_for(webhook_queue)
+    assert len(handled) == 3 and stats["duplicates"] == 1
+
+
+def test_full_queue_rejects_and_forgets_the_message():
+    release = threading.Event()
+    webhook_queue = WebhookQueue(lambda message: release.wait(5), workers=1, max_queue=1)
+    assert webhook_queue.submit("wamid.busy", {})
+    # Wait until the worker holds the first message, so the queue itself is empty
+    while webhook_queue.get_stats()["queue_depth"]:
+        pass
+    assert webhook_queue.submit("wamid.queued", {})
+    assert not webhook_queue.submit("wamid.rejected", {})
+    assert webhook_queue.get_stats()["rejected"] == 1
+
+    release.set()
+    wait_for(webhook_queue)
+    # The rejected message was not remembered: Meta's retry is accepted
+    assert webhook_queue.submit("wamid.rejected", {})
+    wait_for(webhook_queue)
+
+
+@pytest.mark.parametrize("outcome", ["raise", "return False"])
+def test_failed_messages_can_be_redelivered(outcome):
+    def handler(message):
+        if outcome == "raise":
+            raise RuntimeError("media fetch failed")
+        return False
+
+    webhook_queue = WebhookQueue(handler, workers=1)
+    assert webhook_queue.submit("wamid.1", {})
+    assert wait_for(webhook_queue)["failed"] == 1
+    assert webhook_queue.submit("wamid.1", {})
+    wait_for(webhook_queue)
+
+
+def test_deduplicator_forgets_ids_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("WebhookQueue.time.monotonic", lambda: now[0])
+    dedup = MessageDeduplicator(max_size=2, ttl=60)
+    assert not dedup.seen("a") and dedup.seen("a")
+    now[0] += 61
+    assert not dedup.seen("a")
+    # Bounded: the oldest id goes first
+    dedup.seen("b"), dedup.seen("c")
+    assert not dedup.seen("a")
+
+
+class FakeGraph:
+    """
+    Records replies; media lookups fail while `media_ok` is False.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self.media_ok = True
+        self.sent = []
+
+    def get_media_url(self, media_id):
+        return "http://media.test/" + media_id if self.media_ok else None
+
+    def download_media(self, url):
+        return self.image
+
+    def send_message(self, phone_number_id, to, message):
+        self.sent.append((to, message))
+        return True
+
+
+@pytest.fixture
+def graph(webapp, monkeypatch):
+    image = io.BytesIO()
+    qrcode.make("100001").save(image, format="PNG")
+    graph = FakeGraph(image.getvalue())
+    monkeypatch.setattr(webapp, "graph", graph)
+    return graph
+
+
+def delivery(*messages):
+    return {"entry": [{"changes": [{"value": {"messages": list(messages)}}]}]}
+
+
+def image_message(message_id):
+    return {"id": message_id, "from": "15550001111", "type": "image", "image": {"id": "media.1"}}
+
+
+def test_webhook_acknowledges_and_replies_in_the_background(webapp, flask_client, graph):
+    response = flask_client.post("/webhook", json=delivery(image_message("wamid.flask.1")))
+    assert response.status_code == 200
+    webapp.webhook_queue.join()
+    assert len(graph.sent) == 1 and "Ada" in graph.sent[0][1]
+
+    # Redelivery of the same message: acknowledged, not answered twice
+    assert flask_client.post("/webhook", json=delivery(image_message("wamid.flask.1"))).status_code == 200
+    webapp.webhook_queue.join()
+    assert len(graph.sent) == 1
+
+
+def test_webhook_redelivery_after_a_failed_media_fetch_is_answered(webapp, flask_client, graph):
+    graph.media_ok = False
+    flask_client.post("/webhook", json=delivery(image_message("wamid.flask.2")))
+    webapp.webhook_queue.join()
+    assert graph.sent[-1][1] == "❌ Failed to get image URL."
+
+    graph.media_ok = True
+    flask_client.post("/webhook", json=delivery(image_message("wamid.flask.2")))
+    webapp.webhook_queue.join()
+    assert len(graph.sent) == 2 and "Ada" in graph.sent[-1][1]
+
+
+def test_webhook_verification(flask_client):
+    ok = flask_client.get("/webhook?hub.mode=subscribe&hub.verify_token=my_verify_token&hub.challenge=42")
+    assert ok.status_code == 200 and ok.get_data(as_text=True) == "42"
+    assert flask_client.get("/webhook?hub.mode=subscribe&hub.verify_token=wrong").status_code == 403
+
+
+def test_webhook_rejects_malformed_json(flask_client):
+    response = flask_client.post("/webhook", data=b"{nope", content_type="application/json")
+    assert response.status_code == 400